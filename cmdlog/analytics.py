@@ -0,0 +1,136 @@
+from collections import Counter
+from heapq import nlargest
+from operator import itemgetter
+from typing import Dict, Hashable, List, Tuple
+
+# window name: (seconds per bucket, number of buckets)
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1m": (1, 60),
+    "1h": (60, 60),
+    "24h": (15 * 60, 96),
+}
+WINDOW_NAMES = {"1m": "minute", "1h": "hour", "24h": "24 hours"}
+KINDS = ("commands", "users", "servers")
+
+
+class WindowCounter:
+    """Counts of keys over a sliding window, made of a ring of fixed width buckets.
+
+    A running total for the whole window is kept, and when a bucket falls out of the window its
+    counts are taken off, so the totals are always ready to read. The window moves a bucket at a
+    time, so it covers slightly less than its full length until the next bucket starts.
+
+    Parameters
+    ----------
+    width : int
+        Seconds covered by each bucket
+    buckets : int
+        Number of buckets in the window
+    """
+
+    def __init__(self, width: int, buckets: int):
+        self.width = width
+        self.buckets: List[Counter] = [Counter() for _ in range(buckets)]
+        self.totals: Counter = Counter()
+        self.count = 0  # sum of the totals
+        self.current = 0  # number of the newest bucket, time // width
+
+    def __repr__(self) -> str:
+        return (
+            f"<WindowCounter width={self.width} buckets={len(self.buckets)} "
+            f"keys={len(self.totals)}>"
+        )
+
+    def _expire(self, bucket: Counter) -> None:
+        totals = self.totals
+        for key, count in bucket.items():
+            self.count -= count
+            if (total := totals[key] - count) > 0:
+                totals[key] = total
+            else:
+                del totals[key]
+        bucket.clear()
+
+    def advance(self, timestamp: float) -> None:
+        """Move the window forward to a time, removing the counts of buckets that fall out."""
+        new = int(timestamp // self.width)
+        if new <= self.current:
+            return
+        if new - self.current >= len(self.buckets):  # nothing in the window is still in it
+            for bucket in self.buckets:
+                bucket.clear()
+            self.totals.clear()
+            self.count = 0
+        else:
+            for number in range(self.current + 1, new + 1):
+                self._expire(self.buckets[number % len(self.buckets)])
+        self.current = new
+
+    def add(self, key: Hashable, timestamp: float) -> None:
+        """Count a key at a time. Times older than the window are ignored."""
+        number = int(timestamp // self.width)
+        if number > self.current:
+            self.advance(timestamp)
+        elif number <= self.current - len(self.buckets):
+            return
+        # get is a lot faster than Counter's __missing__ for new keys
+        bucket = self.buckets[number % len(self.buckets)]
+        bucket[key] = bucket.get(key, 0) + 1
+        self.totals[key] = self.totals.get(key, 0) + 1
+        self.count += 1
+
+    def top(self, count: int, timestamp: float) -> List[Tuple[Hashable, int]]:
+        """Get the most common keys in the window ending at a time, most common first."""
+        self.advance(timestamp)
+        return nlargest(count, self.totals.items(), key=itemgetter(1))
+
+    def total(self, timestamp: float) -> int:
+        """Get the total count in the window ending at a time."""
+        self.advance(timestamp)
+        return self.count
+
+
+class UsageStats:
+    """Counts of commands, users and servers in each of `WINDOWS`, updated as commands are used.
+
+    Counting a command is a handful of dict updates, and getting the top keys only looks at the
+    keys in that window, never at the command log.
+    """
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, Dict[str, WindowCounter]] = {
+            kind: {window: WindowCounter(*size) for window, size in WINDOWS.items()}
+            for kind in KINDS
+        }
+
+    def add(self, command: str, user_id: int, guild_id: int, timestamp: float) -> None:
+        """Count a command. A guild_id of 0 (DMs) isn't counted for servers."""
+        for counter in self.counters["commands"].values():
+            counter.add(command, timestamp)
+        for counter in self.counters["users"].values():
+            counter.add(user_id, timestamp)
+        if guild_id:
+            for counter in self.counters["servers"].values():
+                counter.add(guild_id, timestamp)
+
+    def top(
+        self, kind: str, window: str, count: int, timestamp: float
+    ) -> List[Tuple[Hashable, int]]:
+        """Get the most used commands, users or servers in a window, most used first.
+
+        Parameters
+        ----------
+        kind : str
+            One of `KINDS`
+        window : str
+            One of `WINDOWS`
+        count : int
+            Maximum number to get
+        timestamp : float
+            The current time, the end of the window
+        """
+        return self.counters[kind][window].top(count, timestamp)
+
+    def total(self, window: str, timestamp: float) -> int:
+        """Get the number of commands used in a window."""
+        return self.counters["commands"][window].total(timestamp)
@@ -1,10 +1,8 @@
 import asyncio
 import datetime
 import logging
-import sys
-from collections import deque
-from io import BytesIO
-from typing import TYPE_CHECKING, Deque, Optional, Union
+import time
+from typing import TYPE_CHECKING, Iterable, Optional, Union
 
 import discord
 import sentry_sdk
@@ -17,12 +15,30 @@ from discord.user import User
 from redbot.core import Config, commands
 from redbot.core.bot import Red
 from redbot.core.commands import CheckFailure as RedCheckFailure
-from redbot.core.utils.chat_formatting import humanize_number, humanize_timedelta
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box, humanize_number, humanize_timedelta
 from vexcogutils import format_help, format_info
 from vexcogutils.chat import humanize_bytes
 from vexcogutils.meta import out_of_date_check
 
-from cmdlog.objects import TIME_FORMAT, LoggedAppCom, LoggedComError, LoggedCommand
+from cmdlog.analytics import KINDS, WINDOW_NAMES, WINDOWS, UsageStats
+from cmdlog.converters import (
+    BytesConverter,
+    ExportFlags,
+    FlagsConverter,
+    TimeConverter,
+    split_flags,
+)
+from cmdlog.export import format_chunks, gzip_parts
+from cmdlog.objects import (
+    TIME_FORMAT,
+    LoggedAppCom,
+    LoggedComError,
+    LoggedCommand,
+    format_time,
+)
+from cmdlog.persist import PersistentLog
+from cmdlog.store import RESERVED_BYTES, LogStore
 
 from .channellogger import ChannelLogger
 
@@ -35,6 +51,9 @@ if TYPE_CHECKING:
 
 _log = logging.getLogger("red.vex.cmdlog")
 
+DEFAULT_MAX_COMMANDS = 100_000
+TOP_COUNT = 10  # entries shown by [p]cmdlog top
+
 
 class CmdLog(commands.Cog):
     """
@@ -43,9 +62,9 @@ class CmdLog(commands.Cog):
     The cog keeps an internal cache and everything is also logged to the bot's main logs under
     `red.vex.cmdlog`, level INFO.
 
-    The internal cache is non persistant and subsequently is lost on cog unload,
+    By default the internal cache is non persistant and subsequently is lost on cog unload,
     including bot shutdowns. The logged data will last until Red's custom logging
-    rotator deletes old logs.
+    rotator deletes old logs. You can also save the cache to disk with `[p]cmdlog persist`.
     """
 
     __author__ = "Vexed#3211"
@@ -54,10 +73,9 @@ class CmdLog(commands.Cog):
     def __init__(self, bot: Red) -> None:
         self.bot = bot
 
-        self.log_cache: Deque[Union[LoggedCommand, LoggedComError, LoggedAppCom]] = deque(
-            maxlen=100_000
-        )
-        # this is about 50MB max from my simulated testing
+        # about 77 bytes per command plus content (if logged), so 7.5MB with the default size
+        self.log_cache = LogStore(DEFAULT_MAX_COMMANDS)
+        self.usage = UsageStats()
 
         if discord.__version__.startswith("1"):
             self.load_time = datetime.datetime.utcnow()
@@ -67,10 +85,18 @@ class CmdLog(commands.Cog):
         self.config = Config.get_conf(self, 418078199982063626, force_registration=True)
         self.config.register_global(log_content=False)
         self.config.register_global(log_channel=None)
+        self.config.register_global(max_commands=DEFAULT_MAX_COMMANDS)
+        self.config.register_global(max_bytes=0)  # 0 for no memory budget
+        self.config.register_global(persist=False)
+        self.config.register_global(persist_days=30)
 
         self.log_content: Optional[bool] = None
 
         self.channel_logger: Optional[ChannelLogger] = None
+        self.persistent_log: Optional[PersistentLog] = None
+        # newest commands in the cache that aren't in the database, counted while it's not open
+        self.unsaved_count = 0
+        self.database_loaded = False  # once it's been loaded the cache already has its commands
 
         asyncio.create_task(self.async_init())
 
@@ -83,6 +109,14 @@ class CmdLog(commands.Cog):
     async def async_init(self):
         await out_of_date_check("cmdlog", self.__version__)
 
+        max_commands: int = await self.config.max_commands()
+        if max_commands != self.log_cache.capacity:
+            self.log_cache = self.log_cache.resized(max_commands)
+        self.log_cache.set_max_bytes(await self.config.max_bytes() or None)
+
+        if await self.config.persist():
+            await self.start_persistent_log(await self.config.persist_days())
+
         await self.bot.wait_until_red_ready()
 
         chan_id: Optional[str] = await self.config.log_channel()
@@ -138,6 +172,8 @@ class CmdLog(commands.Cog):
             self.sentry_hub.client.close()
         if self.channel_logger:
             self.channel_logger.stop()
+        if self.persistent_log:
+            asyncio.create_task(self.persistent_log.close())
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """Thanks Sinbad."""
@@ -158,7 +194,7 @@ class CmdLog(commands.Cog):
             content=ctx.message.content,  # type:ignore
         )
         _log.info(logged_com)
-        self.log_cache.append(logged_com)
+        self.cache_com(logged_com)
         if self.channel_logger:
             self.channel_logger.add_command(logged_com)
 
@@ -173,16 +209,88 @@ class CmdLog(commands.Cog):
             content=ctx.message.content,  # type:ignore
         )
         _log.info(logged_com)
-        self.log_cache.append(logged_com)
+        self.cache_com(logged_com)
         if self.channel_logger:
             self.channel_logger.add_command(logged_com)
 
+    def cache_com(self, logged_com: Union[LoggedCommand, LoggedComError, LoggedAppCom]) -> None:
+        seq = self.log_cache.append(logged_com)
+        guild_id = logged_com.guild.id if logged_com.guild else 0
+        self.usage.add(logged_com.command, logged_com.user.id, guild_id, logged_com.timestamp)
+        if self.persistent_log:
+            self.persistent_log.add(self.log_cache.row(seq))
+        else:
+            self.unsaved_count += 1
+
+    async def start_persistent_log(self, days: int) -> None:
+        """Open the database and, the first time, replace the cache with the most recent saved
+        commands. Commands used while it wasn't open are saved."""
+        persistent_log = PersistentLog(str(cog_data_path(self) / "cmdlog.db"), days)
+        loaded = None
+        try:
+            await persistent_log.start()
+            if not self.database_loaded:
+                loaded = await persistent_log.load(
+                    self.log_cache.capacity, self.log_cache.max_bytes
+                )
+        except Exception:
+            _log.exception("Unable to open the command log database. Commands won't be saved.")
+            await persistent_log.close()
+            return
+
+        # only the newest commands in the cache (eg used while loading or while saving was off)
+        # aren't saved yet, the rest are already in the database
+        unsaved = min(self.unsaved_count, len(self.log_cache))
+        unsaved_seqs = range(self.log_cache.next_seq - unsaved, self.log_cache.next_seq)
+
+        if loaded is None:
+            for seq in unsaved_seqs:
+                persistent_log.add(self.log_cache.row(seq))
+        else:
+            # count saved commands from the last day, so [p]cmdlog top carries on after a
+            # restart. none of them are from this session, as nothing's been saved yet
+            day_ago = time.time() - WINDOWS["24h"][0] * WINDOWS["24h"][1]
+            for seq in range(loaded.seq_at(day_ago), loaded.next_seq):
+                row = loaded.row(seq)
+                self.usage.add(row.command, row.user_id, row.guild_id, row.time)
+
+            for seq in unsaved_seqs:
+                row = self.log_cache.row(seq)
+                loaded.append_row(row)
+                persistent_log.add(row)
+            self.log_cache = loaded
+            self.database_loaded = True
+            _log.debug(f"Loaded {len(loaded)} commands from the database.")
+
+        self.unsaved_count = 0
+        self.persistent_log = persistent_log
+
+    async def stop_persistent_log(self) -> None:
+        """Save anything queued and close the database. The cache is kept."""
+        if self.persistent_log:
+            persistent_log, self.persistent_log = self.persistent_log, None
+            await persistent_log.close()
+
     def cache_size(self) -> int:
-        return sum(sys.getsizeof(i) for i in self.log_cache)
+        return self.log_cache.nbytes
+
+    def top_name(self, kind: str, key) -> str:
+        if kind == "commands":
+            return key
+        obj: object = self.bot.get_user(key) if kind == "users" else self.bot.get_guild(key)
+        return f"{obj} ({key})" if obj is not None else str(key)
 
     def get_track_start(self) -> str:
-        if len(self.log_cache) == 100_000:  # max size
-            return "Max log size reached. Only the last 100 000 commands are stored."
+        if self.log_cache.full:
+            return (
+                "Max log size reached. Only the last "
+                f"{humanize_number(self.log_cache.capacity)} commands are stored."
+            )
+        if self.log_cache.first_seq:  # the memory budget has removed some
+            return (
+                "Max memory reached. Only the last "
+                f"{humanize_number(len(self.log_cache))} commands are stored."
+            )
 
         if discord.__version__.startswith("1"):
             ago = humanize_timedelta(timedelta=datetime.datetime.utcnow() - self.load_time)
@@ -344,7 +452,7 @@ class CmdLog(commands.Cog):
         )
 
         _log.info(logged_com)
-        self.log_cache.append(logged_com)
+        self.cache_com(logged_com)
         if self.channel_logger:
             self.channel_logger.add_command(logged_com)
 
@@ -354,6 +462,8 @@ class CmdLog(commands.Cog):
         cache_size = humanize_bytes(self.cache_size(), 1)
         cache_count = humanize_number(len(self.log_cache))
         extra = f"\nCache size: {cache_size} with {cache_count} commands."
+        if self.log_cache.max_bytes:
+            extra += f" Memory limit: {humanize_bytes(self.log_cache.max_bytes, 1)}."
         await ctx.send(main + extra)
 
     @commands.is_owner()
@@ -362,7 +472,9 @@ class CmdLog(commands.Cog):
         """
         View command logs.
 
-        Note the cache is limited to 100 000 commands, which is approximately 50MB of RAM
+        Note the cache is limited to 100 000 commands by default, which is approximately 7.7MB
+        of RAM (plus message content if that's logged). This can be changed with
+        `[p]cmdlog maxsize`, and you can also limit the memory used with `[p]cmdlog maxmemory`.
         """
 
     @cmdlog.command()
@@ -420,64 +532,315 @@ class CmdLog(commands.Cog):
         _log.debug(f"Cache size is exactly {cache_bytes} bytes.")
         cache_size = humanize_bytes(cache_bytes, 1)
         cache_count = humanize_number(len(self.log_cache))
-        await ctx.send(f"\nCache size: {cache_size} with {cache_count} commands.")
+        msg = f"\nCache size: {cache_size} with {cache_count} commands."
+        if self.log_cache.max_bytes:
+            msg += f"\nMemory limit: {humanize_bytes(self.log_cache.max_bytes, 1)}."
+        if self.persistent_log:
+            saved = humanize_number(await self.persistent_log.count())
+            msg += f"\n{saved} commands are saved to disk."
+        await ctx.send(msg)
 
     @cmdlog.command()
-    async def full(self, ctx: commands.Context):
-        """Upload all the logs that are stored in the cache."""
-        now = datetime.datetime.now().strftime(TIME_FORMAT)
-        logs = [f"[{i.time}] {i}" for i in self.log_cache]
-        log_str = f"Generated at {now}.\n" + "\n".join(logs)
-        logs_bytes = BytesIO(log_str.encode())
+    async def top(self, ctx: commands.Context, kind: str, window: str = "1h"):
+        """
+        Show the most used commands, or the users or servers using the most commands.
+
+        `kind` is one of `commands`, `users` or `servers`. `window` is how far back to look, one
+        of `1m`, `1h` (the default) or `24h`.
+
+        These are counted as commands are used, so this is instant however big the cache is. The
+        windows move in steps of 1 second, 1 minute and 15 minutes respectively, so they can be
+        up to one step shorter.
+
+        **Examples:**
+            - `[p]cmdlog top commands` - most used commands in the last hour
+            - `[p]cmdlog top users 1m` - users using the most commands in the last minute
+            - `[p]cmdlog top servers 24h` - servers using the most commands in the last day
+        """
+        kind = kind.lower()
+        if kind == "guilds":
+            kind = "servers"
+        if kind not in KINDS:
+            return await ctx.send(f"The kind must be one of {', '.join(KINDS)}.")
+        window = window.lower()
+        if window not in WINDOWS:
+            return await ctx.send(f"The window must be one of {', '.join(WINDOWS)}.")
+
+        now = time.time()
+        top = self.usage.top(kind, window, TOP_COUNT, now)
+        if not top:
+            return await ctx.send(
+                f"No commands have been used in the last {WINDOW_NAMES[window]}."
+            )
 
+        lines = [
+            f"{place:>2}. {self.top_name(kind, key)}: {humanize_number(count)}"
+            for place, (key, count) in enumerate(top, 1)
+        ]
+        total = humanize_number(self.usage.total(window, now))
         await ctx.send(
-            "Here is the command log. " + self.get_track_start(),
-            file=discord.File(logs_bytes, "cmdlog.txt"),
+            f"Top {kind} in the last {WINDOW_NAMES[window]}, out of {total} commands:"
+            + box("\n".join(lines))
         )
-        logs_bytes.close()
 
     @cmdlog.command()
-    async def user(self, ctx: commands.Context, user_id: int):
+    async def maxsize(self, ctx: commands.Context, entries: int):
         """
-        Upload all the logs that are stored for a specific User ID in the cache.
+        Set the maximum number of commands stored in the cache. Default 100 000.
+
+        Each command takes about 77 bytes, plus the message content if that's logged. Memory for
+        all of them is reserved up front. If the new size is smaller, the oldest commands are
+        dropped.
 
         **Example:**
-            - `[p]cmdlog user 418078199982063626`
+            - `[p]cmdlog maxsize 1000000` - store the last million commands (about 77MB)
         """
-        now = datetime.datetime.now().strftime(TIME_FORMAT)
-        logs = [f"[{i.time}] {i}" for i in self.log_cache if i.user.id == user_id]
-        log_str = f"Generated at {now} for user {user_id}.\n" + (
-            "\n".join(logs) or "It looks like I didn't find anything for that user."
-        )  # happy doing this because of file previews
-        logs_bytes = BytesIO(log_str.encode())
+        if not 1000 <= entries <= 10_000_000:
+            return await ctx.send("The size must be between 1000 and 10 000 000 commands.")
+        max_bytes = self.log_cache.max_bytes
+        if max_bytes and RESERVED_BYTES * entries >= max_bytes:
+            return await ctx.send(
+                f"That many commands needs more than the memory limit of "
+                f"{humanize_bytes(max_bytes, 1)}. Raise it with `{ctx.clean_prefix}cmdlog "
+                "maxmemory` first."
+            )
 
+        await self.config.max_commands.set(entries)
+        self.log_cache = self.log_cache.resized(entries)
+        size = humanize_bytes(self.cache_size(), 1)
         await ctx.send(
-            f"Here is the command log for user {user_id}. " + self.get_track_start(),
-            file=discord.File(logs_bytes, f"cmdlog_{user_id}.txt"),
+            f"The cache will now store up to {humanize_number(entries)} commands. It's currently "
+            f"using {size}."
         )
-        logs_bytes.close()
 
-    @cmdlog.command(aliases=["guild"])
-    async def server(self, ctx: commands.Context, server_id: int):
+    @cmdlog.command()
+    async def maxmemory(self, ctx: commands.Context, size: BytesConverter):
         """
-        Upload all the logs that are stored for for a specific server ID in the cache.
+        Set the maximum memory the cache can use. Default none.
 
-        **Example:**
-            - `[p]cmdlog server 527961662716772392`
+        When the cache goes over this, the oldest commands are dropped until it's under again,
+        even if there's space for more commands (see `[p]cmdlog maxsize`). This is most useful
+        if message content is logged, as that's what varies in size.
+
+        Use a size like `50MB` or `1.5GB`, or `0` to remove the limit.
+
+        **Examples:**
+            - `[p]cmdlog maxmemory 50MB` - use at most 50MB
+            - `[p]cmdlog maxmemory 0` - no limit
         """
-        now = datetime.datetime.now().strftime(TIME_FORMAT)
-        logs = [f"[{i.time}] {i}" for i in self.log_cache if i.guild and i.guild.id == server_id]
+        if size and size <= self.log_cache.reserved_nbytes:
+            return await ctx.send(
+                f"The cache reserves {humanize_bytes(self.log_cache.reserved_nbytes, 1)} up front "
+                "for its current maximum size, so the limit must be more than that. Lower it "
+                f"with `{ctx.clean_prefix}cmdlog maxsize` first."
+            )
 
-        log_str = f"Generated at {now} for server {server_id}.\n" + (
-            "\n".join(logs) or "It looks like I didn't find anything for that user."
-        )  # happy doing this because of file previews
-        logs_bytes = BytesIO(log_str.encode())
+        await self.config.max_bytes.set(size)
+        self.log_cache.set_max_bytes(size or None)
+        if not size:
+            return await ctx.send("The cache no longer has a memory limit.")
+        used = humanize_bytes(self.cache_size(), 1)
+        await ctx.send(
+            f"The cache will now use at most {humanize_bytes(size, 1)}. It's currently using "
+            f"{used} with {humanize_number(len(self.log_cache))} commands."
+        )
+
+    @cmdlog.command()
+    async def persist(self, ctx: commands.Context, enabled: bool, days: int = 30):
+        """
+        Set whether the command cache should be saved to disk, so it survives restarts. Default
+        false.
+
+        Commands are saved every few seconds. Ones older than `days` (default 30) are deleted,
+        and only the most recent 10 million are kept. When the cog loads, the most recent saved
+        commands that fit in the cache (see `[p]cmdlog maxsize`) are loaded back into it.
+
+        Please be aware this permanently stores End User Data, like `[p]cmdlog channel`.
+
+        **Examples:**
+            - `[p]cmdlog persist true` - save commands for 30 days
+            - `[p]cmdlog persist true 7` - save commands for 7 days
+            - `[p]cmdlog persist false` - stop saving commands
+        """
+        if not 1 <= days <= 3650:
+            return await ctx.send("The number of days must be between 1 and 3650.")
+
+        await self.config.persist.set(enabled)
+        await self.config.persist_days.set(days)
+
+        if not enabled:
+            await self.stop_persistent_log()
+            return await ctx.send(
+                "Commands will no longer be saved to disk. Commands that have already been saved "
+                "haven't been deleted, and will be loaded again if you turn this back on."
+            )
+
+        if self.persistent_log:
+            self.persistent_log.days = days
+            await self.persistent_log.compact()
+        else:
+            async with ctx.typing():
+                await self.start_persistent_log(days)
+            if self.persistent_log is None:
+                return await ctx.send(
+                    "Something went wrong opening the database. Check your logs for details."
+                )
 
         await ctx.send(
-            f"Here is the command log for server {server_id}. " + self.get_track_start(),
-            file=discord.File(logs_bytes, f"cmdlog_{server_id}.txt"),
+            f"Commands will now be saved to disk for {days} days. Please be aware of the privacy "
+            "implications of permanently logging End User Data and that you are responsible for "
+            "it."
+        )
+
+    async def send_logs(
+        self,
+        ctx: commands.Context,
+        seqs: Iterable[int],
+        for_str: str,
+        filename: str,
+        flags: ExportFlags,
+        empty: str = "It looks like I didn't find anything.",
+    ) -> None:
+        """Upload the logs as gzipped files, split into parts under the upload limit."""
+        if flags.since:
+            for_str += f" since {format_time(flags.since)}"
+        now = datetime.datetime.now().strftime(TIME_FORMAT)
+        chunks = format_chunks(
+            self.log_cache, seqs, flags.format, f"Generated at {now} for {for_str}."
+        )
+        limit = ctx.guild.filesize_limit if ctx.guild else None
+
+        part = 0
+        async with ctx.typing():
+            async for buffer in gzip_parts(chunks, limit):
+                part += 1
+                if part == 1:
+                    msg = f"Here is the command log for {for_str}. " + self.get_track_start()
+                    name = f"{filename}.{flags.format}.gz"
+                else:
+                    msg = f"Part {part} of the command log for {for_str}."
+                    name = f"{filename}_{part}.{flags.format}.gz"
+                await ctx.send(msg, file=discord.File(buffer, name))
+                buffer.close()
+
+        if part == 0:
+            await ctx.send(empty)
+
+    @cmdlog.command()
+    async def full(self, ctx: commands.Context, *, flags: FlagsConverter = None):
+        """
+        Upload all the logs that are stored in the cache.
+
+        Add `--since <time>` to only get logs since then, see `[p]cmdlog range` for the formats.
+
+        Logs are uploaded gzipped, split into multiple files if they're too big. Add
+        `--format <txt|jsonl|csv>` to change the format, the default is txt.
+
+        **Examples:**
+            - `[p]cmdlog full`
+            - `[p]cmdlog full --since 2h`
+            - `[p]cmdlog full --format csv`
+        """
+        flags = flags or ExportFlags()
+        seqs = self.log_cache.find(start=flags.since)
+        await self.send_logs(ctx, seqs, "all commands", "cmdlog", flags)
+
+    @cmdlog.command(name="range")
+    async def cmdlog_range(
+        self,
+        ctx: commands.Context,
+        start: TimeConverter,
+        end: Optional[TimeConverter] = None,
+        *,
+        flags: FlagsConverter = None,
+    ):
+        """
+        Upload all the logs that are stored in the cache between two times.
+
+        Times can be relative to now (eg `2h` for 2 hours ago, or `1d2h`) or in the bot's local
+        time (eg `14:00` for today, or `"2022-01-30 14:00"`). If there are spaces, enclose the
+        time in ". If you don't give an end time, it's now.
+
+        Add `--format <txt|jsonl|csv>` to change the format, the default is txt.
+
+        **Examples:**
+            - `[p]cmdlog range 14:00 14:05`
+            - `[p]cmdlog range "2022-01-30 14:00" "2022-01-30 18:00"`
+            - `[p]cmdlog range 3h 2h`
+            - `[p]cmdlog range 30m --format jsonl`
+        """
+        if end is not None and end <= start:
+            return await ctx.send("The end time must be after the start time.")
+
+        now = datetime.datetime.now().strftime(TIME_FORMAT)
+        seqs = self.log_cache.find(start=start, end=end)
+        for_str = f"{format_time(start)} to {format_time(end) if end else now}"
+        await self.send_logs(
+            ctx,
+            seqs,
+            for_str,
+            "cmdlog_range",
+            (flags or ExportFlags())._replace(since=None),
+            "It looks like I didn't find anything in that time.",
+        )
+
+    @cmdlog.command()
+    async def user(self, ctx: commands.Context, user_id: int, *, command: Optional[str] = None):
+        """
+        Upload all the logs that are stored for a specific User ID in the cache.
+
+        You can also give a command to only get the logs for that command (or its subcommands)
+        from the user, and add `--since <time>` to only get logs since then (see
+        `[p]cmdlog range` for the formats).
+
+        Add `--format <txt|jsonl|csv>` to change the format, the default is txt.
+
+        **Examples:**
+            - `[p]cmdlog user 418078199982063626`
+            - `[p]cmdlog user 418078199982063626 playlist`
+            - `[p]cmdlog user 418078199982063626 playlist --since 1d --format csv`
+        """
+        command, flags = split_flags(command)
+        seqs = self.log_cache.find(user_id=user_id, command=command, start=flags.since)
+        for_str = f"user {user_id}" + (f" and command '{command}'" if command else "")
+        await self.send_logs(
+            ctx,
+            seqs,
+            for_str,
+            f"cmdlog_{user_id}",
+            flags,
+            "It looks like I didn't find anything for that user.",
+        )
+
+    @cmdlog.command(aliases=["guild"])
+    async def server(
+        self, ctx: commands.Context, server_id: int, *, command: Optional[str] = None
+    ):
+        """
+        Upload all the logs that are stored for for a specific server ID in the cache.
+
+        You can also give a command to only get the logs for that command (or its subcommands)
+        in the server, and add `--since <time>` to only get logs since then (see
+        `[p]cmdlog range` for the formats).
+
+        Add `--format <txt|jsonl|csv>` to change the format, the default is txt.
+
+        **Examples:**
+            - `[p]cmdlog server 527961662716772392`
+            - `[p]cmdlog server 527961662716772392 playlist`
+            - `[p]cmdlog server 527961662716772392 --since 2022-01-30 --format jsonl`
+        """
+        command, flags = split_flags(command)
+        seqs = self.log_cache.find(guild_id=server_id, command=command, start=flags.since)
+        for_str = f"server {server_id}" + (f" and command '{command}'" if command else "")
+        await self.send_logs(
+            ctx,
+            seqs,
+            for_str,
+            f"cmdlog_{server_id}",
+            flags,
+            "It looks like I didn't find anything for that server.",
         )
-        logs_bytes.close()
 
     @cmdlog.command()
     async def command(self, ctx: commands.Context, *, command: str):
@@ -490,23 +853,27 @@ class CmdLog(commands.Cog):
         You can search for a group command (eg `cmdlog`) or a full command (eg `cmdlog user`).
         As arguments are not stored, you cannot search for them.
 
+        Add `--since <time>` to only get logs since then, see `[p]cmdlog range` for the formats.
+        Add `--format <txt|jsonl|csv>` to change the format, the default is txt.
+
         **Examples:**
             - `[p]cmdlog command ping`
             - `[p]cmdlog command playlist`
             - `[p]cmdlog command playlist create`
+            - `[p]cmdlog command playlist create --since 12h --format csv`
         """
         # not checking if a command exists because want to allow for this to find it if it was
         # unloaded (eg if com was found to be intensive, see if it was one user spamming it)
-        now = datetime.datetime.now().strftime(TIME_FORMAT)
-        logs = [f"[{i.time}] {i}" for i in self.log_cache if i.command.startswith(command)]
-
-        log_str = f"Generated at {now} for command '{command}'.\n" + (
-            "\n".join(logs) or "It looks like I didn't find anything for that command."
-        )  # happy doing this because of file previews
-        logs_bytes = BytesIO(log_str.encode())
-
-        await ctx.send(
-            f"Here is the command log for command '{command}'. " + self.get_track_start(),
-            file=discord.File(logs_bytes, f"cmdlog_{command.replace(' ', '_')}.txt"),
+        search, flags = split_flags(command)
+        if search is None:
+            return await ctx.send_help()
+
+        seqs = self.log_cache.find(command=search, start=flags.since)
+        await self.send_logs(
+            ctx,
+            seqs,
+            f"command '{search}'",
+            f"cmdlog_{search.replace(' ', '_')}",
+            flags,
+            "It looks like I didn't find anything for that command.",
         )
-        logs_bytes.close()
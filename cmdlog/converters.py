@@ -0,0 +1,107 @@
+import datetime
+import re
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple
+
+from dateutil.parser import parse as parse_datetime
+from redbot.core.commands import BadArgument, Context, Converter, parse_timedelta
+
+from cmdlog.export import EXPORT_FORMATS
+
+
+def parse_time(argument: str) -> float:
+    """Parse a time to an epoch timestamp.
+
+    This can be relative to now (eg `2h` for 2 hours ago) or absolute in the bot's local time
+    (eg `14:00` for today, or `2022-01-30 14:00`).
+
+    Raises
+    ------
+    BadArgument
+        If it's not a valid time
+    """
+    delta = parse_timedelta(argument)
+    if delta is not None:
+        return (datetime.datetime.now() - delta).timestamp()
+
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        return parse_datetime(argument, default=today).timestamp()
+    except (ValueError, OverflowError):
+        raise BadArgument(f"`{argument}` isn't a valid time.")
+
+
+BYTE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+BYTES_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmg]?b?)$", re.IGNORECASE)
+
+
+def parse_bytes(argument: str) -> int:
+    """Parse a size in bytes, optionally with a unit (eg `50MB`, `1.5GB`).
+
+    Raises
+    ------
+    BadArgument
+        If it's not a valid size
+    """
+    match = BYTES_RE.match(argument.strip())
+    if match is None:
+        raise BadArgument(f"`{argument}` isn't a valid size. Try something like `50MB`.")
+    number, unit = match.groups()
+    return int(float(number) * BYTE_UNITS[unit.lower().rstrip("b")])
+
+
+class ExportFlags(NamedTuple):
+    since: Optional[float] = None
+    format: str = "txt"
+
+
+FLAG_RE = re.compile(r"(?:^|\s)--(since|format)(?:\s+|$)")
+
+
+def split_flags(argument: Optional[str]) -> Tuple[Optional[str], ExportFlags]:
+    """Split `--since <time>` and `--format <txt|jsonl|csv>` flags from the end of an argument.
+
+    Returns
+    -------
+    Tuple[Optional[str], ExportFlags]
+        The rest of the argument (None if empty) and the flags
+    """
+    if argument is None:
+        return None, ExportFlags()
+
+    parts = FLAG_RE.split(argument)
+    since = None
+    fmt = "txt"
+    for name, value in zip(parts[1::2], parts[2::2]):
+        value = value.strip()
+        if not value:
+            raise BadArgument(f"You need to give a value after `--{name}`.")
+        if name == "since":
+            since = parse_time(value)
+        elif value.lower() in EXPORT_FORMATS:
+            fmt = value.lower()
+        else:
+            raise BadArgument(f"The format must be one of {', '.join(EXPORT_FORMATS)}.")
+    return parts[0].strip() or None, ExportFlags(since, fmt)
+
+
+if TYPE_CHECKING:
+    TimeConverter = float
+    BytesConverter = int
+    FlagsConverter = Optional[ExportFlags]
+
+else:
+
+    class TimeConverter(Converter):
+        async def convert(self, ctx: Context, argument: str) -> float:
+            return parse_time(argument)
+
+    class BytesConverter(Converter):
+        async def convert(self, ctx: Context, argument: str) -> int:
+            return parse_bytes(argument)
+
+    class FlagsConverter(Converter):
+        async def convert(self, ctx: Context, argument: str) -> ExportFlags:
+            rest, flags = split_flags(argument)
+            if rest is not None:
+                raise BadArgument(f"I don't know what to do with `{rest}`.")
+            return flags
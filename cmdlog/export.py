@@ -0,0 +1,146 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from cmdlog.store import LogRow, LogStore
+
+EXPORT_FORMATS = ("txt", "jsonl", "csv")
+CHUNK_SIZE = 1000  # entries formatted at a time, between yielding to the event loop
+# chunks are also cut at this many characters, so one is always far smaller than an upload, even
+# with long message content logged
+CHUNK_CHARS = 256 * 1024
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+# room for the gzip trailer and deflate's small worst case expansion of a chunk
+UPLOAD_MARGIN = 64 * 1024
+COMPRESS_LEVEL = 6  # gzip's default of 9 is a lot slower for very little gain on logs
+
+CSV_HEADER = [
+    "time",
+    "type",
+    "command",
+    "user_id",
+    "user_name",
+    "guild_id",
+    "guild_name",
+    "channel_id",
+    "channel_name",
+    "msg_id",
+    "target_id",
+    "target_name",
+    "content",
+]
+
+# app_type (1-3) names, for app commands
+APP_TYPES = {1: "slash", 2: "user", 3: "message"}
+
+
+def row_type(row: LogRow) -> str:
+    kind = row.flags & 3
+    if kind == 0:
+        return "command"
+    if kind == 1:
+        return "error"
+    return APP_TYPES.get(row.flags >> 2, "app")
+
+
+def row_values(row: LogRow) -> list:
+    """Get the values for the JSONL/CSV columns. IDs of 0 (none) are None."""
+    return [
+        row.time,
+        row_type(row),
+        row.command,
+        row.user_id,
+        row.user_name,
+        row.guild_id or None,
+        row.guild_name or None,
+        row.channel_id or None,
+        row.channel_name or None,
+        row.msg_id or None,
+        row.target_id or None,
+        row.target_name or None,
+        row.content,
+    ]
+
+
+def format_chunks(store: LogStore, seqs: Iterable[int], fmt: str, header: str) -> Iterator[str]:
+    """Format the entries, a chunk at a time, so the whole log is never in memory as text.
+
+    Nothing is yielded if there are no entries.
+
+    Parameters
+    ----------
+    store : LogStore
+        Store the entries are in
+    seqs : Iterable[int]
+        Sequence numbers of the entries, any which have since been evicted are skipped
+    fmt : str
+        One of `EXPORT_FORMATS`
+    header : str
+        First line for txt exports
+    """
+    out = io.StringIO()
+    writer = csv.writer(out)
+    # the header goes with the first chunk, so it's never in a part on its own
+    if fmt == "txt":
+        out.write(header + "\n")
+    elif fmt == "csv":
+        writer.writerow(CSV_HEADER)
+
+    count = 0
+    for seq in seqs:
+        if seq < store.first_seq:  # evicted while exporting
+            continue
+
+        if fmt == "txt":
+            entry = store.get(seq)
+            out.write(f"[{entry.time}] {entry}\n")
+        elif fmt == "jsonl":
+            out.write(json.dumps(dict(zip(CSV_HEADER, row_values(store.row(seq))))) + "\n")
+        else:
+            writer.writerow(row_values(store.row(seq)))
+        count += 1
+
+        if count == CHUNK_SIZE or out.tell() >= CHUNK_CHARS:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            count = 0
+
+    if count:
+        yield out.getvalue()
+
+
+async def gzip_parts(
+    chunks: Iterator[str], upload_limit: Optional[int] = None
+) -> AsyncIterator[io.BytesIO]:
+    """Compress chunks of text into gzip files, starting a new one before the upload limit.
+
+    Yields to the event loop between chunks, so a big export doesn't block the bot.
+    """
+    limit = (upload_limit or DEFAULT_UPLOAD_LIMIT) - UPLOAD_MARGIN
+    buffer = io.BytesIO()
+    gz = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=COMPRESS_LEVEL)
+    written = False
+
+    for chunk in chunks:
+        data = chunk.encode()
+        # everything written so far has been flushed, so tell is the real size. compressing never
+        # makes a chunk much bigger, so if it fits uncompressed it fits in this part
+        if written and buffer.tell() + len(data) > limit:
+            gz.close()
+            buffer.seek(0)
+            yield buffer
+            buffer = io.BytesIO()
+            gz = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=COMPRESS_LEVEL)
+        gz.write(data)
+        gz.flush()
+        written = True
+        await asyncio.sleep(0)
+
+    gz.close()
+    if written:
+        buffer.seek(0)
+        yield buffer
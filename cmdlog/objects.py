@@ -1,5 +1,6 @@
 import datetime
 from dataclasses import dataclass
+from functools import lru_cache
 from sys import getsizeof
 from typing import Optional, Union
 
@@ -10,6 +11,12 @@ from discord.guild import Guild
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
+@lru_cache(maxsize=256)  # exports format lots of entries from the same second in a row
+def format_time(timestamp: float) -> str:
+    """Format an epoch timestamp in the bot's local time, for output."""
+    return datetime.datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT)
+
+
 @dataclass(repr=False)  # repr=False will prevent data held here going to sentry if an error occurs
 class IDFKWhatToNameThis:
     id: int
@@ -66,7 +73,12 @@ class LogMixin:
             t_name = target.name if isinstance(target, discord.User) else ""
             self.target = IDFKWhatToNameThis(id=target.id, name=t_name)
 
-        self.time = datetime.datetime.now().strftime(TIME_FORMAT)
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    @property
+    def time(self) -> str:
+        """The time it was used, formatted for output."""
+        return format_time(self.timestamp)
 
     def __str__(self) -> str:
         raise NotImplementedError()
@@ -80,7 +92,7 @@ class LogMixin:
         size += getsizeof(self.msg_id)
         size += getsizeof(self.channel)
         size += getsizeof(self.guild)
-        size += getsizeof(self.time)
+        size += getsizeof(self.timestamp)
         size += getsizeof(self.target)
 
         return size
@@ -0,0 +1,186 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import sqlite3
+import time
+from typing import List, Optional
+
+from cmdlog.store import LogRow, LogStore
+
+_log = logging.getLogger("red.vex.cmdlog.persist")
+
+FLUSH_INTERVAL = 10  # seconds between writes of queued commands
+COMPACT_INTERVAL = 6 * 60 * 60  # seconds between removing old commands
+MAX_ROWS = 10_000_000  # the oldest commands after this many are removed when compacting
+
+# auto_vacuum has to be set before the table is made, so space from deleted rows can be freed
+SCHEMA = """
+PRAGMA auto_vacuum = INCREMENTAL;
+CREATE TABLE IF NOT EXISTS commands (
+    time INTEGER NOT NULL,
+    flags INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    user_name TEXT NOT NULL,
+    guild_id INTEGER NOT NULL,
+    guild_name TEXT NOT NULL,
+    channel_id INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    msg_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    target_name TEXT NOT NULL,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS commands_time ON commands (time);
+"""
+
+INSERT = "INSERT INTO commands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+class PersistentLog:
+    """An optional SQLite copy of the command log, so it survives restarts.
+
+    Commands are queued in memory with `add` and written in batches by a background task, so
+    logging a command never waits on disk. Commands older than the retention period, or past
+    `MAX_ROWS`, are removed periodically.
+    """
+
+    def __init__(self, path: str, days: int):
+        """
+        Parameters
+        ----------
+        path : str
+            The full path to the database file.
+        days : int
+            Number of days to keep commands for.
+        """
+        self.path = path
+        self.days = days
+
+        self.sql_executor = concurrent.futures.ThreadPoolExecutor(1, "cmdlog_sql")
+        self.connection: Optional[sqlite3.Connection] = None
+
+        self._pending: List[LogRow] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __repr__(self) -> str:
+        return f"<PersistentLog path={self.path} days={self.days} pending={len(self._pending)}>"
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.sql_executor, functools.partial(func, *args))
+
+    # ######################################## BLOCKING ########################################
+    # these all run in sql_executor, don't call them directly
+
+    def _open(self) -> None:
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, fewer fsyncs
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _write(self, pending: List[LogRow]) -> None:
+        assert self.connection is not None
+        with self.connection:  # one transaction for the whole batch
+            self.connection.executemany(INSERT, pending)
+
+    def _compact(self) -> int:
+        assert self.connection is not None
+        cutoff = int(time.time()) - self.days * 24 * 60 * 60
+        with self.connection:
+            removed = self.connection.execute(
+                "DELETE FROM commands WHERE time < ?", (cutoff,)
+            ).rowcount
+            removed += self.connection.execute(
+                "DELETE FROM commands WHERE rowid <= (SELECT MAX(rowid) FROM commands) - ?",
+                (MAX_ROWS,),
+            ).rowcount
+        if removed:
+            # give the space back and stop the WAL file growing
+            self.connection.execute("PRAGMA incremental_vacuum")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def _load(self, capacity: int, max_bytes: Optional[int]) -> LogStore:
+        assert self.connection is not None
+        rows = self.connection.execute(
+            "SELECT * FROM (SELECT rowid, * FROM commands ORDER BY rowid DESC LIMIT ?) "
+            "ORDER BY rowid",
+            (capacity,),
+        )
+        store = LogStore(capacity, max_bytes)
+        for row in rows:
+            store.append_row(LogRow(*row[1:]))
+        return store
+
+    def _count(self) -> int:
+        assert self.connection is not None
+        return self.connection.execute("SELECT COUNT(*) FROM commands").fetchone()[0]
+
+    # ########################################## ASYNC ##########################################
+
+    async def start(self) -> None:
+        """Open the database, creating it if needed, and start the background writer."""
+        await self._run(self._open)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Write anything still queued and close the database."""
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self.flush()
+        await self._run(self._close)
+        self.sql_executor.shutdown()
+
+    def add(self, row: LogRow) -> None:
+        """Queue a command to be saved. Doesn't block."""
+        if self.connection is None:  # not started, or failed to
+            return
+        self._pending.append(row)
+
+    async def flush(self) -> None:
+        """Write all queued commands in one transaction."""
+        if not self._pending or self.connection is None:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await self._run(self._write, pending)
+        except Exception:
+            _log.warning(f"Unable to save {len(pending)} commands.", exc_info=True)
+
+    async def compact(self) -> None:
+        """Remove commands older than the retention period or past the maximum number."""
+        try:
+            removed = await self._run(self._compact)
+            _log.debug(f"Removed {removed} old commands from the database.")
+        except Exception:
+            _log.warning("Unable to remove old commands from the database.", exc_info=True)
+
+    async def _flush_loop(self) -> None:
+        await self.compact()
+        last_compact = time.monotonic()
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+            if time.monotonic() - last_compact > COMPACT_INTERVAL:
+                await self.compact()
+                last_compact = time.monotonic()
+
+    async def load(self, capacity: int, max_bytes: Optional[int] = None) -> LogStore:
+        """Get a new store with the most recent saved commands that fit in it.
+
+        The store is built in the SQL thread, so the bot isn't blocked while it's filled.
+        """
+        return await self._run(self._load, capacity, max_bytes)
+
+    async def count(self) -> int:
+        """Get the number of commands saved."""
+        await self.flush()
+        return await self._run(self._count)
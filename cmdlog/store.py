@@ -0,0 +1,519 @@
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge
+from sys import getsizeof
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Type, Union
+
+from cmdlog.objects import (
+    IDFKWhatToNameThis,
+    LoggedAppCom,
+    LoggedComError,
+    LoggedCommand,
+    LogMixin,
+)
+
+LoggedType = Union[LoggedCommand, LoggedComError, LoggedAppCom]
+
+# lower 2 bits of the flags are the kind, the app_type (1-3, or 0 for text commands) is above
+KINDS: List[Type[LogMixin]] = [LoggedCommand, LoggedComError, LoggedAppCom]
+
+# bytes in the arrays for each entry: 6 8 byte IDs/times, 5 4 byte intern table indexes,
+# 1 byte of flags and the 8 byte pointer in the contents list
+RESERVED_BYTES = 6 * 8 + 5 * 4 + 1 + 8
+# approximate overheads for memory accounting, on top of the str objects and sequence numbers
+INTERN_BYTES = 120  # dict entry, list slots and refcount int for each string in a table
+INDEX_KEY_BYTES = 250  # dict entry, key, SeqList and array for each user/guild/command indexed
+
+
+class LogRow(NamedTuple):
+    """One entry, with names instead of intern table indexes. IDs are 0 and names empty when
+    there isn't one."""
+
+    time: int
+    flags: int
+    command: str
+    user_id: int
+    user_name: str
+    guild_id: int
+    guild_name: str
+    channel_id: int
+    channel_name: str
+    msg_id: int
+    target_id: int
+    target_name: str
+    content: Optional[str]
+
+
+class InternTable:
+    """A reference counted table of strings, so each distinct name is only stored once.
+
+    Indexes of strings no longer referenced are reused, so the table doesn't grow forever.
+    """
+
+    def __init__(self) -> None:
+        self.strings: List[Optional[str]] = []
+        self.refs: List[int] = []
+        self.index: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.nbytes = 0  # approximate, updated as strings are added and freed
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __repr__(self) -> str:
+        return f"<InternTable strings={len(self.index)} free={len(self.free)}>"
+
+    def add(self, string: str) -> int:
+        """Get the index for a string, adding it if needed, and add a reference to it."""
+        if (i := self.index.get(string)) is None:
+            if self.free:
+                i = self.free.pop()
+                self.strings[i] = string
+                self.refs[i] = 0
+            else:
+                i = len(self.strings)
+                self.strings.append(string)
+                self.refs.append(0)
+            self.index[string] = i
+            self.nbytes += getsizeof(string) + INTERN_BYTES
+        self.refs[i] += 1
+        return i
+
+    def release(self, i: int) -> None:
+        """Remove a reference to a string, freeing it if it's no longer used."""
+        self.refs[i] -= 1
+        if self.refs[i] == 0:
+            string = self.strings[i]
+            assert string is not None
+            del self.index[string]
+            self.strings[i] = None
+            self.free.append(i)
+            self.nbytes -= getsizeof(string) + INTERN_BYTES
+
+    def get(self, i: int) -> str:
+        string = self.strings[i]
+        assert string is not None
+        return string
+
+
+class SeqList:
+    """An ascending list of sequence numbers, which only has items added to the end and removed
+    from the start."""
+
+    def __init__(self) -> None:
+        self.seqs = array("q")
+        self.start = 0  # removed items are only deleted from the array once there's enough
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.seqs[self.start :])
+
+    def __repr__(self) -> str:
+        return f"<SeqList len={len(self)}>"
+
+    def append(self, seq: int) -> None:
+        self.seqs.append(seq)
+
+    def between(self, start: int, end: int) -> Tuple[int, int]:
+        """Get the array indexes of the sequence numbers from start (inclusive) to end
+        (exclusive), with a binary search."""
+        return (
+            bisect_left(self.seqs, start, self.start),
+            bisect_left(self.seqs, end, self.start),
+        )
+
+    def popleft(self) -> int:
+        seq = self.seqs[self.start]
+        self.start += 1
+        if self.start > 64 and self.start * 2 > len(self.seqs):
+            del self.seqs[: self.start]
+            self.start = 0
+        return seq
+
+
+class LogStore:
+    """A fixed capacity ring of logged commands, stored in parallel typed arrays.
+
+    Each entry takes about 80 bytes (plus message content, if it's logged), instead of the
+    objects themselves which are several hundred. Names are stored once in an intern table.
+
+    Entries are identified by a sequence number, which increases by one for every entry ever
+    added. The entries currently stored are ``range(store.first_seq, store.next_seq)``.
+
+    There are also indexes of user ID, server ID and command name to sequence numbers, which
+    are kept in step with the ring, so searches don't need to look at every entry.
+
+    Memory use is tracked as entries are added and removed, so `nbytes` is always cheap.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of entries, the oldest are overwritten after this
+    max_bytes : Optional[int]
+        Memory budget, the oldest entries are removed to stay under this
+    """
+
+    def __init__(self, capacity: int, max_bytes: Optional[int] = None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.next_seq = 0  # sequence number of the next entry
+        self.size = 0
+
+        self.times = array("q", bytes(8 * capacity))  # epoch seconds
+        self.user_ids = array("Q", bytes(8 * capacity))
+        self.guild_ids = array("Q", bytes(8 * capacity))  # 0 if in DMs
+        self.channel_ids = array("Q", bytes(8 * capacity))
+        self.msg_ids = array("Q", bytes(8 * capacity))  # 0 for app commands
+        self.target_ids = array("Q", bytes(8 * capacity))  # 0 if no target
+        self.commands = array("I", bytes(4 * capacity))  # index in command_names
+        self.user_names = array("I", bytes(4 * capacity))  # the rest are index in names
+        self.guild_names = array("I", bytes(4 * capacity))
+        self.channel_names = array("I", bytes(4 * capacity))
+        self.target_names = array("I", bytes(4 * capacity))
+        self.flags = array("B", bytes(capacity))
+        # content is (almost) always unique, so isn't worth interning. None when not logged
+        self.contents: List[Optional[str]] = [None] * capacity
+
+        self.command_names = InternTable()
+        self.names = InternTable()
+
+        self.by_user: Dict[int, SeqList] = {}
+        self.by_guild: Dict[int, SeqList] = {}
+        self.by_command: Dict[str, SeqList] = {}
+        self.sorted_commands: List[str] = []  # for prefix searches
+
+        self.reserved_nbytes = RESERVED_BYTES * capacity  # the arrays never change size
+        self.variable_nbytes = 0  # content and indexes. intern tables track their own
+
+    def __repr__(self) -> str:
+        return f"<LogStore size={self.size} capacity={self.capacity}>"
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[LoggedType]:
+        """Iterate over the entries, oldest first."""
+        for seq in range(self.first_seq, self.next_seq):
+            yield self.get(seq)
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest entry."""
+        return self.next_seq - self.size
+
+    @property
+    def full(self) -> bool:
+        return self.size == self.capacity
+
+    def _evict(self, i: int) -> None:
+        # the evicted entry is the oldest, so it's at the start of each index it's in
+        self._unindex(self.by_user, self.user_ids[i])
+        if self.guild_ids[i]:
+            self._unindex(self.by_guild, self.guild_ids[i])
+        command = self.command_names.get(self.commands[i])
+        if self._unindex(self.by_command, command):
+            del self.sorted_commands[bisect_left(self.sorted_commands, command)]
+
+        self.command_names.release(self.commands[i])
+        self.names.release(self.user_names[i])
+        if self.guild_ids[i]:
+            self.names.release(self.guild_names[i])
+            self.names.release(self.channel_names[i])
+        if self.target_ids[i]:
+            self.names.release(self.target_names[i])
+        if (content := self.contents[i]) is not None:
+            self.variable_nbytes -= getsizeof(content)
+            self.contents[i] = None
+
+    def _evict_oldest(self) -> None:
+        self._evict(self.first_seq % self.capacity)
+        self.size -= 1
+
+    def _enforce_budget(self) -> None:
+        if self.max_bytes:
+            while self.nbytes > self.max_bytes and self.size > 1:
+                self._evict_oldest()
+
+    def set_max_bytes(self, max_bytes: Optional[int]) -> None:
+        """Change the memory budget, removing the oldest entries if it's now over."""
+        self.max_bytes = max_bytes
+        self._enforce_budget()
+
+    def append(self, entry: LogMixin, timestamp: Optional[float] = None) -> int:
+        """Add an entry, overwriting the oldest one if the store is full.
+
+        Parameters
+        ----------
+        entry : LogMixin
+            The logged command
+        timestamp : Optional[float]
+            Epoch time it was used, defaults to the entry's timestamp
+
+        Returns
+        -------
+        int
+            The sequence number of the entry
+        """
+        if timestamp is None:
+            timestamp = entry.timestamp
+        in_guild = entry.guild and entry.channel
+        return self.append_row(
+            LogRow(
+                int(timestamp),
+                KINDS.index(type(entry)) | ((entry.app_type or 0) << 2),
+                entry.command,
+                entry.user.id,
+                entry.user.name,
+                entry.guild.id if in_guild else 0,  # type:ignore
+                entry.guild.name if in_guild else "",  # type:ignore
+                entry.channel.id if in_guild else 0,  # type:ignore
+                entry.channel.name if in_guild else "",  # type:ignore
+                getattr(entry, "msg_id", None) or 0,
+                entry.target.id if entry.target else 0,
+                entry.target.name if entry.target else "",
+                entry.content,
+            )
+        )
+
+    def append_row(self, row: LogRow) -> int:
+        """Add an entry from its row, overwriting the oldest one if the store is full.
+
+        Returns
+        -------
+        int
+            The sequence number of the entry
+        """
+        seq = self.next_seq
+        i = seq % self.capacity
+        if self.full:
+            self._evict(i)
+        else:
+            self.size += 1
+        self.next_seq += 1
+
+        # times must never go backwards (eg if the clock is changed) so they can be bisected
+        self.times[i] = max(row.time, self.times[(seq - 1) % self.capacity]) if seq else row.time
+        self.flags[i] = row.flags
+        self.commands[i] = self.command_names.add(row.command)
+        self.user_ids[i] = row.user_id
+        self.user_names[i] = self.names.add(row.user_name)
+        self.guild_ids[i] = row.guild_id
+        self.channel_ids[i] = row.channel_id
+        if row.guild_id:
+            self.guild_names[i] = self.names.add(row.guild_name)
+            self.channel_names[i] = self.names.add(row.channel_name)
+        self.msg_ids[i] = row.msg_id
+        self.target_ids[i] = row.target_id
+        if row.target_id:
+            self.target_names[i] = self.names.add(row.target_name)
+        self.contents[i] = row.content
+        if row.content is not None:
+            self.variable_nbytes += getsizeof(row.content)
+
+        self._index(self.by_user, row.user_id, seq)
+        if row.guild_id:
+            self._index(self.by_guild, row.guild_id, seq)
+        if self._index(self.by_command, row.command, seq):
+            insort(self.sorted_commands, row.command)
+
+        self._enforce_budget()
+
+        return seq
+
+    def row(self, seq: int) -> LogRow:
+        """Get the row for an entry, eg for saving it elsewhere.
+
+        Raises
+        ------
+        IndexError
+            If the entry isn't stored (anymore)
+        """
+        if not self.first_seq <= seq < self.next_seq:
+            raise IndexError(f"Entry {seq} isn't stored")
+        i = seq % self.capacity
+        guild_id = self.guild_ids[i]
+        target_id = self.target_ids[i]
+        return LogRow(
+            self.times[i],
+            self.flags[i],
+            self.command_names.get(self.commands[i]),
+            self.user_ids[i],
+            self.names.get(self.user_names[i]),
+            guild_id,
+            self.names.get(self.guild_names[i]) if guild_id else "",
+            self.channel_ids[i],
+            self.names.get(self.channel_names[i]) if guild_id else "",
+            self.msg_ids[i],
+            target_id,
+            self.names.get(self.target_names[i]) if target_id else "",
+            self.contents[i],
+        )
+
+    def _index(self, index: dict, key, seq: int) -> bool:
+        """Add a sequence number to an index, returning True if the key is new."""
+        self.variable_nbytes += 8
+        if (seqs := index.get(key)) is None:
+            seqs = index[key] = SeqList()
+            seqs.append(seq)
+            self.variable_nbytes += INDEX_KEY_BYTES
+            return True
+        seqs.append(seq)
+        return False
+
+    def _unindex(self, index: dict, key) -> bool:
+        """Remove the oldest sequence number for a key, returning True if the key was removed."""
+        self.variable_nbytes -= 8
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+            self.variable_nbytes -= INDEX_KEY_BYTES
+            return True
+        return False
+
+    def matching_commands(self, prefix: str) -> List[str]:
+        """Get the stored command names starting with the prefix, in order."""
+        commands = []
+        for i in range(bisect_left(self.sorted_commands, prefix), len(self.sorted_commands)):
+            if not self.sorted_commands[i].startswith(prefix):
+                break
+            commands.append(self.sorted_commands[i])
+        return commands
+
+    def seq_at(self, timestamp: float) -> int:
+        """Get the sequence number of the first entry at or after a time, with a binary search
+        over the ring. If there isn't one, this is ``next_seq``."""
+        lo, hi = self.first_seq, self.next_seq
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[mid % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(
+        self,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        command: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Iterator[int]:
+        """Find the sequence numbers of entries matching all the given filters, oldest first.
+
+        The time range is found with a binary search, then the smallest index matching a filter
+        in that range is used for the candidates, and the other filters are checked directly
+        against them. So this takes time proportional to the smallest of the filters' results
+        instead of the whole store.
+
+        Parameters
+        ----------
+        user_id : Optional[int]
+            User who ran the command
+        guild_id : Optional[int]
+            Server it was ran in
+        command : Optional[str]
+            Prefix of the command name, eg ``playlist`` matches ``playlist create``
+        start : Optional[float]
+            Epoch time of the earliest entry, inclusive
+        end : Optional[float]
+            Epoch time of the latest entry, exclusive
+        """
+        first = self.first_seq if start is None else self.seq_at(start)
+        last = self.next_seq if end is None else self.seq_at(end)
+
+        lists: List[List[SeqList]] = []
+        if user_id is not None:
+            lists.append([self.by_user[user_id]] if user_id in self.by_user else [])
+        if guild_id is not None:
+            lists.append([self.by_guild[guild_id]] if guild_id in self.by_guild else [])
+        command_idxs: Set[int] = set()
+        if command is not None:
+            commands = self.matching_commands(command)
+            command_idxs = {self.command_names.index[c] for c in commands}
+            lists.append([self.by_command[c] for c in commands])
+
+        if not lists:
+            yield from range(first, last)
+            return
+
+        # narrow each index to the time range, and use the smallest
+        candidates: List[Iterable[int]] = []
+        sizes: List[int] = []
+        for seq_lists in lists:
+            bounds = [seqs.between(first, last) for seqs in seq_lists]
+            candidates.append(
+                merge(*(seqs.seqs[lo:hi] for seqs, (lo, hi) in zip(seq_lists, bounds)))
+            )
+            sizes.append(sum(hi - lo for lo, hi in bounds))
+        smallest = candidates[sizes.index(min(sizes))]
+
+        for seq in smallest:
+            i = seq % self.capacity
+            if user_id is not None and self.user_ids[i] != user_id:
+                continue
+            if guild_id is not None and self.guild_ids[i] != guild_id:
+                continue
+            if command is not None and self.commands[i] not in command_idxs:
+                continue
+            yield seq
+
+    def get(self, seq: int) -> LoggedType:
+        """Rebuild the logged object for an entry, for formatting.
+
+        Raises
+        ------
+        IndexError
+            If the entry isn't stored (anymore)
+        """
+        if not self.first_seq <= seq < self.next_seq:
+            raise IndexError(f"Entry {seq} isn't stored")
+        i = seq % self.capacity
+
+        flags = self.flags[i]
+        cls = KINDS[flags & 3]
+        obj: LoggedType = cls.__new__(cls)  # type:ignore  # not calling __init__, no discord objs
+
+        obj.command = self.command_names.get(self.commands[i])
+        obj.user = IDFKWhatToNameThis(self.user_ids[i], self.names.get(self.user_names[i]))
+        if self.msg_ids[i]:  # like LogMixin, only set for text commands
+            obj.msg_id = self.msg_ids[i]
+        if self.guild_ids[i]:
+            obj.channel = IDFKWhatToNameThis(
+                self.channel_ids[i], self.names.get(self.channel_names[i])
+            )
+            obj.guild = IDFKWhatToNameThis(self.guild_ids[i], self.names.get(self.guild_names[i]))
+        else:
+            obj.channel = None
+            obj.guild = None
+        obj.content = self.contents[i]
+        obj.app_type = (flags >> 2) or None
+        if self.target_ids[i]:
+            obj.target = IDFKWhatToNameThis(
+                self.target_ids[i], self.names.get(self.target_names[i])
+            )
+        else:
+            obj.target = None
+        obj.timestamp = self.times[i]
+
+        return obj
+
+    def resized(self, capacity: int) -> "LogStore":
+        """Get a new store with a different capacity, with the newest entries that fit."""
+        new = LogStore(capacity, self.max_bytes)
+        for seq in range(max(self.first_seq, self.next_seq - capacity), self.next_seq):
+            new.append_row(self.row(seq))
+        return new
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the arrays, intern tables, content and indexes."""
+        return (
+            self.reserved_nbytes
+            + self.variable_nbytes
+            + self.command_names.nbytes
+            + self.names.nbytes
+        )
@@ -3,21 +3,24 @@ from vexcogutils.chat import inline_hum_list
 
 from status.core.consts import FEEDS
 
-SERVICE_LIST = inline_hum_list(FEEDS.keys())  # type:ignore
+
+def service_list() -> str:
+    # not a constant, custom feeds can be added at runtime
+    return inline_hum_list(list(FEEDS.keys()))
 
 
 class DynamicHelp(commands.Command):
     """Append a dynamic list of available servies to the help."""
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
-        return super().format_help_for_context(ctx) + "\n\nAvailable services:\n" + SERVICE_LIST
+        return super().format_help_for_context(ctx) + "\n\nAvailable services:\n" + service_list()
 
 
 class DynamicHelpGroup(commands.Group):
     """Append a dynamic list of avalible services to the help."""
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
-        return super().format_help_for_context(ctx) + "\n\nAvailable services:\n" + SERVICE_LIST
+        return super().format_help_for_context(ctx) + "\n\nAvailable services:\n" + service_list()
 
     def command(self, *args, **kwargs):
         return super().command(*args, **kwargs)
@@ -1,9 +1,9 @@
-from typing import TYPE_CHECKING
+import datetime
+from typing import TYPE_CHECKING, Optional
 
-from redbot.core.commands import BadArgument, Context, Converter
+from redbot.core.commands import BadArgument, Context, Converter, TimedeltaConverter
 
-from status.core import FEEDS, MODES_LITERAL, SERVICE_LITERAL
-from status.core.consts import ICON_BASE
+from status.core import FEEDS, MODES_LITERAL, SERVICE_LITERAL, get_icon
 
 
 class _ServiceTypeHint:
@@ -11,13 +11,15 @@ class _ServiceTypeHint:
     id: str
     url: str
     friendly: str
-    avatar: str
+    avatar: Optional[str]
 
 
 if TYPE_CHECKING:
     ServiceConverter = _ServiceTypeHint
     ModeConverter = MODES_LITERAL
+    TimespanConverter = datetime.timedelta
 else:
+    TimespanConverter = TimedeltaConverter(default_unit="days")
 
     class ServiceConverter(Converter):
         async def convert(self, ctx: Context, argument: str) -> _ServiceTypeHint:
@@ -34,7 +36,7 @@ else:
             self.id = FEEDS[argument]["id"]
             self.url = FEEDS[argument]["url"]
             self.friendly = FEEDS[argument]["friendly"]
-            self.avatar = ICON_BASE.format(argument)
+            self.avatar = get_icon(argument)
 
             return self
 
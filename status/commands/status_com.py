@@ -1,18 +1,24 @@
 import datetime
 from collections import defaultdict
+from time import time
 from typing import Dict, List, NamedTuple, Optional
 
 import discord
-from discord.channel import TextChannel
 from redbot.core import commands
 from redbot.core.utils.chat_formatting import humanize_list, humanize_timedelta, pagify
 
-from status.commands.command import DynamicHelp
-from status.commands.converters import ServiceConverter
+from status.commands.command import DynamicHelpGroup
+from status.commands.converters import ServiceConverter, TimespanConverter
+from status.core import FEEDS, ArchivedIncident
 from status.core.abc import MixinMeta
 from status.objects import IncidentData, SendCache, Update
 from status.updateloop import SendUpdate, process_json
 
+ARCHIVE_UNAVAILABLE = (
+    "Past incidents aren't available as I couldn't open the incident archive. The bot owner can"
+    " check the logs for why."
+)
+
 
 class Comps(NamedTuple):
     groups: Dict[str, str]
@@ -42,12 +48,25 @@ def process_components(json_data: dict) -> Comps:
     return Comps(groups, degraded_comps)
 
 
+def format_archived(incidents: List[ArchivedIncident], show_service: bool = False) -> str:
+    msg = ""
+    for incident in incidents:
+        state = "" if incident.resolved else " **(ongoing)**"
+        friendly = FEEDS.get(incident.service, {}).get("friendly", incident.service)
+        service = f"{friendly}: " if show_service else ""
+        msg += (
+            f"<t:{int(incident.created)}:d> {service}{incident.title} - "
+            f"{incident.impact.capitalize()} impact{state} (<{incident.link}>)\n"
+        )
+    return msg
+
+
 class StatusCom(MixinMeta):
 
     # TODO: support DMs
     @commands.guild_only()
     @commands.cooldown(2, 10, commands.BucketType.user)
-    @commands.command(cls=DynamicHelp)
+    @commands.group(cls=DynamicHelpGroup, invoke_without_command=True)
     async def status(self, ctx: commands.Context, service: ServiceConverter):
         """
         Check for the status of a variety of services, eg Discord.
@@ -61,18 +80,13 @@ class StatusCom(MixinMeta):
             )
             return await ctx.send(message, delete_after=time_until)
 
-        if restrictions := self.service_restrictions_cache.get_guild(
-            ctx.guild.id, service.name  # type:ignore  # guild check
+        if mentions := self.service_restrictions_cache.get_mentions(
+            ctx.guild.id, service.name, self.bot.get_channel  # type:ignore  # guild check
         ):
-            channels = [self.bot.get_channel(channel) for channel in restrictions]
-            channel_list = humanize_list(
-                [channel.mention for channel in channels if isinstance(channel, TextChannel)],
-                style="or",
+            return await ctx.send(
+                f"You can check updates for {service.friendly} in "
+                f"{humanize_list(mentions, style='or')}."
             )
-            if channel_list:
-                return await ctx.send(
-                    f"You can check updates for {service.friendly} in {channel_list}."
-                )
 
         await ctx.trigger_typing()
 
@@ -164,3 +178,55 @@ class StatusCom(MixinMeta):
 
             if msg:
                 await ctx.send(msg)
+
+    @status.command(name="history")
+    async def status_history(
+        self,
+        ctx: commands.Context,
+        service: ServiceConverter,
+        timespan: TimespanConverter = datetime.timedelta(days=30),
+    ):
+        """
+        See past incidents for a service, from the incidents I've seen.
+
+        The timespan defaults to 30 days.
+
+        **Examples:**
+            - `[p]status history discord`
+            - `[p]status history github 26 weeks`
+        """
+        if not self.archive.available:
+            return await ctx.send(ARCHIVE_UNAVAILABLE)
+        incidents = await self.archive.history(service.name, time() - timespan.total_seconds())
+        if not incidents:
+            return await ctx.send(
+                f"I haven't seen any incidents for {service.friendly} in the last "
+                f"{humanize_timedelta(timedelta=timespan)}."
+            )
+
+        msg = "Incidents for {} in the last {} (latest {}):\n".format(
+            service.friendly, humanize_timedelta(timedelta=timespan), len(incidents)
+        )
+        await ctx.send_interactive(pagify(msg + format_archived(incidents)))
+
+    @status.command(name="search")
+    async def status_search(
+        self, ctx: commands.Context, service: Optional[ServiceConverter] = None, *, query: str
+    ):
+        """
+        Search the incidents I've seen, optionally for a single service.
+
+        Matches incident titles and the text of their updates.
+
+        **Examples:**
+            - `[p]status search api errors`
+            - `[p]status search discord voice`
+        """
+        if not self.archive.available:
+            return await ctx.send(ARCHIVE_UNAVAILABLE)
+        incidents = await self.archive.search(query, service.name if service else None)
+        if not incidents:
+            return await ctx.send("I couldn't find any incidents matching that.")
+
+        msg = f"Incidents matching your search (latest {len(incidents)}):\n"
+        await ctx.send_interactive(pagify(msg + format_archived(incidents, service is None)))
@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Optional
 
 from discord.ext.commands.errors import CheckFailure
 from discord.guild import Guild
@@ -8,11 +8,14 @@ from redbot.core import commands
 from redbot.core.utils.chat_formatting import box, pagify, warning
 from redbot.core.utils.menus import start_adding_reactions
 from redbot.core.utils.predicates import ReactionPredicate
+from tabulate import tabulate
 
 from status.commands.converters import ModeConverter, ServiceConverter
+from status.core import FEEDS
 from status.core.abc import MixinMeta
+from status.core.stats import TABLE_HEADERS
 from status.objects import SendCache, Update
-from status.updateloop import SendUpdate, process_json
+from status.updateloop import SendUpdate, process_json, processfeed
 
 _log = logging.getLogger("red.vex.status.dev")
 
@@ -77,6 +80,7 @@ class StatusDevCom(MixinMeta):
             SendCache(update, service.name),
             True,
             True,
+            self.event_queue,
         ).send({ctx.channel.id: {"mode": mode, "webhook": webhook, "edit_id": {}}})
 
         json_resp, _, _ = await self.statusapi.scheduled_maintenance(service.id)
@@ -96,6 +100,7 @@ class StatusDevCom(MixinMeta):
             SendCache(update, service.name),
             True,
             True,
+            self.event_queue,
         ).send({ctx.channel.id: {"mode": mode, "webhook": webhook, "edit_id": {}}})
 
     @commands.before_invoke(unsupported)
@@ -120,6 +125,7 @@ class StatusDevCom(MixinMeta):
             SendCache(update, service.name),
             True,
             True,
+            self.event_queue,
         ).send({ctx.channel.id: {"mode": "all", "webhook": False, "edit_id": {}}})
 
     @commands.before_invoke(unsupported)
@@ -151,6 +157,7 @@ class StatusDevCom(MixinMeta):
             sendcache=sendcache,
             dispatch=True,
             force=True,
+            event_queue=self.event_queue,
         ).send(channels)
 
     @commands.before_invoke(unsupported)
@@ -165,7 +172,45 @@ class StatusDevCom(MixinMeta):
         """Check what feeds this is checking"""
         raw = box(str(self.used_feeds), lang="py")
         actual = box(str(self.used_feeds.get_list()), lang="py")
-        await ctx.send(f"**Raw data:**\n{raw}\n**Active:**\n{actual}")
+        index = box(str(self.config_wrapper.subscriptions), lang="py")
+        await ctx.send(
+            f"**Raw data:**\n{raw}\n**Active:**\n{actual}\n**Subscription index:**\n{index}"
+        )
+
+    @commands.before_invoke(unsupported)
+    @statusdev.command(aliases=["pc"], hidden=True)
+    async def processcache(self, ctx: commands.Context):
+        """Check the hit rate of the parsed incident and update caches"""
+        await ctx.send(
+            box(
+                f"Incidents: {processfeed.incident_cache}\nUpdates: {processfeed.update_cache}",
+                lang="py",
+            )
+        )
+
+    @commands.before_invoke(unsupported)
+    @statusdev.command(aliases=["eq"], hidden=True)
+    async def eventqueue(self, ctx: commands.Context):
+        """Check the length of the event dispatch queue"""
+        await ctx.send(box(str(self.event_queue), lang="py"))
+
+    @commands.before_invoke(unsupported)
+    @statusdev.command(aliases=["st"], hidden=True)
+    async def stats(self, ctx: commands.Context, service: Optional[ServiceConverter] = None):
+        """Check request, parse and fan-out stats of the loop, optionally for one service
+
+        Latencies and fan-out are upper bounds of the histogram bucket the percentile is in.
+        """
+        names = {data["id"]: name for name, data in FEEDS.items()}
+        rows = self.stats.table(names, service.id if service else None)
+        if not rows:
+            return await ctx.send("No stats recorded yet.")
+        connections = self.stats.connections
+        await ctx.send(
+            f"Connections created: {connections['created']}, reused: {connections['reused']} "
+            f"({self.stats.reuse_rate:.1%} reuse)"
+        )
+        await ctx.send_interactive(pagify(tabulate(rows, headers=TABLE_HEADERS)), box_lang="")
 
     @commands.before_invoke(unsupported)
     @statusdev.command(aliases=["cgr"], hidden=True)
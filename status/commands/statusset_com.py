@@ -1,6 +1,7 @@
 import asyncio
+from collections import Counter
 from time import time
-from typing import TYPE_CHECKING, Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 
 import discord
 from discord.abc import GuildChannel
@@ -8,17 +9,25 @@ from discord.channel import TextChannel
 from discord.guild import Guild
 from discord.member import Member
 from redbot.core import commands
-from redbot.core.utils.chat_formatting import box, humanize_list
+from redbot.core.utils.chat_formatting import box, humanize_list, pagify
 from redbot.core.utils.predicates import MessagePredicate
 from tabulate import tabulate
 from vexcogutils import inline_hum_list
 
 from status.commands.command import DynamicHelp, DynamicHelpGroup
 from status.commands.converters import ModeConverter, ServiceConverter
-from status.core import FEEDS, SPECIAL_INFO
+from status.core import FEEDS, SPECIAL_INFO, is_custom
 from status.core.abc import MixinMeta
+from status.core.feeds import (
+    FEED_NAME_RE,
+    RESERVED_FEED_NAMES,
+    clean_page_id,
+    register_feed,
+    unregister_feed,
+)
 from status.objects import SendCache, Update
 from status.updateloop import SendUpdate, process_json
+from status.updateloop.utils import get_webhook
 
 # NOTE:
 # Not using ctx.guild because mypy goes mad, using channel.guild - it'll make sense when you see it
@@ -128,19 +137,8 @@ class StatusSetCom(MixinMeta):
             webhook = pred.result
             if webhook:
                 # already checked for perms to create
-                # thanks flare for your webhook logic (redditpost) (or trusty?)
-
-                # i know this makes the webhook in the wrong channel if a specific one is chosen...
-                # its remade later, mypy makes this annoying to fix
-                # TODO: ^
-                existing_webhook = False
-                for hook in await ctx.channel.webhooks():
-                    if hook.name == channel.guild.me.name:
-                        existing_webhook = True
-                if not existing_webhook:
-                    await ctx.channel.create_webhook(
-                        name=channel.guild.me.name, reason="Created for status updates."
-                    )
+                # this also caches it for the update loop
+                await get_webhook(self.bot, channel, self.config_wrapper)  # type:ignore
         else:
             await ctx.send(
                 "I would ask about whether you want me to send updates as a webhook (so they "
@@ -182,6 +180,7 @@ class StatusSetCom(MixinMeta):
             service.name, value=settings
         )
         self.used_feeds.add_feed(service.name)
+        self.config_wrapper.subscriptions.add(service.name, channel.id, settings)  # type:ignore
 
         if service in SPECIAL_INFO.keys():
             msg = f"NOTE: {SPECIAL_INFO[service.name]}\n"
@@ -220,6 +219,7 @@ class StatusSetCom(MixinMeta):
                 )
 
         self.used_feeds.remove_feed(service.name)
+        self.config_wrapper.subscriptions.remove(service.name, channel.id)
 
         sr: Dict[str, List[int]]
         async with self.config.guild(channel.guild).service_restrictions() as sr:
@@ -229,7 +229,7 @@ class StatusSetCom(MixinMeta):
                 pass
 
             self.service_restrictions_cache.remove_restriction(
-                channel.id, service.name, channel.id
+                channel.guild.id, service.name, channel.id
             )
 
         await ctx.send(f"Removed {service.friendly} status updated from {channel.mention}")
@@ -246,32 +246,31 @@ class StatusSetCom(MixinMeta):
             - `[p]statusset list discord`
             - `[p]statusset list`
         """
-        # this needs refactoring
-        # i basically copied and pasted in rewrite
-        # maybe stick the two sections in .utils
+        # served from the in-memory subscription and restriction indexes, so this doesn't read
+        # config for every channel
 
         if TYPE_CHECKING:
             guild = Guild()
         else:
             guild = ctx.guild
 
+        subscriptions = self.config_wrapper.subscriptions
         unused_feeds = list(FEEDS.keys())
 
         if service:
+            channels = subscriptions.get_service(service.name)
+            restrictions = self.service_restrictions_cache.get_guild(guild.id, service.name)
             data = []
             for channel in guild.channels:
-                feeds = await self.config.channel(channel).feeds()
-                restrictions = await self.config.guild(guild).service_restrictions()
-                for name, settings in feeds.items():
-                    if name != service.name:
-                        continue
-                    mode = settings["mode"]
-                    webhook = settings["webhook"]
-                    if channel.id in restrictions.get(service, []):
-                        restrict = True
-                    else:
-                        restrict = False
-                    data.append([f"#{channel.name}", mode, webhook, restrict])
+                if settings := channels.get(channel.id):
+                    data.append(
+                        [
+                            f"#{channel.name}",
+                            settings["mode"],
+                            settings["webhook"],
+                            channel.id in restrictions,
+                        ]
+                    )
 
             table = box(
                 tabulate(data, headers=["Channel", "Send mode", "Use webhooks", "Restrict"])
@@ -285,31 +284,22 @@ class StatusSetCom(MixinMeta):
         else:
             guild_feeds: Dict[str, List[str]] = {}
             for channel in guild.channels:
-                feeds = await self.config.channel(channel).feeds()
-                for feed in feeds.keys():
-                    try:
-                        guild_feeds[feed].append(f"#{channel.name}")
-                    except KeyError:
-                        guild_feeds[feed] = [f"#{channel.name}"]
+                for feed in subscriptions.get_channel(channel.id):
+                    guild_feeds.setdefault(feed, []).append(f"#{channel.name}")
 
             if not guild_feeds:
                 msg = "There are no status updates set up in this server.\n"
             else:
                 msg = ""
                 data = []
-                for name, settings in guild_feeds.items():
-                    if not settings:
-                        continue
-                    data.append([name, humanize_list(settings)])
+                for name, channel_names in guild_feeds.items():
+                    data.append([name, humanize_list(channel_names)])
                     try:
                         unused_feeds.remove(name)
-                    except Exception:
+                    except ValueError:
                         pass
-                if data:
-                    msg += "**Services used in this server:**"
-                    msg += box(
-                        tabulate(data, tablefmt="plain"), lang="arduino"
-                    )  # cspell:disable-line
+                msg += "**Services used in this server:**"
+                msg += box(tabulate(data, tablefmt="plain"), lang="arduino")  # cspell:disable-line
             if unused_feeds:
                 msg += "**Other available services:** "
                 msg += inline_hum_list(unused_feeds)
@@ -319,6 +309,77 @@ class StatusSetCom(MixinMeta):
             )
             await ctx.send(msg)
 
+    @commands.is_owner()
+    @statusset.command(name="overview")
+    async def statusset_overview(self, ctx: commands.Context):
+        """
+        See a summary of status updates set up in every server.
+
+        This is worked out from what's already in memory, so it's quick even on big bots.
+
+        **Example:**
+            - `[p]statusset overview`
+        """
+        subscriptions = self.config_wrapper.subscriptions
+        all_channels: Set[int] = set()
+        all_guilds: Set[int] = set()
+        data = []
+        for service in sorted(subscriptions.services()):
+            channels = subscriptions.get_service(service)
+            guilds = set()
+            modes: Counter = Counter()
+            webhooks = components = 0
+            for c_id, settings in channels.items():
+                if channel := self.bot.get_channel(c_id):
+                    guilds.add(channel.guild.id)  # type:ignore
+                modes[settings.get("mode", "latest")] += 1
+                webhooks += bool(settings.get("webhook"))
+                components += bool(settings.get("components"))
+
+            all_channels.update(channels)
+            all_guilds.update(guilds)
+            data.append(
+                [
+                    service,
+                    len(channels),
+                    len(guilds),
+                    modes["all"],
+                    modes["latest"],
+                    modes["edit"],
+                    webhooks,
+                    components,
+                ]
+            )
+
+        if not data:
+            return await ctx.send("There are no status updates set up in any server.")
+
+        msg = (
+            f"{len(all_channels)} channels in {len(all_guilds)} servers receive status updates "
+            f"for {len(data)} services."
+        )
+        if missing := len(self.config_wrapper.missing_channels):
+            msg += (
+                f" {missing} channels couldn't be found recently, they'll be removed if they "
+                "don't come back."
+            )
+        await ctx.send(msg)
+
+        table = tabulate(
+            data,
+            headers=[
+                "Service",
+                "Channels",
+                "Servers",
+                "All",
+                "Latest",
+                "Edit",
+                "Webhook",
+                "Components",
+            ],
+        )
+        await ctx.send_interactive(pagify(table), box_lang="")
+
     @statusset.command(name="preview")
     async def statusset_preview(
         self, ctx: commands.Context, service: ServiceConverter, mode: ModeConverter, webhook: bool
@@ -453,6 +514,7 @@ class StatusSetCom(MixinMeta):
         await self.config.channel(channel).feeds.set_raw(  # type:ignore
             service.name, value=old_conf[service.name]
         )
+        self.config_wrapper.subscriptions.add(service.name, channel.id, old_conf[service.name])
 
         await ctx.send(
             f"{service.friendly} status updates in {channel.mention} will now use the {mode} mode."
@@ -501,17 +563,67 @@ class StatusSetCom(MixinMeta):
         if webhook and not channel.permissions_for(me).manage_webhooks:
             return await ctx.send("I don't have manage webhook permissions so I can't do that.")
 
-        old_conf[service.name]["edit_id"] = {}
         old_conf[service.name]["webhook"] = webhook
         await self.config.channel(channel).feeds.set_raw(  # type:ignore
             service.name, value=old_conf[service.name]
         )
+        self.config_wrapper.subscriptions.add(service.name, channel.id, old_conf[service.name])
+        await self.config_wrapper.forget_edit_ids(service.name, channel.id)
 
         word = "use" if webhook else "not use"
         await ctx.send(
             f"{service.friendly} status updates in {channel.mention} will now {word} webhooks."
         )
 
+    @edit.command(name="components", usage="[channel] <service> <components>")
+    async def edit_components(
+        self,
+        ctx: commands.Context,
+        chan: Optional[discord.TextChannel],
+        service: ServiceConverter,
+        components: bool,
+    ):
+        """Set whether or not to also send component status changes.
+
+        When enabled, I will also send a message when one of the service's components (eg API or
+        Voice) becomes degraded or recovers, even if there's no incident for it.
+
+        If you don't specify a channel, I will use the current channel.
+
+        **Examples:**
+            - `[p]statusset edit components #testing discord true`
+            - `[p]statusset edit components discord false` (for current channel)
+        """
+        if TYPE_CHECKING:
+            channel = GuildChannel()
+        else:
+            channel = chan or ctx.channel
+
+        old_conf = await self.config.channel(channel).feeds()
+        if service.name not in old_conf.keys():
+            return await ctx.send(
+                f"It looks like I don't send {service.friendly} status updates to "
+                f"{channel.mention}"
+            )
+
+        if old_conf[service.name].get("components", False) == components:
+            word = "send" if components else "don't send"
+            return await ctx.send(
+                f"It looks like I already {word} {service.friendly} component changes to "
+                f"{channel.mention}"
+            )
+
+        old_conf[service.name]["components"] = components
+        await self.config.channel(channel).feeds.set_raw(  # type:ignore
+            service.name, value=old_conf[service.name]
+        )
+        self.config_wrapper.subscriptions.add(service.name, channel.id, old_conf[service.name])
+
+        word = "now" if components else "no longer"
+        await ctx.send(
+            f"I will {word} send {service.friendly} component changes to {channel.mention}."
+        )
+
     @edit.command(name="restrict", usage="[channel] <service> <restrict>")
     async def edit_restrict(
         self,
@@ -571,3 +683,102 @@ class StatusSetCom(MixinMeta):
 
         word = "" if restrict else "not "
         await ctx.send(f"{service.friendly} will now {word}be restricted in the `status` command.")
+
+    @commands.is_owner()
+    @statusset.group(name="feeds")
+    async def statusset_feeds(self, ctx: commands.Context):
+        """
+        Add or remove extra statuspages, which every server can then use.
+
+        These work with any page hosted by Statuspage (Atlassian), which most status pages are.
+        """
+
+    @statusset_feeds.command(name="add")
+    async def feeds_add(
+        self, ctx: commands.Context, name: str, page: str, *, friendly: Optional[str] = None
+    ):
+        """
+        Add a statuspage as a new service.
+
+        `page` can be the URL of the statuspage, the domain it's on or its page ID. `name` is what
+        it's called in commands, so should be short and only lowercase letters, numbers and
+        underscores, and not `history` or `search`. The display name is taken from the page if you
+        don't give one.
+
+        **Examples:**
+            - `[p]statusset feeds add atlassian https://status.atlassian.com`
+            - `[p]statusset feeds add vendor status.vendor.com Vendor Inc`
+        """
+        name = name.casefold()
+        if not FEED_NAME_RE.match(name):
+            return await ctx.send(
+                "The name should be up to 32 lowercase letters, numbers and underscores."
+            )
+        if name in RESERVED_FEED_NAMES:
+            return await ctx.send(
+                f"`{name}` is a `{ctx.clean_prefix}status` subcommand, so it can't be used as a"
+                " name."
+            )
+        if name in FEEDS:
+            return await ctx.send(f"There's already a service called `{name}`.")
+
+        page_id = clean_page_id(page)
+        await ctx.trigger_typing()
+        try:
+            resp_json, _, status = await self.statusapi.summary(page_id)
+        except Exception:
+            status = 0
+        if status != 200 or "page" not in resp_json:
+            return await ctx.send("I couldn't find a statuspage there.")
+
+        data = {
+            "id": page_id,
+            "url": resp_json["page"].get("url") or f"https://{page_id}",
+            "friendly": friendly or resp_json["page"].get("name") or name,
+        }
+        await self.config.custom_feeds.set_raw(name, value=data)  # type:ignore
+        register_feed(name, **data)
+        # so the existing incidents aren't sent as new
+        async with self.old_ids_lock:
+            await self.get_initial_data([name])
+
+        await ctx.send(
+            f"Added {data['friendly']} as `{name}`. It can now be used in `{ctx.clean_prefix}"
+            f"statusset add` and `{ctx.clean_prefix}status`."
+        )
+
+    @statusset_feeds.command(name="remove", aliases=["del", "delete"])
+    async def feeds_remove(self, ctx: commands.Context, name: str):
+        """
+        Remove a statuspage you've added. Any channels getting its updates will stop.
+
+        **Example:**
+            - `[p]statusset feeds remove vendor`
+        """
+        name = name.casefold()
+        if not is_custom(name):
+            return await ctx.send(f"There's no custom service called `{name}`.")
+
+        channels = await self.config_wrapper.get_channels(name)
+        for c_id in channels:
+            await self.config.channel_from_id(c_id).feeds.clear_raw(name)  # type:ignore
+            self.config_wrapper.subscriptions.remove(name, c_id)
+            self.used_feeds.remove_feed(name)
+        await self.config.feed_store.clear_raw(name)  # type:ignore
+        await self.config.custom_feeds.clear_raw(name)  # type:ignore
+        unregister_feed(name)
+
+        await ctx.send(f"Removed `{name}`, and stopped updates in {len(channels)} channels.")
+
+    @statusset_feeds.command(name="list")
+    async def feeds_list(self, ctx: commands.Context):
+        """List the statuspages you've added."""
+        custom_feeds = await self.config.custom_feeds()
+        if not custom_feeds:
+            return await ctx.send("You haven't added any statuspages.")
+
+        msg = ""
+        for name, data in sorted(custom_feeds.items()):
+            count = self.config_wrapper.subscriptions.count(name)
+            msg += f"`{name}`: {data['friendly']} (<{data['url']}>) - {count} channels\n"
+        await ctx.send_interactive(pagify(msg))
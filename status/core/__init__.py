@@ -1,3 +1,4 @@
+from .archive import ArchivedIncident, IncidentArchive
 from .consts import (
     ALL,
     EDIT,
@@ -10,4 +11,6 @@ from .consts import (
     TYPES_LITERAL,
     UPDATE_NAME,
 )
+from .feeds import BUILTIN_FEEDS, get_icon, is_custom
+from .stats import LoopStats
 from .statusapi import StatusAPI
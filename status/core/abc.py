@@ -1,6 +1,6 @@
 import asyncio
 from abc import ABC, ABCMeta, abstractmethod
-from typing import Optional
+from typing import List, Optional
 
 from aiohttp import ClientSession
 from discord.ext.commands.cog import CogMeta
@@ -9,9 +9,12 @@ from redbot.core.config import Config
 from sentry_sdk.hub import Hub
 from vexcogutils.loop import VexLoop
 
+from status.core.archive import IncidentArchive
+from status.core.stats import LoopStats
 from status.core.statusapi import StatusAPI
 from status.objects import (
     ConfigWrapper,
+    EventQueue,
     LastChecked,
     ServiceCooldown,
     ServiceRestrictionsCache,
@@ -44,11 +47,15 @@ class MixinMeta(ABC):
 
     session: ClientSession
     statusapi: StatusAPI
+    stats: LoopStats
+    archive: IncidentArchive
 
     ready: bool
+    event_queue: EventQueue
+    old_ids_lock: asyncio.Lock
 
     sentry_hub: Optional[Hub]
 
     @abstractmethod
-    async def get_initial_data(self) -> None:
+    async def get_initial_data(self, services: Optional[List[str]] = None) -> None:
         raise NotImplementedError()
@@ -0,0 +1,289 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from dateutil.parser import parse as parse_time
+
+from .consts import TYPES_LITERAL
+
+_log = logging.getLogger("red.vex.status.archive")
+
+FLUSH_INTERVAL = 30  # seconds between writes of queued incidents
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id TEXT PRIMARY KEY,
+    service TEXT NOT NULL,
+    type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL,
+    impact TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    resolved REAL
+);
+CREATE INDEX IF NOT EXISTS incidents_service_created ON incidents (service, created);
+CREATE INDEX IF NOT EXISTS incidents_impact_created ON incidents (impact, created);
+CREATE INDEX IF NOT EXISTS incidents_created ON incidents (created);
+
+CREATE TABLE IF NOT EXISTS updates (
+    update_id TEXT PRIMARY KEY,
+    incident_id TEXT NOT NULL,
+    service TEXT NOT NULL,
+    status TEXT NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS updates_incident_created ON updates (incident_id, created);
+CREATE INDEX IF NOT EXISTS updates_created ON updates (created);
+"""
+
+# external content table, so the text isn't stored twice. kept in sync with triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS updates_fts USING fts5 (
+    title, body, content='updates', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS updates_ai AFTER INSERT ON updates BEGIN
+    INSERT INTO updates_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS updates_ad AFTER DELETE ON updates BEGIN
+    INSERT INTO updates_fts (updates_fts, rowid, title, body)
+    VALUES ('delete', old.rowid, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS updates_au AFTER UPDATE ON updates BEGIN
+    INSERT INTO updates_fts (updates_fts, rowid, title, body)
+    VALUES ('delete', old.rowid, old.title, old.body);
+    INSERT INTO updates_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+"""
+
+INSERT_INCIDENT = """
+INSERT INTO incidents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (incident_id) DO UPDATE SET
+    title = excluded.title, link = excluded.link, impact = excluded.impact,
+    updated = excluded.updated, resolved = excluded.resolved
+"""
+
+INSERT_UPDATE = """
+INSERT INTO updates VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (update_id) DO UPDATE SET
+    status = excluded.status, title = excluded.title, body = excluded.body
+WHERE body != excluded.body OR status != excluded.status OR title != excluded.title
+"""
+
+
+class ArchivedIncident(NamedTuple):
+    incident_id: str
+    service: str
+    title: str
+    link: str
+    impact: str
+    created: float
+    resolved: Optional[float]
+
+
+class IncidentArchive:
+    """A local SQLite archive of every incident and update seen by the update loop.
+
+    Incidents are queued in memory with `add` and written in batches by a background task, so
+    the update loop is never waiting on disk.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            The full path to the database file.
+        """
+        self.path = path
+
+        self.sql_executor = concurrent.futures.ThreadPoolExecutor(1, "status_archive_sql")
+        self.connection: Optional[sqlite3.Connection] = None
+        self.fts = False
+
+        self._pending: List[Tuple[str, TYPES_LITERAL, dict]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __repr__(self) -> str:
+        return f"<IncidentArchive path={self.path} pending={len(self._pending)} fts={self.fts}>"
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.sql_executor, functools.partial(func, *args))
+
+    # ######################################## BLOCKING ########################################
+    # these all run in sql_executor, don't call them directly
+
+    def _open(self) -> None:
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:  # sqlite built without FTS5
+            _log.info("FTS5 isn't available, incident search will be slower.")
+            self.fts = False
+        self.connection.commit()
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _write(self, pending: List[Tuple[str, TYPES_LITERAL, dict]]) -> None:
+        assert self.connection is not None
+
+        incident_rows = []
+        update_rows = []
+        for service, type, incident in pending:
+            updates = incident.get("incident_updates") or []
+            created = parse_time(incident["created_at"]).timestamp()
+            incident_rows.append(
+                (
+                    incident["id"],
+                    service,
+                    type,
+                    incident["name"],
+                    incident["shortlink"],
+                    incident.get("impact") or "none",
+                    created,
+                    parse_time(incident["updated_at"]).timestamp(),
+                    parse_time(incident["resolved_at"]).timestamp()
+                    if incident.get("resolved_at")
+                    else None,
+                )
+            )
+            for update in updates:
+                update_rows.append(
+                    (
+                        update["id"],
+                        incident["id"],
+                        service,
+                        update["status"],
+                        incident["name"],
+                        update.get("body") or "",
+                        parse_time(update["created_at"]).timestamp(),
+                    )
+                )
+
+        with self.connection:  # one transaction for the whole batch
+            self.connection.executemany(INSERT_INCIDENT, incident_rows)
+            self.connection.executemany(INSERT_UPDATE, update_rows)
+
+    def _history(self, service: str, since: float, limit: int) -> List[ArchivedIncident]:
+        assert self.connection is not None
+        rows = self.connection.execute(
+            "SELECT incident_id, service, title, link, impact, created, resolved FROM incidents "
+            "WHERE service = ? AND created >= ? ORDER BY created DESC LIMIT ?",
+            (service, since, limit),
+        ).fetchall()
+        return [ArchivedIncident(*row) for row in rows]
+
+    def _search(self, query: str, service: Optional[str], limit: int) -> List[ArchivedIncident]:
+        assert self.connection is not None
+        if not query.split():
+            return []
+        if self.fts:
+            # quote each word so user input can't be (invalid) FTS syntax
+            match = " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+            sql = (
+                "SELECT i.incident_id, i.service, i.title, i.link, i.impact, i.created, "
+                "i.resolved FROM incidents i WHERE i.incident_id IN ("
+                "SELECT u.incident_id FROM updates_fts JOIN updates u "
+                "ON u.rowid = updates_fts.rowid WHERE updates_fts MATCH ?)"
+            )
+            params: list = [match]
+        else:
+            sql = (
+                "SELECT i.incident_id, i.service, i.title, i.link, i.impact, i.created, "
+                "i.resolved FROM incidents i WHERE i.incident_id IN ("
+                "SELECT incident_id FROM updates WHERE title LIKE ? OR body LIKE ?)"
+            )
+            params = [f"%{query}%", f"%{query}%"]
+
+        if service:
+            sql += " AND i.service = ?"
+            params.append(service)
+        sql += " ORDER BY i.created DESC LIMIT ?"
+        params.append(limit)
+
+        return [ArchivedIncident(*row) for row in self.connection.execute(sql, params)]
+
+    def _counts(self) -> Dict[str, int]:
+        assert self.connection is not None
+        return dict(
+            self.connection.execute(
+                "SELECT service, COUNT(*) FROM incidents GROUP BY service"
+            ).fetchall()
+        )
+
+    # ########################################## ASYNC ##########################################
+
+    @property
+    def available(self) -> bool:
+        """Whether the database is open. It won't be if it hasn't started or failed to."""
+        return self.connection is not None
+
+    async def start(self) -> None:
+        """Open the database, creating it if needed, and start the background writer."""
+        await self._run(self._open)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Write anything still queued and close the database."""
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self.flush()
+        await self._run(self._close)
+        self.sql_executor.shutdown()
+
+    def add(self, service: str, type: TYPES_LITERAL, incidents: List[dict]) -> None:
+        """Queue raw incidents (from the statuspage API) to be archived. Doesn't block."""
+        if self.connection is None:  # not started, or failed to
+            return
+        self._pending.extend((service, type, incident) for incident in incidents)
+
+    async def flush(self) -> None:
+        """Write all queued incidents in one transaction."""
+        if not self._pending or self.connection is None:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            await self._run(self._write, pending)
+        except Exception:
+            _log.warning(f"Unable to archive {len(pending)} incidents.", exc_info=True)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    async def history(
+        self, service: str, since: float, limit: int = 100
+    ) -> List[ArchivedIncident]:
+        """Get incidents for a service created since a timestamp, newest first."""
+        if self.connection is None:
+            return []
+        await self.flush()  # so the latest ones are included
+        return await self._run(self._history, service, since, limit)
+
+    async def search(
+        self, query: str, service: Optional[str] = None, limit: int = 25
+    ) -> List[ArchivedIncident]:
+        """Full-text search incident titles and update bodies, newest first."""
+        if self.connection is None:
+            return []
+        await self.flush()
+        return await self._run(self._search, query, service, limit)
+
+    async def counts(self) -> Dict[str, int]:
+        """Get the number of archived incidents for each service."""
+        if self.connection is None:
+            return {}
+        return await self._run(self._counts)
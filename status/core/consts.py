@@ -1,3 +1,4 @@
+import re
 from typing import Literal
 
 ALL = "all"
@@ -6,25 +7,12 @@ EDIT = "edit"
 
 TYPES_LITERAL = Literal["incidents", "scheduled"]
 MODES_LITERAL = Literal["all", "latest", "edit"]
-SERVICE_LITERAL = Literal[  # we love DRY
-    "discord",
-    "github",
-    "cloudflare",
-    "python",
-    "twitter_api",
-    "statuspage",
-    "zoom",
-    "oracle_cloud",
-    "epic_games",
-    "digitalocean",
-    "reddit",
-    "sentry",
-    "geforcenow",
-    "fastly",
-]
+# any feed name, as custom feeds can be registered at runtime (see status.core.feeds). the
+# name is kept so existing annotations don't all need changing
+SERVICE_LITERAL = str
 
 
-LINK_RE = (
+LINK_RE = re.compile(
     r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]|\(([^\s()<>]|(\([^"
     r"\s()<>]+\)))*\))+(?:\(([^\s()<>]|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
 )
@@ -32,6 +20,11 @@ LINK_RE = (
 
 OLD_DEFAULTS = {"mode": ALL, "webhook": False}
 
+EDIT_ID_PRUNE_DAYS = 7  # forget edit mode message IDs this long after an incident is resolved
+MISSING_CHANNEL_PRUNE_HOURS = 24  # remove channels from config after they're missing this long
+# custom config group of (service, incident ID) -> {channel ID: message ID}, for edit mode
+EDIT_IDS_GROUP = "EDIT_IDS"
+
 UPDATE_NAME = "{} Status Update"
 
 ICON_BASE = "https://static.vexcodes.com/v1/status_icons/{}.png"
@@ -1,28 +1,35 @@
 import asyncio
 import logging
 from copy import deepcopy
-from typing import Optional
+from typing import List, Optional
 
-import aiohttp
 import sentry_sdk
 import vexcogutils
 from redbot.core import Config, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from vexcogutils import format_help, format_info
 from vexcogutils.meta import out_of_date_check
 
 from status.commands.status_com import StatusCom
 from status.commands.statusdev_com import StatusDevCom
 from status.commands.statusset_com import StatusSetCom
-from status.core import FEEDS
+from status.core import FEEDS, is_custom
 from status.core.abc import CompositeMetaClass
-from status.core.statusapi import StatusAPI
+from status.core.archive import IncidentArchive
+from status.core.consts import EDIT_IDS_GROUP
+from status.core.feeds import register_feed, unregister_feed
+from status.core.stats import LoopStats
+from status.core.statusapi import StatusAPI, create_session
 from status.objects import (
     ConfigWrapper,
+    EventQueue,
     LastChecked,
     ServiceCooldown,
     ServiceRestrictionsCache,
+    SubscriptionIndex,
     UsedFeeds,
+    WebhookCache,
 )
 from status.updateloop import SendUpdate, StatusLoop
 
@@ -59,17 +66,27 @@ class Status(
         self.config.register_global(version=2)
         self.config.register_global(feed_store=default)
         self.config.register_global(old_ids=[])
+        self.config.register_global(edit_id_resolved=default)  # incident ID -> resolved timestamp
+        self.config.register_global(edit_ids_moved=False)  # out of channel feed settings
+        self.config.init_custom(EDIT_IDS_GROUP, 2)  # service, incident ID
+        self.config.register_custom(EDIT_IDS_GROUP)
+        self.config.register_global(custom_feeds=default)  # name -> {id, url, friendly}
         self.config.register_global(latest=default)  # this is unused? i think? remove soonish
         self.config.register_channel(feeds=default)
+        self.config.register_channel(webhook_cache=default)
         self.config.register_guild(service_restrictions=default)
 
         # other stuff
-        self.session = aiohttp.ClientSession()
         self.last_checked = LastChecked()
         self.config_wrapper = ConfigWrapper(self.config, self.last_checked)
         self.service_cooldown = ServiceCooldown()
+        self.event_queue = EventQueue(bot)
+        self.event_queue.start()
 
-        self.statusapi = StatusAPI(self.session)
+        self.stats = LoopStats()
+        self.session = create_session(self.stats)
+        self.statusapi = StatusAPI(self.session, stats=self.stats)
+        self.archive = IncidentArchive(str(cog_data_path(self) / "archive.db"))
 
         self.ready = False
 
@@ -100,7 +117,12 @@ class Status(
 
     def cog_unload(self) -> None:
         self.loop.cancel()
+        self.event_queue.close()
         asyncio.create_task(self.session.close())
+        asyncio.create_task(self.archive.close())
+
+        for service in [s for s in FEEDS.keys() if is_custom(s)]:
+            unregister_feed(service)
 
         if self.sentry_hub and self.sentry_hub.client:
             self.sentry_hub.end_session()
@@ -131,9 +153,21 @@ class Status(
         else:
             self.actually_send = True
 
-        self.used_feeds = UsedFeeds(await self.config.all_channels())
+        for name, data in (await self.config.custom_feeds()).items():
+            register_feed(name, **data)
+
+        all_channels = await self.config.all_channels()
+        self.used_feeds = UsedFeeds(all_channels)
+        self.config_wrapper.webhook_cache = WebhookCache(all_channels)
+        self.config_wrapper.subscriptions = SubscriptionIndex(all_channels)
+        await self.config_wrapper.load_edit_ids(all_channels)
         self.service_restrictions_cache = ServiceRestrictionsCache(await self.config.all_guilds())
 
+        try:
+            await self.archive.start()
+        except Exception:
+            log.exception("Unable to open the incident archive. History won't be recorded.")
+
         # this will start the loop
         self.ready = True
 
@@ -172,10 +206,15 @@ class Status(
             sentry_sdk.capture_exception(e)
             log.debug("Above exception successfully reported to Sentry")
 
-    async def get_initial_data(self) -> None:
-        """Start with initial data from services."""
-        old_ids = []
-        for service, settings in FEEDS.items():
+    async def get_initial_data(self, services: Optional[List[str]] = None) -> None:
+        """Start with initial data from services, so existing incidents aren't sent.
+
+        If services are given only those are checked, and their IDs are added to the existing
+        ones instead of replacing them.
+        """
+        old_ids = [] if services is None else await self.config.old_ids()
+        for service in FEEDS.keys() if services is None else services:
+            settings = FEEDS[service]
             log.debug(f"Starting {service}.")
             try:
                 incidents, etag, status = await self.statusapi.incidents(settings["id"])
@@ -0,0 +1,54 @@
+import re
+from typing import Optional
+
+from .consts import FEEDS, ICON_BASE
+
+# custom feeds registered by the bot owner are added to FEEDS at runtime, so everything else can
+# treat them the same as the built in ones
+BUILTIN_FEEDS = frozenset(FEEDS.keys())
+
+FEED_NAME_RE = re.compile(r"^[a-z0-9_]{1,32}$")
+# subcommands of [p]status, a feed with one of these names couldn't be used with it
+RESERVED_FEED_NAMES = frozenset({"history", "search"})
+
+
+def register_feed(name: str, id: str, url: str, friendly: str) -> None:
+    """Add a custom statuspage feed.
+
+    Parameters
+    ----------
+    name : str
+        Name used in commands and config, must match FEED_NAME_RE and not be in
+        RESERVED_FEED_NAMES
+    id : str
+        Statuspage page ID, or the domain the statuspage is hosted on
+    url : str
+        Link to the statuspage
+    friendly : str
+        Display name
+    """
+    if name in BUILTIN_FEEDS:
+        raise ValueError(f"{name} is a built in feed")
+    FEEDS[name] = {"url": url, "id": id, "friendly": friendly}
+
+
+def unregister_feed(name: str) -> None:
+    """Remove a custom feed. Built in feeds can't be removed."""
+    if name in BUILTIN_FEEDS:
+        raise ValueError(f"{name} is a built in feed")
+    FEEDS.pop(name, None)
+
+
+def is_custom(name: str) -> bool:
+    return name in FEEDS and name not in BUILTIN_FEEDS
+
+
+def get_icon(service: str) -> Optional[str]:
+    """Get the icon URL for a service. Custom feeds don't have one."""
+    return None if is_custom(service) else ICON_BASE.format(service)
+
+
+def clean_page_id(page: str) -> str:
+    """Turn a statuspage URL, domain or page ID into the ID/domain used with the API."""
+    page = re.sub(r"^https?://", "", page.strip().lower())
+    return page.split("/")[0]
@@ -0,0 +1,146 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import DefaultDict, Dict, List, Optional, Sequence, Tuple
+
+# upper bounds of each bucket, anything bigger goes in the last (overflow) bucket
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # ms
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # bytes
+
+
+class Histogram:
+    """A fixed size histogram. Memory use doesn't grow with the number of values recorded."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Histogram count={self.count} mean={self.mean:.1f} max={self.max:.1f}>"
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Get an upper bound for a percentile (0-100), from the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class EndpointStats:
+    """Stats for one endpoint of one service."""
+
+    def __init__(self) -> None:
+        self.latency = Histogram(TIME_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.parse = Histogram(TIME_BUCKETS)
+        self.statuses: Counter = Counter()  # "200", "304", "5xx", "other", "error"
+
+    def record_status(self, status: int) -> None:
+        if status in (200, 304):
+            self.statuses[str(status)] += 1
+        elif str(status)[0] == "5":
+            self.statuses["5xx"] += 1
+        else:
+            self.statuses["other"] += 1
+
+
+class LoopStats:
+    """Instrumentation for the update loop, per service (by page ID) and endpoint."""
+
+    def __init__(self) -> None:
+        self.endpoints: DefaultDict[Tuple[str, str], EndpointStats] = defaultdict(EndpointStats)
+        self.fanout: DefaultDict[str, Histogram] = defaultdict(lambda: Histogram(TIME_BUCKETS))
+        self.connections: Counter = Counter()  # "created", "reused"
+
+    def __repr__(self) -> str:
+        return (
+            f"<LoopStats endpoints={len(self.endpoints)} services={len(self.fanout)} "
+            f"connections_created={self.connections['created']} "
+            f"connections_reused={self.connections['reused']}>"
+        )
+
+    @property
+    def reuse_rate(self) -> float:
+        total = self.connections["created"] + self.connections["reused"]
+        return self.connections["reused"] / total if total else 0.0
+
+    def record_request(
+        self, service_id: str, endpoint: str, status: int, latency: float, size: int
+    ) -> None:
+        """Record a request. Latency is in seconds and size in bytes."""
+        stats = self.endpoints[(service_id, endpoint)]
+        stats.latency.record(latency * 1000)
+        stats.record_status(status)
+        if status == 200:
+            stats.size.record(size)
+
+    def record_error(self, service_id: str, endpoint: str) -> None:
+        """Record a request that failed without a response, eg a timeout."""
+        self.endpoints[(service_id, endpoint)].statuses["error"] += 1
+
+    def record_parse(self, service_id: str, endpoint: str, seconds: float) -> None:
+        self.endpoints[(service_id, endpoint)].parse.record(seconds * 1000)
+
+    def record_fanout(self, service_id: str, seconds: float) -> None:
+        self.fanout[service_id].record(seconds * 1000)
+
+    def record_connection(self, reused: bool) -> None:
+        self.connections["reused" if reused else "created"] += 1
+
+    def table(self, names: Dict[str, str], service_id: Optional[str] = None) -> List[list]:
+        """Get rows for a table of the stats, optionally for a single service.
+
+        Parameters
+        ----------
+        names : Dict[str, str]
+            Page ID -> service name, for display
+        service_id : Optional[str]
+            Only include this service
+        """
+        rows = []
+        for (s_id, endpoint), stats in sorted(self.endpoints.items()):
+            if service_id and s_id != service_id:
+                continue
+            fanout = self.fanout.get(s_id)
+            rows.append(
+                [
+                    names.get(s_id, s_id),
+                    endpoint,
+                    "/".join(
+                        str(stats.statuses[k]) for k in ("200", "304", "5xx", "other", "error")
+                    ),
+                    f"{stats.latency.percentile(50):g}/{stats.latency.percentile(95):g}",
+                    f"{stats.size.mean / 1024:.1f}",
+                    f"{stats.parse.percentile(95):g}" if stats.parse.count else "-",
+                    f"{fanout.percentile(95):g}" if fanout and endpoint == "incidents" else "-",
+                ]
+            )
+        return rows
+
+
+TABLE_HEADERS = [
+    "Service",
+    "Endpoint",
+    "200/304/5xx/other/error",
+    "Latency p50/p95 (ms)",
+    "Size avg (KiB)",
+    "Parse p95 (ms)",
+    "Fan-out p95 (ms)",
+]
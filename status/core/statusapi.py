@@ -1,11 +1,61 @@
-from typing import Dict, NamedTuple
+import asyncio
+import json
+import logging
+from time import monotonic
+from typing import Any, Callable, Coroutine, Dict, NamedTuple, Optional, Tuple
 
-from aiohttp import ClientSession
+from aiohttp import ClientPayloadError, ClientSession, ClientTimeout, TCPConnector, TraceConfig
 from asyncache import cached
 from cachetools import TTLCache
 
 from status.core import FEEDS
 
+from .stats import LoopStats
+
+# faster, but not required
+try:
+    import orjson
+
+    loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    loads = json.loads
+
+# aiohttp can only decode brotli if one of these is installed
+try:
+    import brotli  # noqa
+
+    ACCEPT_ENCODING = "gzip, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa
+
+        ACCEPT_ENCODING = "gzip, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip"
+
+_log = logging.getLogger("red.vex.status.statusapi")
+
+SUMMARY_TTL = 90  # after this a summary is refreshed in the background
+SUMMARY_MAX_STALE = 600  # after this callers wait for a fresh summary
+
+# incidents.json is normally under 200 KiB (decompressed), anything this big is a broken page
+MAX_RESPONSE_SIZE = 8 * 1024 * 1024
+REQUEST_TIMEOUT = ClientTimeout(total=20, connect=5, sock_read=10)
+
+# most feeds are on *.statuspage.io, so this is mainly limiting requests to that
+PER_HOST_LIMIT = 10
+KEEPALIVE_TIMEOUT = 150  # a little longer than the 120s loop, so connections are reused
+DNS_CACHE_TTL = 300
+# responses are cached per (service, etag) for the TTL, so callers in the same round share one
+# request. with hundreds of custom feeds a small cache would evict entries before they expire,
+# so this is far above that. expired entries are still removed as new ones are added
+API_CACHE_SIZE = 4096
+API_CACHE_TTL = 90
+
+
+class ResponseTooLarge(ClientPayloadError):
+    """The response was bigger than MAX_RESPONSE_SIZE."""
+
 
 class APIResp(NamedTuple):
     resp_json: Dict[str, dict]
@@ -13,20 +63,84 @@ class APIResp(NamedTuple):
     status: int
 
 
-def get_base(service_id: str) -> str:
+def get_base(service_id: str, base_url: Optional[str] = None) -> str:
+    if base_url:  # eg a local stand-in for testing
+        return base_url.format(service_id)
+    if "." in service_id:  # custom feed on its own domain, page IDs never have dots
+        return f"https://{service_id}/api/v2"
     if service_id != FEEDS["statuspage"]["id"]:
         return f"https://{service_id}.statuspage.io/api/v2"
     else:  # statuspage's meta status redirects on main domain
         return f"https://{service_id}.metastatuspage.com/api/v2"
 
 
+def create_session(stats: Optional[LoopStats] = None) -> ClientSession:
+    """Create a session for StatusAPI, with connection pooling and (optionally) recording if
+    connections are reused in stats."""
+    trace_configs = []
+    if stats is not None:
+
+        async def on_create(*_: Any) -> None:
+            stats.record_connection(reused=False)
+
+        async def on_reuse(*_: Any) -> None:
+            stats.record_connection(reused=True)
+
+        trace = TraceConfig()
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        trace_configs.append(trace)
+
+    connector = TCPConnector(
+        limit_per_host=PER_HOST_LIMIT,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    return ClientSession(
+        connector=connector,
+        timeout=REQUEST_TIMEOUT,
+        headers={"Accept-Encoding": ACCEPT_ENCODING},
+        trace_configs=trace_configs,
+    )
+
+
 class StatusAPI:
-    """Interact with the Status API. Includes a cache with a TTL of 90 seconds."""
+    """Interact with the Status API. Includes a cache with a TTL of 90 seconds, and summaries
+    are coalesced and served stale-while-revalidate."""
 
     # loop is every 120 seconds, so a 90 sec TTL means it *will* refresh each time
 
-    def __init__(self, session: ClientSession):
+    def __init__(
+        self,
+        session: ClientSession,
+        base_url: Optional[str] = None,
+        stats: Optional[LoopStats] = None,
+    ):
         self.session = session
+        # format string with the service ID, overrides the real statuspage domains
+        self.base_url = base_url
+        # cached responses aren't recorded, only real requests
+        self.stats = stats
+
+        self._inflight: Dict[Tuple[str, str], "asyncio.Task[APIResp]"] = {}
+        self._summaries: Dict[str, Tuple[float, APIResp]] = {}
+
+    def _single_flight(
+        self, endpoint: str, service_id: str, func: Callable[[str], Coroutine[Any, Any, APIResp]]
+    ) -> "asyncio.Task[APIResp]":
+        """Get the in-flight request for this endpoint and service, or start one. All callers
+        share the same task so only one HTTP request is made."""
+        key = (endpoint, service_id)
+        if (task := self._inflight.get(key)) is None:
+            task = asyncio.create_task(func(service_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._single_flight_done(key, t))
+        return task
+
+    def _single_flight_done(self, key: Tuple[str, str], task: "asyncio.Task[APIResp]") -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and (e := task.exception()):  # also stops "never retrieved"
+            _log.debug(f"Request for {key} failed.", exc_info=e)
 
     # these endpoints are documented at /api/v2/ of every statuspage domain/subdomain
     # example: https://discordstatus.com/api/v2/
@@ -39,42 +153,86 @@ class StatusAPI:
 
     # you'll see this doesn't implement the whole 8 endpoints of the API, im lazy
 
-    @cached(TTLCache(maxsize=64, ttl=90))
-    async def components(self, service_id: str) -> APIResp:
-        base = get_base(service_id)
+    async def _get(self, endpoint: str, path: str, service_id: str, etag: str = "") -> APIResp:
+        """Make a (conditional, if there's an etag) request, recording it in stats.
+
+        Raises
+        ------
+        ResponseTooLarge
+            If the response is bigger than MAX_RESPONSE_SIZE
+        ClientPayloadError
+            If the response isn't valid JSON
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        base = get_base(service_id, self.base_url)
+
+        start = monotonic()
+        try:
+            async with self.session.get(
+                f"{base}/{path}", headers=headers, timeout=REQUEST_TIMEOUT
+            ) as resp:
+                body = await self._read(resp) if resp.status == 200 else b""
+        except Exception:
+            if self.stats is not None:
+                self.stats.record_error(service_id, endpoint)
+            raise
+        if self.stats is not None:
+            self.stats.record_request(
+                service_id, endpoint, resp.status, monotonic() - start, len(body)
+            )
+
+        try:
+            resp_json = loads(body) if resp.status == 200 else {}
+        except ValueError as e:  # includes orjson's JSONDecodeError
+            raise ClientPayloadError(f"Invalid JSON from {resp.url}") from e
+        return APIResp(resp_json, resp.headers.get("Etag", ""), resp.status)
+
+    @staticmethod
+    async def _read(resp) -> bytes:
+        """Read a (decompressed) body in chunks, stopping if it gets too big."""
+        if (resp.content_length or 0) > MAX_RESPONSE_SIZE:
+            raise ResponseTooLarge(f"Content-Length of {resp.content_length} is too large")
 
-        resp = await self.session.get(f"{base}/components.json")
+        body = bytearray()
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > MAX_RESPONSE_SIZE:
+                raise ResponseTooLarge(f"Response from {resp.url} is too large")
+        return bytes(body)
 
-        respo_json = await resp.json() if resp.status == 200 else {}
-        return APIResp(respo_json, resp.headers.get("Etag", ""), resp.status)
+    @cached(TTLCache(maxsize=API_CACHE_SIZE, ttl=API_CACHE_TTL))
+    async def components(self, service_id: str, etag: str = "") -> APIResp:
+        return await self._get("components", "components.json", service_id, etag)
 
-    @cached(TTLCache(maxsize=64, ttl=90))
     async def summary(self, service_id: str) -> APIResp:
-        base = get_base(service_id)
-
-        resp = await self.session.get(f"{base}/summary.json", timeout=10)
+        """Get the summary for a service.
+
+        Concurrent callers share one request. Once a summary is cached it's returned straight
+        away, and if it's older than SUMMARY_TTL it's refreshed in the background.
+        """
+        if cached := self._summaries.get(service_id):
+            fetched_at, resp = cached
+            age = monotonic() - fetched_at
+            if age > SUMMARY_TTL:
+                self._single_flight("summary", service_id, self._fetch_summary)
+            if age < SUMMARY_MAX_STALE:
+                return resp
+
+        # shield so one caller being cancelled doesn't cancel it for everyone else
+        return await asyncio.shield(
+            self._single_flight("summary", service_id, self._fetch_summary)
+        )
 
-        resp_json = await resp.json() if resp.status == 200 else {}
-        return APIResp(resp_json, resp.headers.get("Etag", ""), resp.status)
+    async def _fetch_summary(self, service_id: str) -> APIResp:
+        api_resp = await self._get("summary", "summary.json", service_id)
+        if api_resp.status == 200:
+            self._summaries[service_id] = (monotonic(), api_resp)
+        return api_resp
 
-    @cached(TTLCache(maxsize=64, ttl=90))
+    @cached(TTLCache(maxsize=API_CACHE_SIZE, ttl=API_CACHE_TTL))
     async def scheduled_maintenance(self, service_id: str, etag: str = "") -> APIResp:
-        headers = {"If-None-Match": etag}
-        base = get_base(service_id)
+        return await self._get("scheduled", "scheduled-maintenances.json", service_id, etag)
 
-        resp = await self.session.get(
-            f"{base}/scheduled-maintenances.json", headers=headers, timeout=10
-        )
-
-        resp_json = await resp.json() if resp.status == 200 else {}
-        return APIResp(resp_json, resp.headers.get("Etag", ""), resp.status)
-
-    @cached(TTLCache(maxsize=64, ttl=90))
+    @cached(TTLCache(maxsize=API_CACHE_SIZE, ttl=API_CACHE_TTL))
     async def incidents(self, service_id: str, etag: str = "") -> APIResp:
-        headers = {"If-None-Match": etag}
-        base = get_base(service_id)
-
-        resp = await self.session.get(f"{base}/incidents.json", headers=headers, timeout=10)
-
-        resp_json = await resp.json() if resp.status == 200 else {}
-        return APIResp(resp_json, resp.headers.get("Etag", ""), resp.status)
+        return await self._get("incidents", "incidents.json", service_id, etag)
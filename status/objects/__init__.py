@@ -1,6 +1,16 @@
-from .caches import LastChecked, ServiceCooldown, ServiceRestrictionsCache, UsedFeeds
+from .caches import (
+    ComponentTracker,
+    LastChecked,
+    ProcessCache,
+    ServiceCooldown,
+    ServiceRestrictionsCache,
+    SubscriptionIndex,
+    UsedFeeds,
+    WebhookCache,
+)
 from .channel import ChannelData, CogDisabled, InvalidChannel, NoPermission, NotFound
 from .configwrapper import ConfigWrapper
-from .incidentdata import IncidentData, Update, UpdateField
-from .sendcache import SendCache
-from .typeddict import ConfChannelSettings, ConfFeeds, IncidentDataDict
+from .eventqueue import BroadcastEvent, EventQueue
+from .incidentdata import ComponentChange, IncidentData, Update, UpdateField
+from .sendcache import PayloadEmbed, SendCache
+from .typeddict import ConfChannelSettings, ConfFeeds, ConfWebhook, IncidentDataDict
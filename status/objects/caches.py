@@ -1,14 +1,32 @@
-from collections import defaultdict, deque
-from time import time
-from typing import Deque, Dict, List, Literal, Union
-
-from status.core import FEEDS, SERVICE_LITERAL
+from collections import OrderedDict
+from time import monotonic, time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+)
+
+from dateutil.parser import parse as parse_time
+from discord import TextChannel
+
+from status.core import FEEDS
+
+from .incidentdata import ComponentChange
+from .typeddict import ConfChannelSettings, ConfWebhook
 
 
 class UsedFeeds:
     """Counts for used feeds, for the update loop."""
 
-    def __init__(self, all_channels: Dict[str, Dict[str, Dict[SERVICE_LITERAL, dict]]]):
+    def __init__(self, all_channels: Dict[str, Dict[str, Dict[str, dict]]]):
         used_feeds = dict.fromkeys(FEEDS.keys(), 0)
 
         for _, data in all_channels.items():
@@ -21,55 +39,188 @@ class UsedFeeds:
         data = " ".join(f"{i[0]}={i[1]}" for i in self.__data.items())
         return f"<{data}>"
 
-    def add_feed(self, feedname: SERVICE_LITERAL) -> None:
+    def add_feed(self, feedname: str) -> None:
         self.__data[feedname] = self.__data.get(feedname, 0) + 1
 
-    def remove_feed(self, feedname: SERVICE_LITERAL) -> None:
+    def remove_feed(self, feedname: str) -> None:
         self.__data[feedname] = self.__data.get(feedname, 1) - 1
 
+    def get_count(self, feedname: str) -> int:
+        return self.__data.get(feedname, 0)
+
     def get_list(self) -> list:
         return [k for k, v in self.__data.items() if v]
 
 
-# god why did implement this shit feature
-# this cache needs quite a rewrite...
+class SubscriptionIndex:
+    """Inverted index of service -> {channel ID: settings}, so the channels for a service don't
+    need to be read and filtered from config for every update."""
+
+    def __init__(self, all_channels: Dict[int, Dict[str, Dict[str, ConfChannelSettings]]]):
+        __data: Dict[str, Dict[int, ConfChannelSettings]] = {}
+
+        for c_id, data in all_channels.items():
+            for service, settings in data.get("feeds", {}).items():
+                __data.setdefault(service, {})[c_id] = settings
+
+        self.__data = __data
+
+    def __repr__(self):
+        data = " ".join(f"{k}={len(v)}" for k, v in self.__data.items())
+        return f"<{data}>"
+
+    def add(self, service: str, channel_id: int, settings: ConfChannelSettings) -> None:
+        """Add (or overwrite) a channel's settings for a service."""
+        self.__data.setdefault(service, {})[channel_id] = settings
+
+    def remove(self, service: str, channel_id: int) -> None:
+        """Remove a channel from a service."""
+        self.__data.get(service, {}).pop(channel_id, None)
+
+    def get_service(self, service: str) -> Dict[int, ConfChannelSettings]:
+        """Get the channels for a service. The dict returned is a copy, so it won't change
+        during sending."""
+        return dict(self.__data.get(service, {}))
+
+    def get_channel(self, channel_id: int) -> Dict[str, ConfChannelSettings]:
+        """Get the services a channel receives updates for, with their settings."""
+        return {
+            service: channels[channel_id]
+            for service, channels in self.__data.items()
+            if channel_id in channels
+        }
+
+    def services(self) -> List[str]:
+        """Get the services at least one channel receives updates for."""
+        return [service for service, channels in self.__data.items() if channels]
+
+    def count(self, service: str) -> int:
+        return len(self.__data.get(service, {}))
+
+
 class ServiceRestrictionsCache:
-    """Holds channel restrictions (for members) for when automatic updates are configured."""
+    """Holds channel restrictions (for members) for when automatic updates are configured.
+
+    Guild ID -> service -> frozenset of channel IDs. Services (and guilds) with no restricted
+    channels aren't stored. The mentions of each guild's restricted channels are cached once they
+    all resolve, until the restrictions for that service change or one of them is deleted.
+    """
 
     def __init__(self, all_guilds: Dict[int, Dict[str, Dict[str, List[int]]]]):
-        __data: Dict[int, Dict[str, List[int]]] = {}
+        __data: Dict[int, Dict[str, FrozenSet[int]]] = {}
 
         for g_id, data in all_guilds.items():
-            __data[g_id] = data["service_restrictions"]
+            services = {
+                service: frozenset(channels)
+                for service, channels in data.get("service_restrictions", {}).items()
+                if channels
+            }
+            if services:
+                __data[g_id] = services
 
         self.__data = __data
+        self.__mentions: Dict[Tuple[int, str], List[str]] = {}
+
+    def __repr__(self):
+        return f"<ServiceRestrictionsCache guilds={len(self.__data)}>"
+
+    def _set(self, guild_id: int, service: str, channels: FrozenSet[int]) -> None:
+        self.__mentions.pop((guild_id, service), None)
+        if channels:
+            self.__data.setdefault(guild_id, {})[service] = channels
+            return
+
+        guild = self.__data.get(guild_id, {})
+        guild.pop(service, None)
+        if not guild:
+            self.__data.pop(guild_id, None)
 
     def add_restriction(self, guild_id: int, service: str, channel_id: int) -> None:
         """Add a channel to the restriction cache."""
-        try:
-            self.__data[guild_id]
-        except KeyError:
-            self.__data[guild_id] = dict.fromkeys(FEEDS.keys(), [])
-
-        try:
-            self.__data[guild_id][service].append(channel_id)
-        except KeyError:
-            self.__data[guild_id][service] = [channel_id]
+        self._set(guild_id, service, self.get_guild(guild_id, service) | {channel_id})
 
     def remove_restriction(self, guild_id: int, service: str, channel_id: int) -> None:
         """Remove a channel from the restriction cache."""
-        try:
-            self.__data.get(guild_id, {}).get(service, []).remove(channel_id)
-        except ValueError:  # not in list
-            pass
+        self._set(guild_id, service, self.get_guild(guild_id, service) - {channel_id})
 
-    def get_guild(self, guild_id: int, service: str = None) -> Union[dict, list]:
+    @overload
+    def get_guild(self, guild_id: int) -> Dict[str, FrozenSet[int]]:
+        ...
+
+    @overload
+    def get_guild(self, guild_id: int, service: str) -> FrozenSet[int]:
+        ...
+
+    def get_guild(
+        self, guild_id: int, service: Optional[str] = None
+    ) -> Union[Dict[str, FrozenSet[int]], FrozenSet[int]]:
         """Get the channels, optionally for a specific service, in a guild."""
         if service:
-            return self.__data.get(guild_id, {}).get(service, [])
+            return self.__data.get(guild_id, {}).get(service, frozenset())
         else:
             return self.__data.get(guild_id, {})
 
+    def get_mentions(
+        self, guild_id: int, service: str, get_channel: Callable[[int], Any]
+    ) -> List[str]:
+        """Get the mentions of the text channels a service is restricted to in a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            Guild ID
+        service : str
+            Service name
+        get_channel : Callable[[int], Any]
+            Used to resolve channels, usually ``bot.get_channel``
+
+        Returns
+        -------
+        List[str]
+            Channel mentions, empty if there are no (valid) restrictions
+        """
+        key = (guild_id, service)
+        c_ids = self.get_guild(guild_id, service)
+        # checking they still exist is a dict lookup each, so deleted channels aren't offered
+        channels = [get_channel(c_id) for c_id in c_ids]
+        if all(isinstance(c, TextChannel) for c in channels):
+            if (mentions := self.__mentions.get(key)) is None:
+                mentions = self.__mentions[key] = [c.mention for c in channels]
+            return mentions
+
+        # eg deleted, or the guild is unavailable. don't cache, it might come back
+        self.__mentions.pop(key, None)
+        return [c.mention for c in channels if isinstance(c, TextChannel)]
+
+
+class WebhookCache:
+    """Holds the webhook (ID and token) used in each channel, so it doesn't need to be fetched
+    for every update."""
+
+    def __init__(self, all_channels: Dict[int, dict]):
+        __data: Dict[int, ConfWebhook] = {}
+
+        for c_id, data in all_channels.items():
+            if webhook := data.get("webhook_cache"):
+                __data[c_id] = webhook
+
+        self.__data = __data
+
+    def __repr__(self):
+        return f"<WebhookCache channels={len(self.__data)}>"
+
+    def get(self, channel_id: int) -> Optional[ConfWebhook]:
+        """Get the cached webhook for a channel, if there is one."""
+        return self.__data.get(channel_id)
+
+    def set(self, channel_id: int, webhook_id: int, token: str) -> None:
+        """Cache a channel's webhook."""
+        self.__data[channel_id] = {"id": webhook_id, "token": token}
+
+    def remove(self, channel_id: int) -> None:
+        """Remove a channel's webhook from the cache, eg if it was deleted."""
+        self.__data.pop(channel_id, None)
+
 
 class LastChecked:
     """Store when incidents were last checked."""
@@ -78,11 +229,8 @@ class LastChecked:
         self.last_checked: Dict[str, float] = {}
 
     def __repr__(self):
-        m = "<"
-        for service in FEEDS.keys():
-            m += f"{service}={getattr(self, service, 0.0)} "
-        m = m.rstrip()
-        return m + ">"
+        data = " ".join(f"{k}={v}" for k, v in self.last_checked.items())
+        return f"<{data}>"
 
     def get_time(self, service: str) -> float:
         return self.last_checked.get(service, 0.0)
@@ -91,35 +239,159 @@ class LastChecked:
         self.last_checked[service] = time()
 
 
-class ServiceCooldown:
+class ComponentTracker:
+    """Holds the last known status of each component, per service, to diff new responses
+    against."""
+
     def __init__(self) -> None:
-        self.__data: Dict[int, Dict[str, Deque[float]]] = defaultdict(dict)
+        self.__data: Dict[str, Dict[str, str]] = {}
 
     def __repr__(self):
-        return str(self.__data)
-
-    # so, the data for each service is like this: [float, float]
-    # pos 0 is the latest invoke
-    # pos 1 is the second most recent
-    # all others aren't stored because they dont matter
-    #
-    # so if pos 1 was within the last 120 seconds there have been 2 valid invocations
-    # which means there needs to be a cooldown
-    #
-    # otherwise, basically pos 0 moves to pos 1 with append_left
-    # and pos 0 becomes the current time
+        data = " ".join(f"{k}={len(v)}" for k, v in self.__data.items())
+        return f"<{data}>"
 
-    def handle(self, user_id: int, service: str) -> Union[float, Literal[False]]:
-        cooldown_data = self.__data.get(user_id, {}).get(service, deque([0.0, 0.0], maxlen=2))
-        time_since = abs(time() - cooldown_data[1])  # their second to last invoke
-        if time_since < 120:  # their second to last invoke was within last 2 mins
-            return 120 - time_since
+    def get_service(self, service: str) -> Dict[str, str]:
+        """Get component ID -> status for a service."""
+        return dict(self.__data.get(service, {}))
+
+    def diff(self, service: str, components: List[dict]) -> List[ComponentChange]:
+        """Update the statuses for a service and return what changed. The first time a service
+        is seen there is nothing to compare to, so nothing is returned.
+
+        Parameters
+        ----------
+        service : str
+            The service the components are from
+        components : List[dict]
+            Components from the Status API
+
+        Returns
+        -------
+        List[ComponentChange]
+            Changes since the last call for this service
+        """
+        old = self.__data.get(service)
+        groups = {c["id"]: c.get("name", "") for c in components if c.get("group")}
+
+        new: Dict[str, str] = {}
+        changes = []
+        for comp in components:
+            if comp.get("group"):  # a group's status is just the worst of its components
+                continue
+            new[comp["id"]] = comp["status"]
+            if old is None or old.get(comp["id"], comp["status"]) == comp["status"]:
+                continue
+            changes.append(
+                ComponentChange(
+                    component_id=comp["id"],
+                    name=comp.get("name", ""),
+                    group=groups.get(comp.get("group_id") or ""),
+                    old_status=old[comp["id"]],
+                    new_status=comp["status"],
+                    time=parse_time(comp["updated_at"]),
+                )
+            )
+
+        self.__data[service] = new
+        return changes
+
+
+COOLDOWN_PERIOD = 120  # seconds, 2 uses are allowed in this time
+
+
+class ServiceCooldown:
+    """Per user, per service cooldown of 2 uses every 2 minutes.
 
-        cooldown_data.appendleft(time())
+    Entries are kept in order of their latest use, so ones older than the cooldown (which can't
+    affect it anymore) are evicted from the front. Memory depends on recent usage, not on the
+    number of users.
+    """
 
-        self.__data[user_id][service] = cooldown_data
+    def __init__(self, period: float = COOLDOWN_PERIOD) -> None:
+        self.period = period
+        # (user ID, service) -> (latest use, second to latest use), oldest latest use first
+        self.__data: "OrderedDict[Tuple[int, str], Tuple[float, float]]" = OrderedDict()
 
+    def __repr__(self):
+        return f"<ServiceCooldown entries={len(self.__data)}>"
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def _evict(self, now: float) -> None:
+        while self.__data:
+            latest, _ = next(iter(self.__data.values()))
+            if now - latest < self.period:
+                break
+            self.__data.popitem(last=False)
+
+    def handle(self, user_id: int, service: str) -> Union[float, Literal[False]]:
+        """Record a use, if they aren't on cooldown.
+
+        Returns
+        -------
+        Union[float, Literal[False]]
+            Seconds until the cooldown is over, or False if they aren't on cooldown
+        """
+        now = monotonic()
+        self._evict(now)
+
+        key = (user_id, service)
+        latest, previous = self.__data.get(key, (0.0, 0.0))
+        time_since = now - previous  # their second to last use
+        if previous and time_since < self.period:
+            return self.period - time_since
+
+        self.__data[key] = (now, latest)
+        self.__data.move_to_end(key)
         return False
 
-    def get_from_id(self, user_id: int) -> dict:
-        return self.__data.get(user_id, {})
+    def get_from_id(self, user_id: int) -> Dict[str, Tuple[float, float]]:
+        """Get a user's entries, service -> (latest use, second to latest use)."""
+        return {
+            service: times for (u_id, service), times in self.__data.items() if u_id == user_id
+        }
+
+
+class ProcessCache:
+    """A bounded LRU cache for parsed data (eg UpdateFields and IncidentData), with hit rate
+    counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __repr__(self):
+        return (
+            f"<ProcessCache size={len(self.__data)}/{self.maxsize} hits={self.hits} "
+            f"misses={self.misses} hit_rate={self.hit_rate:.1%}>"
+        )
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get an item, marking it as recently used. None if it's not cached."""
+        try:
+            value = self.__data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Add an item, evicting the least recently used if the cache is full."""
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Optional
 
 from discord import TextChannel
 
@@ -11,7 +11,7 @@ class ChannelData:
     channel: TextChannel
     mode: MODES_LITERAL
     webhook: bool
-    edit_id: Dict[str, int]
+    edit_id: Optional[int]  # message to edit for the incident being sent, in edit mode
     embed: bool
 
 
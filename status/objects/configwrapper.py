@@ -1,14 +1,21 @@
+import asyncio
 import datetime
-from typing import Dict, Tuple, Union
+import logging
+from time import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
+from discord import Webhook
 from redbot.core import Config
 
 from status.core import SERVICE_LITERAL
+from status.core.consts import EDIT_ID_PRUNE_DAYS, EDIT_IDS_GROUP, MISSING_CHANNEL_PRUNE_HOURS
 
-from .caches import LastChecked
+from .caches import LastChecked, SubscriptionIndex, UsedFeeds, WebhookCache
 from .incidentdata import IncidentData, UpdateField
 from .typeddict import ConfChannelSettings, ConfFeeds, IncidentDataDict
 
+_log = logging.getLogger("red.vex.status.configwrapper")
+
 
 class ConfigWrapper:
     """A wrapper which does a few things."""
@@ -16,14 +23,26 @@ class ConfigWrapper:
     def __init__(self, config: Config, last_checked: LastChecked):
         self.config = config
         self.last_checked = last_checked
+        # both replaced with the real data in _async_init
+        self.webhook_cache = WebhookCache({})
+        self.subscriptions = SubscriptionIndex({})
+        # channel ID -> when it was first missing, pruned after MISSING_CHANNEL_PRUNE_HOURS
+        self.missing_channels: Dict[int, float] = {}
+        # service -> latest incident, so previews don't need to deserialise it from config
+        self.latest: Dict[str, IncidentData] = {}
+        # service -> incident ID -> {channel ID: message ID}, replaced in load_edit_ids
+        self.edit_ids: Dict[str, Dict[str, Dict[int, int]]] = {}
 
     async def get_latest(
         self, service: SERVICE_LITERAL
     ) -> Union[Tuple[IncidentData, Dict[str, float]], Tuple[None, None]]:  # ... this is long
+        extra_info = {"checked": self.last_checked.get_time(service)}
+        if cached := self.latest.get(service):
+            return cached, extra_info
+
         incident: ConfFeeds = (await self.config.feed_store()).get(service, {})
         if not incident:
             return None, None
-        extra_info = {"checked": self.last_checked.get_time(service)}
 
         deserialised: IncidentDataDict = {"fields": []}
         if incident["time"]:
@@ -50,6 +69,7 @@ class ConfigWrapper:
             incident_id=incident.get("incident_id", ""),
             scheduled_for=deserialised.get("scheduled_for"),
         )
+        self.latest[service] = incidentdata
 
         return incidentdata, extra_info
 
@@ -69,24 +89,173 @@ class ConfigWrapper:
             feeddict["scheduled_for"] = ""
 
         await self.config.feed_store.set_raw(service, value=feeddict)  # type:ignore
+        self.latest[service] = incidentdata
         self.last_checked.update_time(service)
 
     async def get_channels(self, service: str) -> Dict[int, ConfChannelSettings]:
         """Get the channels for a feed. The list is channel IDs from config, they may be
         invalid."""
-        feeds = await self.config.all_channels()
-        return {
-            name: data["feeds"][service]
-            for name, data in feeds.items()
-            if service in data["feeds"].keys()
+        return self.subscriptions.get_service(service)
+
+    def index_consistent(self, used_feeds: UsedFeeds, services: Iterable[str]) -> bool:
+        """Check the subscription index agrees with the used feeds counts, which are kept in
+        sync separately."""
+        return all(
+            self.subscriptions.count(service) == used_feeds.get_count(service)
+            for service in services
+        )
+
+    async def load_edit_ids(self, all_channels: Dict[int, dict]) -> None:
+        """Load the edit mode message IDs. The first time, those stored in each channel's feed
+        settings (before they had their own group) are moved, in one write."""
+        stored = await self.config.custom(EDIT_IDS_GROUP).all()
+        self.edit_ids = {
+            service: {
+                incident_id: {int(c_id): msg_id for c_id, msg_id in channels.items()}
+                for incident_id, channels in incidents.items()
+            }
+            for service, incidents in stored.items()
         }
+        if await self.config.edit_ids_moved():
+            return
+
+        for c_id, data in all_channels.items():
+            for service, settings in data.get("feeds", {}).items():
+                for incident_id, msg_id in (settings.get("edit_id") or {}).items():
+                    incidents = self.edit_ids.setdefault(service, {})
+                    incidents.setdefault(incident_id, {}).setdefault(c_id, msg_id)
+        await self.config.custom(EDIT_IDS_GROUP).set(
+            {
+                service: {
+                    incident_id: {str(c_id): msg_id for c_id, msg_id in channels.items()}
+                    for incident_id, channels in incidents.items()
+                }
+                for service, incidents in self.edit_ids.items()
+            }
+        )
+        await self.config.edit_ids_moved.set(True)
+
+    def get_edit_ids(self, service: str, incident_id: str) -> Dict[int, int]:
+        """Get the edit mode message IDs for an incident, format {CHANNEL ID: MESSAGE ID}."""
+        return dict(self.edit_ids.get(service, {}).get(incident_id, {}))
+
+    async def update_edit_ids(
+        self, service: str, incident_id: str, edit_ids: Dict[int, int], resolved: bool = False
+    ) -> None:
+        """Save the edit mode message IDs sent for an incident, for every channel in one write.
+
+        Parameters
+        ----------
+        service : str
+            The service the incident is from
+        incident_id : str
+            The incident the messages are for
+        edit_ids : Dict[int, int]
+            New message IDs, format {CHANNEL ID: MESSAGE ID}
+        resolved : bool
+            Whether this update resolved the incident, so its edit IDs can be pruned later
+        """
+        if edit_ids:
+            channels = self.edit_ids.setdefault(service, {}).setdefault(incident_id, {})
+            channels.update(edit_ids)
+            # edit IDs have their own group which [p]statusset never writes to, so this can't
+            # overwrite a subscription changed during sending
+            await self.config.custom(EDIT_IDS_GROUP, service, incident_id).set(
+                {str(c_id): msg_id for c_id, msg_id in channels.items()}
+            )
+
+        if resolved:
+            async with self.config.edit_id_resolved() as resolved_at:
+                resolved_at.setdefault(incident_id, time())
+
+    async def prune_edit_ids(self) -> None:
+        """Remove edit IDs for incidents resolved more than EDIT_ID_PRUNE_DAYS ago."""
+        resolved_at: Dict[str, float] = await self.config.edit_id_resolved()
+        cutoff = time() - EDIT_ID_PRUNE_DAYS * 86400
+        to_prune = {i for i, timestamp in resolved_at.items() if timestamp < cutoff}
+        if not to_prune:
+            return
+
+        # one write for each incident, however many channels it was sent to
+        for service, incidents in self.edit_ids.items():
+            for incident_id in to_prune.intersection(incidents):
+                del incidents[incident_id]
+                await self.config.custom(EDIT_IDS_GROUP, service, incident_id).clear()
+
+        async with self.config.edit_id_resolved() as resolved_at:
+            for incident_id in to_prune:
+                resolved_at.pop(incident_id, None)
+
+    async def forget_edit_ids(self, service: str, c_id: int) -> None:
+        """Forget a channel's edit mode message IDs for a service, eg when it switches between
+        webhooks and normal messages (which can't edit each other's messages)."""
+        for incident_id, channels in self.edit_ids.get(service, {}).items():
+            if channels.pop(c_id, None) is not None:
+                await self.config.custom(EDIT_IDS_GROUP, service, incident_id).clear_raw(str(c_id))
+
+    def mark_missing(self, c_ids: Iterable[int]) -> None:
+        """Record channels that couldn't be found while sending, so they can be pruned if they
+        stay missing."""
+        for c_id in c_ids:
+            if c_id not in self.missing_channels:
+                _log.info(
+                    f"I can't find the channel with id {c_id} - skipping, and removing it if it "
+                    f"doesn't come back within {MISSING_CHANNEL_PRUNE_HOURS} hours"
+                )
+                self.missing_channels[c_id] = time()
+
+    async def prune_missing_channels(
+        self, get_channel: Callable[[int], Any]
+    ) -> Dict[int, List[str]]:
+        """Remove channels that have been missing for MISSING_CHANNEL_PRUNE_HOURS from config and
+        the subscription index. Channels that have come back are forgotten about.
+
+        Parameters
+        ----------
+        get_channel : Callable[[int], Any]
+            Used to check if the channel is still missing, usually ``bot.get_channel``
+
+        Returns
+        -------
+        Dict[int, List[str]]
+            The services removed for each channel, so used feeds can be updated
+        """
+        cutoff = time() - MISSING_CHANNEL_PRUNE_HOURS * 3600
+        to_prune = []
+        for c_id, missing_since in list(self.missing_channels.items()):
+            if get_channel(c_id) is not None:  # eg the guild was just unavailable
+                del self.missing_channels[c_id]
+            elif missing_since < cutoff:
+                to_prune.append(c_id)
+        if not to_prune:
+            return {}
+
+        removed: Dict[int, List[str]] = {}
+        for c_id in to_prune:
+            removed[c_id] = list(self.subscriptions.get_channel(c_id))
+            for service in removed[c_id]:
+                self.subscriptions.remove(service, c_id)
+            self.webhook_cache.remove(c_id)
+            del self.missing_channels[c_id]
+        await asyncio.gather(*(self.config.channel_from_id(c_id).clear() for c_id in to_prune))
+
+        _log.info(f"Removed {len(to_prune)} channels that no longer exist from config.")
+        return removed
+
+    async def update_webhook(self, c_id: int, webhook: Webhook) -> None:
+        """Cache a channel's webhook, both in memory and in config."""
+        if not webhook.token:  # can't send with it anyway
+            return
+
+        self.webhook_cache.set(c_id, webhook.id, webhook.token)
+        await self.config.channel_from_id(c_id).webhook_cache.set(
+            {"id": webhook.id, "token": webhook.token}
+        )
 
-    async def update_edit_id(self, c_id: int, service: str, incident_id: str, msg_id: int) -> None:
-        async with self.config.channel_from_id(c_id).feeds() as feeds:
-            if feeds[service].get("edit_id") is None:
-                feeds[service]["edit_id"] = {incident_id: msg_id}
-            else:
-                feeds[service]["edit_id"][incident_id] = msg_id
+    async def clear_webhook(self, c_id: int) -> None:
+        """Forget a channel's webhook, eg when it's been deleted."""
+        self.webhook_cache.remove(c_id)
+        await self.config.channel_from_id(c_id).webhook_cache.clear()
 
     def __repr__(self) -> str:
         return f"ConfigWrapper(config={self.config}, last_checked={self.last_checked}"
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import List, NamedTuple, Optional
+
+from redbot.core.bot import Red
+
+from .channel import ChannelData
+from .incidentdata import Update
+
+_log = logging.getLogger("red.vex.status.eventqueue")
+
+EVENT_NAME = "vexed_status_broadcast"
+LISTENER_TIMEOUT = 30  # seconds to wait for listeners to finish with an event
+
+
+class BroadcastEvent(NamedTuple):
+    service: str
+    update: Update
+    channels: List[ChannelData]
+    force: bool
+
+
+class EventQueue:
+    """A bounded queue of events to dispatch to other cogs, with one event per broadcast
+    instead of one per channel.
+
+    Each event is passed to the listeners directly, and the next one isn't taken from the queue
+    until they've finished with it (or `timeout` seconds have passed). If the queue is full,
+    `put` waits for space, so a slow consumer applies backpressure to sending instead of events
+    piling up in memory.
+    """
+
+    def __init__(self, bot: Red, maxsize: int = 100, timeout: float = LISTENER_TIMEOUT):
+        self.bot = bot
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.dispatched = 0
+
+        self._queue: "asyncio.Queue[BroadcastEvent]" = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"<EventQueue qsize={self.qsize()} maxsize={self.maxsize} "
+            f"dispatched={self.dispatched}>"
+        )
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._worker())
+
+    def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def put(self, event: BroadcastEvent) -> None:
+        await self._queue.put(event)
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._call_listeners(event)
+                self.dispatched += 1
+            except asyncio.TimeoutError:
+                _log.warning(
+                    "Listeners for a %s status event took over %s seconds, moving on.",
+                    event.service,
+                    self.timeout,
+                )
+            except Exception:
+                _log.warning("Unable to dispatch a status event.", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _call_listeners(self, event: BroadcastEvent) -> None:
+        # bot.dispatch only schedules the listeners, so they're called here to wait for them
+        listeners = self.bot.extra_events.get("on_" + EVENT_NAME, [])
+        coros = [
+            listener(
+                service=event.service,
+                update=event.update,
+                channels=event.channels,
+                force=event.force,
+            )
+            for listener in listeners
+        ]
+        if not coros:
+            return
+        results = await asyncio.wait_for(
+            asyncio.gather(*coros, return_exceptions=True), self.timeout
+        )
+        for listener, result in zip(listeners, results):
+            if isinstance(result, Exception):
+                _log.warning(
+                    "Error in %s listener %r.",
+                    EVENT_NAME,
+                    listener,
+                    exc_info=(type(result), result, result.__traceback__),
+                )
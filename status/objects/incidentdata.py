@@ -60,6 +60,13 @@ class IncidentData:
         """Get the group IDs for this feed, in order."""
         return deduplicate_iterables([field.update_id for field in self.fields])
 
+    def is_resolved(self) -> bool:
+        """Whether the latest update on this incident resolves (or completes) it."""
+        for update_field in reversed(self.fields):
+            if update_field.name != "\u200b":  # continued long field
+                return update_field.name.split(" ")[0].lower() in ("resolved", "completed")
+        return False
+
 
 @dataclass
 class Update:
@@ -67,3 +74,15 @@ class Update:
 
     incidentdata: IncidentData
     new_fields: List[UpdateField]
+
+
+@dataclass
+class ComponentChange:
+    """A change in the status of a component on a statuspage."""
+
+    component_id: str
+    name: str
+    group: Optional[str]
+    old_status: str
+    new_status: str
+    time: datetime.datetime
@@ -1,35 +1,64 @@
 import logging
-import re
-from typing import Literal, Union
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Literal, Mapping, Tuple, Union
 
 from discord import Colour, Embed
 from redbot.core.utils.chat_formatting import pagify
 
-from status.core import FEEDS, LINK_RE, SERVICE_LITERAL
+from status.core import FEEDS, LINK_RE, SERVICE_LITERAL, UPDATE_NAME, get_icon
 
-from .incidentdata import Update
+from .incidentdata import Update, UpdateField
 
 _log = logging.getLogger("red.vex.status.sendupdate")
 
 
-# TODO: implement separation for normal embeds and webhook embeds here
+class PayloadEmbed(Embed):
+    """An embed which sends a pre-serialised payload from SendCache, with only a per-channel
+    delta (eg footer) applied on top. The payload is never copied deeply or re-validated."""
+
+    def __init__(self, payload: Mapping[str, Any], **delta: Any):
+        # not calling super().__init__, discord.py only uses to_dict() when sending
+        self._payload = payload
+        self._delta = delta
+
+    def __repr__(self):
+        return f"PayloadEmbed({dict(self._payload)}, **{self._delta})"
+
+    def to_dict(self) -> Dict[str, Any]:  # type:ignore
+        return {**self._payload, **self._delta}
 
 
 class SendCache:
+    """Pre-rendered payloads for each variant of an update. These are immutable and shared
+    between every channel the update is sent to."""
+
     def __init__(self, update: Update, service: SERVICE_LITERAL):
         self.__incidentdata = update.incidentdata
         self.__new_fields = update.new_fields
         self.__service = service
 
-        self.embed_latest = self._make_embed_latest()
-        self.embed_all = self._make_embed_all()
-        self.plain_all = self._make_plain_latest()
-        self.plain_latest = self._make_plain_all()
+        # webhooks have the service name and icon as their name and avatar, so no author
+        webhook_latest = self._make_embed_latest().to_dict()
+        webhook_all = self._make_embed_all().to_dict()
+        author = {"name": UPDATE_NAME.format(FEEDS[service]["friendly"])}
+        if icon := get_icon(service):
+            author["icon_url"] = icon
+
+        self.webhook_latest: Mapping[str, Any] = MappingProxyType(webhook_latest)
+        self.webhook_all: Mapping[str, Any] = MappingProxyType(webhook_all)
+        self.embed_latest: Mapping[str, Any] = MappingProxyType(
+            {**webhook_latest, "author": author}
+        )
+        self.embed_all: Mapping[str, Any] = MappingProxyType({**webhook_all, "author": author})
+        # long updates are split over multiple messages, which are sent in order
+        plain_base = self._make_plain_base()
+        self.plain_latest = self._make_plain(plain_base, self.__new_fields)
+        self.plain_all = self._make_plain(plain_base, self.__incidentdata.fields)
 
     def __repr__(self):
         return (
-            f'SendCache({self.embed_latest}, {self.embed_all}, "{self.plain_all}", '
-            f'"{self.plain_latest}")'
+            f"SendCache({dict(self.embed_latest)}, {dict(self.embed_all)}, "
+            f'"{self.plain_latest}", "{self.plain_all}")'
         )
 
     def _make_embed_base(self) -> Embed:
@@ -86,30 +115,18 @@ class SendCache:
 
         return f"**{name} Status Update\n{title}**\nIncident link: {link}\n{description}\n"
 
-    def _make_plain_latest(self) -> str:
-        msg = self._make_plain_base()
-        for field in self.__new_fields:
-            msg += f"**{field.name}**\n{field.value}\n"
-
-        msg = re.sub(LINK_RE, r"<\1>", msg)
-
-        return list(pagify(msg))[0]  # i really dont care about better handling for plain messages
-
-    def _make_plain_all(self) -> str:
-        msg = self._make_plain_base()
-        for field in self.__incidentdata.fields:
-            msg += f"**{field.name}**\n{field.value}\n"
-
-        msg = re.sub(LINK_RE, r"<\1>", msg)
-
-        return list(pagify(msg))[0]  # i really dont care about better handling for plain messages
+    @staticmethod
+    def _make_plain(base: str, fields: Iterable[UpdateField]) -> Tuple[str, ...]:
+        """Build the whole message in one go, then split it into pages that fit in a message."""
+        msg = base + "".join(f"**{field.name}**\n{field.value}\n" for field in fields)
+        return tuple(pagify(LINK_RE.sub(r"<\1>", msg)))
 
     def _get_colour(self) -> Union[Colour, Literal[1812720]]:
         try:
             last_title = self.__incidentdata.fields[-1].name
             status = last_title.split(" ")[0].lower()
 
-            if status == "identified":
+            if status in ["identified", "major"]:  # major is a component's "major outage"
                 return Colour.red()
             elif status in [
                 "update",
@@ -118,9 +135,12 @@ class SendCache:
                 "scheduled",  # decided to put this in orange as is in future, not now
                 "in",  # scheduled - full is "in progress"
                 "verifying",
+                "degraded",  # components, eg "degraded performance"
+                "partial",
+                "under",  # "under maintenance"
             ]:
                 return Colour.orange()
-            elif status in ["resolved", "completed"]:
+            elif status in ["resolved", "completed", "operational"]:
                 return Colour.green()
             else:
                 return 1812720
@@ -6,12 +6,21 @@ from status.core import MODES_LITERAL
 from .incidentdata import UpdateField
 
 
-class ConfChannelSettings(TypedDict):
+class _ConfChannelSettingsOptional(TypedDict, total=False):
+    components: bool  # also send component status changes
+
+
+class ConfChannelSettings(_ConfChannelSettingsOptional):
     mode: MODES_LITERAL
     webhook: bool
     edit_id: Dict[str, int]
 
 
+class ConfWebhook(TypedDict):
+    id: int
+    token: str
+
+
 class _ConfFeedsFields(TypedDict):
     name: str
     value: str
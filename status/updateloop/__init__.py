@@ -1,3 +1,3 @@
-from .processfeed import process_json
+from .processfeed import filter_changed, process_component_changes, process_json
 from .sendupdate import SendUpdate
 from .updatechecker import StatusLoop
@@ -1,14 +1,19 @@
 import datetime
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from dateutil.parser import parse as parse_time
 from markdownify import markdownify
 from redbot.core.utils.chat_formatting import humanize_list, pagify
 from vexcogutils.chat import datetime_to_timestamp
 
-from status.core import TYPES_LITERAL
-from status.objects import IncidentData, UpdateField
+from status.core import FEEDS, TYPES_LITERAL
+from status.objects import ComponentChange, IncidentData, ProcessCache, Update, UpdateField
+
+# parsing (mainly markdownify) is the slow bit, and most updates don't change between checks
+# incidents are keyed by (type, ID, updated_at) and updates by (ID, updated_at)
+incident_cache = ProcessCache(maxsize=512)
+update_cache = ProcessCache(maxsize=2048)
 
 
 def _handle_long_fields(
@@ -65,27 +70,28 @@ def _handle_html(text: str) -> str:
     return markdownify(text)
 
 
-def _process(incident: dict, type: TYPES_LITERAL) -> IncidentData:
-    """Turn a API JSON incident/maintenance into IncidentData
+def _process_update(update: dict) -> List[UpdateField]:
+    """Turn a API JSON incident update into field(s), using the cache if it's unchanged.
 
     Parameters
     ----------
-    incident : dict
-        JSON resp from Status API
-    type : TYPES_LITERAL
-        Either "incidents" or "scheduled"
+    update : dict
+        Incident update from the Status API
 
     Returns
     -------
-    IncidentData
-        Standard object for further processing.
+    List[UpdateField]
+        Field(s) for the update, which may be split to not exceed per-field embed limits
     """
-    fields = []
-    for update in incident["incident_updates"]:
-        # this is exactly how they are displayed on the website
-        dt = parse_time(update["created_at"])
+    cache_key = (update["id"], update.get("updated_at"))
+    if (cached := update_cache.get(cache_key)) is not None:
+        return cached
 
-        fields.append(
+    # this is exactly how they are displayed on the website
+    dt = parse_time(update["created_at"])
+
+    fields = _handle_long_fields(
+        [
             UpdateField(
                 name="{} - {}".format(
                     update["status"].replace("_", " ").capitalize(), datetime_to_timestamp(dt)
@@ -93,13 +99,38 @@ def _process(incident: dict, type: TYPES_LITERAL) -> IncidentData:
                 value=_handle_html(update["body"]),
                 update_id=update["id"],
             )
-        )
+        ]
+    )
+    update_cache.set(cache_key, fields)
+
+    return fields
 
-    actual_update_time = parse_time(incident["incident_updates"][0]["created_at"])
+
+def _process(incident: dict, type: TYPES_LITERAL) -> IncidentData:
+    """Turn a API JSON incident/maintenance into IncidentData
+
+    Parameters
+    ----------
+    incident : dict
+        JSON resp from Status API
+    type : TYPES_LITERAL
+        Either "incidents" or "scheduled"
+
+    Returns
+    -------
+    IncidentData
+        Standard object for further processing.
+    """
+    cache_key = (type, incident["id"], incident["updated_at"])
+    if (cached := incident_cache.get(cache_key)) is not None:
+        return cached
 
     # statuspage why do you give everything in the wrong order...
-    fields.reverse()
-    fields = _handle_long_fields(fields)
+    fields = []
+    for update in reversed(incident["incident_updates"]):
+        fields.extend(_process_update(update))
+
+    actual_update_time = parse_time(incident["incident_updates"][0]["created_at"])
 
     affected_components = (
         humanize_list([c["name"] for c in incident.get("components", [])]) or "_Unknown_"
@@ -120,7 +151,7 @@ def _process(incident: dict, type: TYPES_LITERAL) -> IncidentData:
     if len(desc) > 4096:
         desc = desc[0:4050] + "\n..."  # v unlikely to happen... so im being lazy
 
-    return IncidentData(
+    incidentdata = IncidentData(
         fields=fields,
         time=parse_time(incident["updated_at"]),  # when statuspage claims it was updated
         title=incident["name"],
@@ -130,6 +161,47 @@ def _process(incident: dict, type: TYPES_LITERAL) -> IncidentData:
         incident_id=incident["id"],
         scheduled_for=scheduled_for,
     )
+    incident_cache.set(cache_key, incidentdata)
+
+    return incidentdata
+
+
+def _json_key(type: TYPES_LITERAL) -> str:
+    return "incidents" if type == "incidents" else "scheduled_maintenances"
+
+
+def filter_changed(
+    json_resp: dict, type: TYPES_LITERAL, seen: Dict[str, Tuple[str, int]]
+) -> Tuple[dict, Dict[str, Tuple[str, int]]]:
+    """Filter a response down to incidents which changed since it was last seen, without
+    parsing anything.
+
+    Parameters
+    ----------
+    json_resp : dict
+        Response from Status API
+    type : TYPES_LITERAL
+        Either "incidents" or "scheduled"
+    seen : Dict[str, Tuple[str, int]]
+        Incident ID -> (updated_at, update count) from the last time, from the return value of
+        this function
+
+    Returns
+    -------
+    Tuple[dict, Dict[str, Tuple[str, int]]]
+        Response with only changed incidents, and the new incident ID -> (updated_at, update
+        count) to pass back in next time
+    """
+    key = _json_key(type)
+    new_seen: Dict[str, Tuple[str, int]] = {}
+    changed = []
+    for incident in json_resp.get(key, []):
+        state = (incident["updated_at"], len(incident["incident_updates"]))
+        new_seen[incident["id"]] = state
+        if seen.get(incident["id"]) != state:
+            changed.append(incident)
+
+    return {key: changed}, new_seen
 
 
 def process_json(json_resp: dict, type: TYPES_LITERAL) -> List[IncidentData]:
@@ -152,3 +224,44 @@ def process_json(json_resp: dict, type: TYPES_LITERAL) -> List[IncidentData]:
             _process(j_data, "scheduled") for j_data in json_resp.get("scheduled_maintenances", [])
         ]
     return []
+
+
+def process_component_changes(changes: List[ComponentChange], service: str) -> Update:
+    """Turn component changes into an Update, so they can be sent like incidents.
+
+    Parameters
+    ----------
+    changes : List[ComponentChange]
+        Changes from ComponentTracker.diff, must not be empty
+    service : str
+        The service they are from
+
+    Returns
+    -------
+    Update
+        With one field per change
+    """
+    fields = []
+    for change in changes:
+        name = f"{change.group}: {change.name}" if change.group else change.name
+        old = change.old_status.replace("_", " ")
+        new = change.new_status.replace("_", " ")
+        fields.append(
+            UpdateField(
+                name="{} - {}".format(new.capitalize(), datetime_to_timestamp(change.time)),
+                value=f"**{name}** is now {new} (was {old}).",
+                update_id=f"{change.component_id}-{change.time.timestamp()}",
+            )
+        )
+
+    latest = max(change.time for change in changes)
+    incidentdata = IncidentData(
+        fields=fields,
+        time=latest,
+        title="Component status changes",
+        link=FEEDS[service]["url"],
+        actual_time=latest,
+        description="",
+        incident_id=f"components-{int(latest.timestamp())}",
+    )
+    return Update(incidentdata, fields)
@@ -1,24 +1,24 @@
-import asyncio
 import logging
 from math import floor
 from time import monotonic
-from typing import Dict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from discord import Embed, Message, TextChannel
+from discord import Embed, HTTPException, Message, TextChannel, Webhook
 from redbot.core.bot import Red
 
-from status.core import FEEDS, UPDATE_NAME
-from status.core.consts import ICON_BASE
+from status.core import FEEDS, UPDATE_NAME, get_icon
 from status.objects import (
+    BroadcastEvent,
     ChannelData,
     ConfChannelSettings,
     ConfigWrapper,
-    InvalidChannel,
+    EventQueue,
+    PayloadEmbed,
     SendCache,
     Update,
 )
 
-from .utils import get_channel_data, get_webhook
+from .utils import ChannelChecks, get_webhook
 
 _log = logging.getLogger("red.vex.status.sendupdate")
 
@@ -35,6 +35,7 @@ class SendUpdate:
         sendcache: SendCache,
         dispatch: bool = True,
         force: bool = False,
+        event_queue: Optional[EventQueue] = None,
     ):
         self.bot = bot
         self.config_wrapper = config_wrapper
@@ -45,7 +46,12 @@ class SendUpdate:
         self.sendcache = sendcache
         self.dispatch = dispatch
         self.force = force
+        self.event_queue = event_queue
         self.channeldata: ChannelData
+        # channels sent to, for the broadcast event once sending has finished
+        self.sent_channels: List[ChannelData] = []
+        # new edit mode message IDs, saved to config in one go once sending has finished
+        self.edit_ids: Dict[int, int] = {}
 
     def __repr__(self):
         return (
@@ -63,80 +69,106 @@ class SendUpdate:
         """
         if self.dispatch:
             self._dispatch_main(channels)
-            # delay for listeners to do expensive stuff before channels start sending
-            await asyncio.sleep(1)
 
         start = monotonic()
         _log.info(f"Sending update for {self.service} to {len(channels)} channels...")
 
-        for c_id, settings in channels.items():
+        checks = ChannelChecks(self.bot)
+        all_channeldata = await checks.prefetch(
+            channels, self.config_wrapper.get_edit_ids(self.service, self.incidentdata.incident_id)
+        )
+        if checks.missing:
+            self.config_wrapper.mark_missing(checks.missing)
+
+        for c_id, channeldata in all_channeldata.items():
             try:
-                await self._send_updated_feed(c_id, settings)
+                await self._send_updated_feed(channeldata)
             except Exception:
-                return _log.warning(
-                    f"Something went wrong sending to {c_id} - skipping.", exc_info=True
-                )
+                _log.warning(f"Something went wrong sending to {c_id} - skipping.", exc_info=True)
+
+        resolved = not self.force and self.incidentdata.is_resolved()
+        if self.edit_ids or resolved:
+            await self.config_wrapper.update_edit_ids(
+                self.service, self.incidentdata.incident_id, self.edit_ids, resolved
+            )
+
+        if self.dispatch:
+            await self._dispatch_broadcast()
 
         end = monotonic()
         time = floor(end - start) or "under a"
         _log.info(f"Sending update for {self.service} took {time} second(s).")
 
-    async def _send_updated_feed(self, c_id: int, settings: ConfChannelSettings) -> None:
+    async def _send_updated_feed(self, channeldata: ChannelData) -> None:
         """Send feed decalred in init to a channel.
 
         Parameters
         ----------
-        c_id : int
-            Channel ID
-        settings : ConfChannelSettings
-            Settings for channel.
+        channeldata : ChannelData
+            The channel, with its settings and checks already resolved
         """
-        try:
-            channeldata = await get_channel_data(self.bot, c_id, settings)
-        except InvalidChannel:
-            return
-
         self.channeldata = channeldata
 
         if channeldata.embed:
-            if channeldata.mode in ["all", "edit"]:
-                embed = self.sendcache.embed_all
-            else:
-                embed = self.sendcache.embed_latest
-
             if channeldata.webhook:
-                await self._send_webhook(channeldata.channel, embed)
+                if channeldata.mode in ["all", "edit"]:
+                    payload = self.sendcache.webhook_all
+                else:
+                    payload = self.sendcache.webhook_latest
+
+                await self._send_webhook(channeldata.channel, payload)
             else:
-                await self._send_embed(channeldata.channel, embed)
+                if channeldata.mode in ["all", "edit"]:
+                    payload = self.sendcache.embed_all
+                else:
+                    payload = self.sendcache.embed_latest
+
+                await self._send_embed(channeldata.channel, payload)
 
         else:
             if channeldata.mode in ["all", "edit"]:
-                msg = self.sendcache.plain_all
+                pages = self.sendcache.plain_all
             else:
-                msg = self.sendcache.plain_latest
+                pages = self.sendcache.plain_latest
 
-            await self._send_plain(channeldata.channel, msg)
+            await self._send_plain(channeldata.channel, pages)
 
         if self.dispatch:
-            self._dispatch_channel(channeldata)
+            self.sent_channels.append(channeldata)
 
     # TODO: maybe try to do some DRY on the next 3
 
-    async def _send_webhook(self, channel: TextChannel, embed: Embed) -> None:
+    async def _send_webhook(self, channel: TextChannel, payload: Mapping[str, Any]) -> None:
         """Send a webhook to the specified channel
 
+        If the cached webhook is no longer valid it is cleared and the send is retried once with
+        a new one.
+
         Parameters
         ----------
         channel : TextChannel
             Channel to send to
-        embed : Embed
-            Embed to use
+        payload : Mapping[str, Any]
+            Pre-rendered embed payload from SendCache
         """
-        embed.set_footer(text=f"Powered by {channel.guild.me.name}")
-        webhook = await get_webhook(channel)
+        embed = PayloadEmbed(payload, footer={"text": f"Powered by {channel.guild.me.name}"})
+        webhook = await get_webhook(self.bot, channel, self.config_wrapper)
 
+        try:
+            await self._webhook_send_or_edit(channel, webhook, embed)
+        except HTTPException as e:
+            if e.status not in (401, 404):  # webhook deleted or token reset
+                raise
+            _log.debug(f"Cached webhook for {channel.id} is invalid, getting a new one.")
+            await self.config_wrapper.clear_webhook(channel.id)
+            webhook = await get_webhook(self.bot, channel, self.config_wrapper)
+            await self._webhook_send_or_edit(channel, webhook, embed)
+
+    async def _webhook_send_or_edit(
+        self, channel: TextChannel, webhook: Webhook, embed: Embed
+    ) -> None:
         if self.channeldata.mode == "edit":
-            if edit_id := self.channeldata.edit_id.get(self.incidentdata.incident_id):
+            if edit_id := self.channeldata.edit_id:
                 try:
                     await webhook.edit_message(edit_id, embed=embed, content=None)
                 except Exception:  # eg message deleted
@@ -144,38 +176,33 @@ class SendUpdate:
             if not edit_id:
                 sent_webhook = await webhook.send(
                     username=UPDATE_NAME.format(FEEDS[self.service]["friendly"]),
-                    avatar_url=ICON_BASE.format(self.service),
+                    avatar_url=get_icon(self.service),
                     embed=embed,
                     wait=True,
                 )
-                await self.config_wrapper.update_edit_id(
-                    channel.id, self.service, self.incidentdata.incident_id, sent_webhook.id
-                )
+                self.edit_ids[channel.id] = sent_webhook.id
 
         else:
             await webhook.send(
                 username=UPDATE_NAME.format(FEEDS[self.service]["friendly"]),
-                avatar_url=ICON_BASE.format(self.service),
+                avatar_url=get_icon(self.service),
                 embed=embed,
             )
 
-    async def _send_embed(self, channel: TextChannel, embed: Embed) -> None:
+    async def _send_embed(self, channel: TextChannel, payload: Mapping[str, Any]) -> None:
         """Send an embed to the specified channel
 
         Parameters
         ----------
         channel : TextChannel
             Channel to send to
-        embed : Embed
-            Embed to use
+        payload : Mapping[str, Any]
+            Pre-rendered embed payload from SendCache
         """
-        embed.set_author(
-            name=UPDATE_NAME.format(FEEDS[self.service]["friendly"]),
-            icon_url=ICON_BASE.format(self.service),
-        )
+        embed = PayloadEmbed(payload)
 
         if self.channeldata.mode == "edit":
-            if edit_id := self.channeldata.edit_id.get(self.incidentdata.incident_id):
+            if edit_id := self.channeldata.edit_id:
                 try:
                     message = channel.get_partial_message(edit_id)
                     await message.edit(embed=embed, content=None)
@@ -183,36 +210,42 @@ class SendUpdate:
                     edit_id = None
             if not edit_id:
                 sent_message: Message = await channel.send(embed=embed)
-                await self.config_wrapper.update_edit_id(
-                    channel.id, self.service, self.incidentdata.incident_id, sent_message.id
-                )
+                self.edit_ids[channel.id] = sent_message.id
         else:
             await channel.send(embed=embed)
 
-    async def _send_plain(self, channel: TextChannel, msg: str) -> None:
-        """Send a plain message to the specified channel
+    async def _send_plain(self, channel: TextChannel, pages: Tuple[str, ...]) -> None:
+        """Send a plain message, which may be split over multiple messages, to the specified
+        channel
+
+        In edit mode, the message is edited if the update still fits in one message. Otherwise
+        every page is sent again, and the first one is edited in future.
 
         Parameters
         ----------
         channel : TextChannel
             Channel to send to
-        msg : str
-            Message to send
+        pages : Tuple[str, ...]
+            Pre-split pages from SendCache
         """
         if self.channeldata.mode == "edit":
-            if edit_id := self.channeldata.edit_id.get(self.incidentdata.incident_id):
+            edit_id = self.channeldata.edit_id
+            if edit_id and len(pages) == 1:
                 try:
                     message = channel.get_partial_message(edit_id)
-                    await message.edit(embed=None, content=None)
+                    await message.edit(embed=None, content=pages[0])
                 except Exception:  # eg message deleted
                     edit_id = None
+            else:
+                edit_id = None
             if not edit_id:
-                sent_message = await channel.send(content=msg)
-                await self.config_wrapper.update_edit_id(
-                    channel.id, self.service, self.incidentdata.incident_id, sent_message.id
-                )
+                sent_message = await channel.send(content=pages[0])
+                self.edit_ids[channel.id] = sent_message.id
+                for page in pages[1:]:
+                    await channel.send(content=page)
         else:
-            await channel.send(content=msg)
+            for page in pages:
+                await channel.send(content=page)
 
     def _dispatch_main(self, channels: dict) -> None:
         """
@@ -228,16 +261,21 @@ class SendUpdate:
             force=self.force,
         )
 
-    def _dispatch_channel(self, channeldata: ChannelData) -> None:
+    async def _dispatch_broadcast(self) -> None:
         """
+        One event for the whole broadcast, with every channel it was sent to. Goes through the
+        event queue if there is one.
         For more information on this event, take a look at the event reference in the docs:
         https://cogdocs.vexcodes.com/en/latest/statusdev.html
-        (yes i could use autodoc but thats scary)
         """
-        self.bot.dispatch(
-            "vexed_status_channel_send",
-            update=self.update,
-            service=self.service,
-            channel_data=channeldata,
-            force=self.force,
-        )
+        event = BroadcastEvent(self.service, self.update, self.sent_channels, self.force)
+        if self.event_queue is not None:
+            await self.event_queue.put(event)
+        else:
+            self.bot.dispatch(
+                "vexed_status_broadcast",
+                service=event.service,
+                update=event.update,
+                channels=event.channels,
+                force=event.force,
+            )
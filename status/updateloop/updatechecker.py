@@ -1,7 +1,8 @@
 import asyncio
 import logging
+import random
 from time import monotonic
-from typing import Dict, List
+from typing import Dict, List, Literal, Tuple
 
 import aiohttp
 from aiohttp.client_exceptions import ClientOSError
@@ -9,19 +10,34 @@ from vexcogutils.loop import VexLoop
 
 from status.core import FEEDS, SERVICE_LITERAL, TYPES_LITERAL
 from status.core.abc import MixinMeta
-from status.objects import IncidentData, SendCache, Update
+from status.objects import (
+    ComponentTracker,
+    ConfChannelSettings,
+    IncidentData,
+    SendCache,
+    SubscriptionIndex,
+    Update,
+    UsedFeeds,
+)
 
-from .processfeed import process_json
+from .processfeed import filter_changed, process_component_changes, process_json
 from .sendupdate import SendUpdate
 
 _log = logging.getLogger("red.vex.status.updatechecker")
 
+POLL_SPREAD = 90  # seconds to spread checks over, leaving some of the 120s loop for sending
+
 
 class StatusLoop(MixinMeta):
     """Loop for checking for updates."""
 
     def __init__(self) -> None:
         self.etags: Dict[str, str] = {}
+        # (service, type) -> {incident ID: (updated_at, update count)}, to skip unchanged ones
+        self.seen_incidents: Dict[Tuple[str, str], Dict[str, Tuple[str, int]]] = {}
+        self.component_tracker = ComponentTracker()
+        # services are checked concurrently, this stops lost writes to old_ids
+        self.old_ids_lock = asyncio.Lock()
 
         self.loop_meta = VexLoop("Status Loop", 120.0)
         self.loop = asyncio.create_task(self.status_loop())
@@ -65,93 +81,142 @@ class StatusLoop(MixinMeta):
 
             await self.loop_meta.sleep_until_next()
 
-    async def _check_for_updates(self) -> None:
-        # ############################ INCIDENTS ############################
-        for service in self.used_feeds.get_list():
-            try:
-                resp_json, new_etag, status = await self.statusapi.incidents(
-                    FEEDS[service]["id"], self.etags.get(f"incidents-{service}", "")
-                )
-            except asyncio.TimeoutError:
-                _log.warning(
-                    f"Timeout checking {service}. Any missed updates will be caught on the next "
-                    "loop."
-                )
-                continue
-            except (aiohttp.ClientError, ClientOSError):
-                _log.warning(
-                    f"Unable to check {service}. Any missed updates will be caught on the next "
-                    "loop."
-                )
-                continue
-            except Exception:  # want to catch everything and anything
-                _log.error(f"Something unexpected went wrong checking {service}.", exc_info=True)
-                continue
+    async def _check_index(self) -> None:
+        """Rebuild the subscription index (and used feeds) from config if they disagree."""
+        if self.config_wrapper.index_consistent(self.used_feeds, FEEDS.keys()):
+            return
+
+        _log.warning("Subscription index is out of sync with config, rebuilding it.")
+        all_channels = await self.config.all_channels()
+        self.used_feeds = UsedFeeds(all_channels)
+        self.config_wrapper.subscriptions = SubscriptionIndex(all_channels)
+
+    async def _check_for_updates(self, spread: float = POLL_SPREAD) -> None:
+        """Check every used feed once.
+
+        Each service is checked at an evenly spaced, jittered offset within `spread` seconds, so
+        a lot of feeds don't all hit the network (and send updates) at the same time.
+        """
+        await self._check_index()
+
+        # custom feeds might have been removed since channels subscribed
+        services = [service for service in self.used_feeds.get_list() if service in FEEDS]
+        if not services:
+            return
 
+        slot = spread / len(services)
+        await asyncio.gather(
+            *(
+                self._check_service(service, (i + random.random()) * slot)
+                for i, service in enumerate(services)
+            )
+        )
+
+        await self.config_wrapper.prune_edit_ids()
+        removed = await self.config_wrapper.prune_missing_channels(self.bot.get_channel)
+        for channel_services in removed.values():
+            for service in channel_services:
+                self.used_feeds.remove_feed(service)
+
+    async def _check_service(self, service: SERVICE_LITERAL, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+        try:
+            status, resp_json = await self._request(service, "incidents")
             if status == 304:
-                _log.debug(f"Incidents: no update for {service} - 304")
                 self.last_checked.update_time(service)
             elif status == 200:
-                _log.debug(f"Incidents: update detected for {service} - 200")
-                self.etags[f"incidents-{service}"] = new_etag
                 # dont need to update checked time as above because _maybe_send_update does it
                 await self._maybe_send_update(resp_json, service, "incidents")
-            elif str(status)[0] == "5":
-                _log.info(
-                    f"I was unable to get an update for {service} due to problems on their side. "
-                    f"(HTTP error {status})"
-                )
-            else:
-                _log.warning(
-                    f"Unexpected status code received from {service}: {status}. Please report "
-                    "this to Vexed."
-                )
-
-        # ############################ SCHEDULED ############################
-        for service in self.used_feeds.get_list():
-            try:
-                resp_json, new_etag, status = await self.statusapi.scheduled_maintenance(
-                    FEEDS[service]["id"], self.etags.get(f"scheduled-{service}", "")
-                )
-            except asyncio.TimeoutError:
-                _log.warning(
-                    f"Timeout checking {service}. Any missed updates will be caught on the next "
-                    "loop."
-                )
-                continue
-            except (aiohttp.ClientError, ClientOSError):
-                _log.warning(
-                    f"Unable to check {service}. Any missed updates will be caught on the next "
-                    "loop."
-                )
-                continue
-            except Exception:  # want to catch everything and anything
-                _log.error(f"Something unexpected went wrong checking {service}.", exc_info=True)
-                continue
 
+            status, resp_json = await self._request(service, "scheduled")
             if status == 304:
-                _log.debug(f"Scheduled: no update for {service} - 304")
                 self.last_checked.update_time(service)
             elif status == 200:
-                _log.debug(f"Scheduled: update detected for {service} - 200")
-                self.etags[f"scheduled-{service}"] = new_etag
-                # dont need to update checked time as above because _maybe_send_update does it
                 await self._maybe_send_update(resp_json, service, "scheduled")
-            elif str(status)[0] == "5":
-                _log.info(
-                    f"I was unable to get an update for {service} due to problems on their side. "
-                    f"(HTTP error {status})"
-                )
-            else:
-                _log.warning(
-                    f"Unexpected status code received from {service}: {status}. Please report "
-                    "this to Vexed."
-                )
+
+            channels = {
+                c_id: settings
+                for c_id, settings in (await self.config_wrapper.get_channels(service)).items()
+                if settings.get("components")
+            }
+            if channels:  # only poll when someone has opted in
+                status, resp_json = await self._request(service, "components")
+                if status == 200:
+                    await self._maybe_send_component_update(resp_json, service, channels)
+        except Exception:  # one service shouldn't stop the others
+            _log.error(f"Something unexpected went wrong checking {service}.", exc_info=True)
+
+    async def _request(
+        self, service: SERVICE_LITERAL, endpoint: Literal["incidents", "scheduled", "components"]
+    ) -> Tuple[int, dict]:
+        """Make a conditional request to the Status API, logging any problems.
+
+        Returns
+        -------
+        Tuple[int, dict]
+            The HTTP status (0 if the request failed) and the JSON if the status is 200
+        """
+        funcs = {
+            "incidents": self.statusapi.incidents,
+            "scheduled": self.statusapi.scheduled_maintenance,
+            "components": self.statusapi.components,
+        }
+        try:
+            resp_json, new_etag, status = await funcs[endpoint](
+                FEEDS[service]["id"], self.etags.get(f"{endpoint}-{service}", "")
+            )
+        except asyncio.TimeoutError:
+            _log.warning(
+                f"Timeout checking {service}. Any missed updates will be caught on the next loop."
+            )
+            return 0, {}
+        except (aiohttp.ClientError, ClientOSError):
+            _log.warning(
+                f"Unable to check {service}. Any missed updates will be caught on the next loop."
+            )
+            return 0, {}
+
+        if status == 304:
+            _log.debug(f"{endpoint.capitalize()}: no update for {service} - 304")
+        elif status == 200:
+            _log.debug(f"{endpoint.capitalize()}: update detected for {service} - 200")
+            self.etags[f"{endpoint}-{service}"] = new_etag
+        elif str(status)[0] == "5":
+            _log.info(
+                f"I was unable to get an update for {service} due to problems on their side. "
+                f"(HTTP error {status})"
+            )
+        else:
+            _log.warning(
+                f"Unexpected status code received from {service}: {status}. Please report "
+                "this to Vexed."
+            )
+
+        return status, resp_json
 
     async def _maybe_send_update(
         self, resp_json: dict, service: SERVICE_LITERAL, type: TYPES_LITERAL
     ) -> None:
-        real = await self._check_real_update(process_json(resp_json, type), service)
+        start = monotonic()
+        changed, seen = filter_changed(
+            resp_json, type, self.seen_incidents.get((service, type), {})
+        )
+        if not any(changed.values()):
+            self.stats.record_parse(FEEDS[service]["id"], type, monotonic() - start)
+            self.seen_incidents[(service, type)] = seen
+            self.last_checked.update_time(service)
+            return _log.debug(f"No changed incidents for {service} ({type}).")
+
+        for incidents in changed.values():
+            self.archive.add(service, type, incidents)
+
+        incidentdata_list = process_json(changed, type)
+        self.stats.record_parse(FEEDS[service]["id"], type, monotonic() - start)
+
+        async with self.old_ids_lock:
+            real = await self._check_real_update(incidentdata_list, service)
+        self.seen_incidents[(service, type)] = seen
 
         if not real:
             return _log.debug(f"Ghost status update for {service} ({type}) detected.")
@@ -167,19 +232,49 @@ class StatusLoop(MixinMeta):
         for update in real:
             channels = await self.config_wrapper.get_channels(service)
             sendcache = SendCache(update, service)
+            start = monotonic()
             await SendUpdate(
                 bot=self.bot,
                 config_wrapper=self.config_wrapper,
                 update=update,
                 service=service,
                 sendcache=sendcache,
+                event_queue=self.event_queue,
             ).send(channels)
+            self.stats.record_fanout(FEEDS[service]["id"], monotonic() - start)
 
             await asyncio.sleep(5)
             # this loop normally only runs once
             # this sleep will ensure there are no issues with channel webhook ratelimits if lots
             # are being sent for whatever reason. eg when i break stuff locally.
 
+    async def _maybe_send_component_update(
+        self, resp_json: dict, service: SERVICE_LITERAL, channels: Dict[int, ConfChannelSettings]
+    ) -> None:
+        start = monotonic()
+        changes = self.component_tracker.diff(service, resp_json.get("components", []))
+        self.stats.record_parse(FEEDS[service]["id"], "components", monotonic() - start)
+        if not changes:
+            return _log.debug(f"No component changes for {service}.")
+
+        # skip just after migration
+        if not self.actually_send:
+            return
+
+        self.bot.dispatch("vexed_status_component_update", service=service, changes=changes)
+
+        update = process_component_changes(changes, service)
+        # these are one-off notices, so there's nothing to edit later
+        channels = {c_id: {**settings, "mode": "latest"} for c_id, settings in channels.items()}
+        await SendUpdate(
+            bot=self.bot,
+            config_wrapper=self.config_wrapper,
+            update=update,
+            service=service,
+            sendcache=SendCache(update, service),
+            dispatch=False,
+        ).send(channels)
+
     async def _check_real_update(
         self, incidentdata_list: List[IncidentData], service: str
     ) -> List[Update]:
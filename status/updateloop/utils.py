@@ -1,26 +1,54 @@
+import asyncio
 import logging
+from typing import Dict, List, Optional, Tuple
 
-from discord import TextChannel, Webhook
+import discord
+from discord import Permissions, TextChannel, Webhook
 from redbot.core.bot import Red
 
-from status.objects import ChannelData, CogDisabled, ConfChannelSettings, NoPermission, NotFound
+from status.objects import (
+    ChannelData,
+    ConfChannelSettings,
+    ConfigWrapper,
+    ConfWebhook,
+    NoPermission,
+)
 
 _log = logging.getLogger("red.vex.status.sendupdate")
 
 
-async def get_webhook(channel: TextChannel) -> Webhook:
+def _partial_webhook(bot: Red, data: ConfWebhook) -> Webhook:
+    """Make a webhook from a cached ID and token, without any API calls."""
+    if discord.__version__.startswith("1"):
+        return Webhook.from_state(  # type:ignore
+            {"id": data["id"], "token": data["token"], "type": 1}, bot._connection
+        )
+    return Webhook.partial(data["id"], data["token"], client=bot)  # type:ignore
+
+
+async def get_webhook(bot: Red, channel: TextChannel, config_wrapper: ConfigWrapper) -> Webhook:
     """Get, or create, a webhook for the specified channel and return it.
 
+    The webhook is cached (in memory and config) so this will normally not make any API calls.
+    If the cached webhook turns out to be invalid, clear it with `ConfigWrapper.clear_webhook`.
+
     Parameters
     ----------
+    bot : Red
+        Bot
     channel : TextChannel
         Target channel
+    config_wrapper : ConfigWrapper
+        Config wrapper, which holds the webhook cache
 
     Returns
     -------
     Webhook
         Valid webhook
     """
+    if cached := config_wrapper.webhook_cache.get(channel.id):
+        return _partial_webhook(bot, cached)
+
     # thanks flare for your webhook logic (redditpost) (or trusty?)
     webhook = None
     for hook in await channel.webhooks():
@@ -32,70 +60,156 @@ async def get_webhook(channel: TextChannel) -> Webhook:
             name=channel.guild.me.name, reason="Created for status updates"
         )
 
+    await config_wrapper.update_webhook(channel.id, webhook)
+
     return webhook
 
 
-async def get_channel_data(bot: Red, c_id: int, settings: ConfChannelSettings) -> ChannelData:
-    """Get ChannelData from the raw config TypedDict ConfChannelSettings
+class ChannelChecks:
+    """Eligibility checks for the channels of one broadcast, memoised so channels in the same
+    guild don't repeat the same lookups.
+
+    Whether the cog is disabled is looked up once per guild. Embed settings are per guild on Red
+    3.4 and per channel on 3.5+ (which added channel embed settings). Permissions depend on
+    channel overwrites so are per channel, but only worked out once.
 
     Parameters
     ----------
     bot : Red
         Bot
-    c_id : int
-        Channel ID
-    settings : ConfChannelSettings
-        TypedDict from config
-
-    Returns
-    -------
-    ChannelData
-        ChannelData obj
-
-    Raises
-    ------
-    NotFound
-        Channel not found
-    CogDisabled
-        Cog disabled in guild
-    NoPermission
-        No permission to send
     """
-    channel: TextChannel = bot.get_channel(c_id)  # type:ignore
-    if channel is None:
-        # TODO: maybe remove from config
-        _log.info(f"I can't find the channel with id {c_id} - skipping")
-        raise NotFound
-
-    if await bot.cog_disabled_in_guild_raw("Status", channel.guild.id):
-        _log.info(
-            f"Cog is disabled in guild {channel.guild.id} (trying to send to channel {c_id}) - "
-            "skipping"
-        )
-        raise CogDisabled
 
-    if settings["webhook"] and not channel.permissions_for(channel.guild.me).manage_webhooks:
-        _log.info(
-            f"I don't have permission to send as a webhook in {c_id} in guild {channel.guild.id} "
-            "- will send as normal message"
-        )
-        settings["webhook"] = False
+    def __init__(self, bot: Red):
+        self.bot = bot
+        self.cog_disabled: Dict[int, bool] = {}  # guild ID -> disabled
+        self.embed: Dict[int, bool] = {}  # guild or channel ID -> embed requested
+        self.missing: List[int] = []  # channels that couldn't be found
 
-    if not settings.get("webhook") and not channel.permissions_for(channel.guild.me).send_messages:
-        _log.info(
-            f"Unable to send messages in channel {c_id} in guild {channel.guild.id} - skipping"
+    def __repr__(self) -> str:
+        return (
+            f"<ChannelChecks guilds={len(self.cog_disabled)} embed={len(self.embed)} "
+            f"missing={len(self.missing)}>"
         )
-        raise NoPermission
-
-    if not settings["webhook"]:
-        use_embed = await bot.embed_requested(channel, channel.guild.me)
-    else:
-        use_embed = True
-
-    return ChannelData(
-        channel=channel,
-        mode=settings.get("mode", "latest"),
-        webhook=settings.get("webhook", False),
-        edit_id=settings.get("edit_id", {}),
-        embed=use_embed,
-    )
+
+    async def _embed_requested(self, channel: TextChannel) -> bool:
+        if discord.__version__.startswith("1"):
+            # Red 3.4's embed_requested also checks embed links in this channel, which would then
+            # be used for the whole guild. so only look up the guild (or global) setting here,
+            # the permission is checked for each channel in prefetch
+            guild_setting = await self.bot._config.guild(channel.guild).embeds()
+            if guild_setting is not None:
+                return guild_setting
+            return await self.bot._config.embeds()
+        return await self.bot.embed_requested(channel, check_permissions=False)  # type:ignore
+
+    async def prefetch(
+        self, channels: Dict[int, ConfChannelSettings], edit_ids: Optional[Dict[int, int]] = None
+    ) -> Dict[int, ChannelData]:
+        """Resolve every check for these channels in bulk, before sending starts.
+
+        Parameters
+        ----------
+        channels : Dict[int, ConfChannelSettings]
+            Channels to check, format {ID: SETTINGS}
+        edit_ids : Optional[Dict[int, int]]
+            Edit mode message IDs for the incident being sent, format {ID: MESSAGE ID}
+
+        Returns
+        -------
+        Dict[int, ChannelData]
+            ChannelData for the channels that can be sent to. Channels that couldn't be found
+            are added to `missing`.
+        """
+        found: Dict[int, TextChannel] = {}
+        for c_id in channels:
+            channel: TextChannel = self.bot.get_channel(c_id)  # type:ignore
+            if channel is None:
+                self.missing.append(c_id)
+            else:
+                found[c_id] = channel
+
+        guild_ids = list({c.guild.id for c in found.values()} - self.cog_disabled.keys())
+        for g_id, disabled in zip(
+            guild_ids,
+            await asyncio.gather(
+                *(self.bot.cog_disabled_in_guild_raw("Status", g_id) for g_id in guild_ids)
+            ),
+        ):
+            self.cog_disabled[g_id] = disabled
+            if disabled:
+                _log.info(f"Cog is disabled in guild {g_id} - skipping its channels")
+
+        eligible: Dict[int, Tuple[TextChannel, bool, Permissions]] = {}
+        for c_id, channel in found.items():
+            if self.cog_disabled[channel.guild.id]:
+                continue
+            perms = channel.permissions_for(channel.guild.me)
+            try:
+                eligible[c_id] = (
+                    channel,
+                    self._use_webhook(channel, channels[c_id], perms),
+                    perms,
+                )
+            except NoPermission:
+                continue
+
+        # only needed for channels not using webhooks (which are always embeds)
+        embed_keys: Dict[int, TextChannel] = {}
+        for channel, webhook, _ in eligible.values():
+            if not webhook:
+                key = channel.guild.id if discord.__version__.startswith("1") else channel.id
+                if key not in self.embed:
+                    embed_keys[key] = channel
+        for key, requested in zip(
+            embed_keys,
+            await asyncio.gather(*(self._embed_requested(c) for c in embed_keys.values())),
+        ):
+            self.embed[key] = requested
+
+        ret: Dict[int, ChannelData] = {}
+        for c_id, (channel, webhook, perms) in eligible.items():
+            if webhook:
+                use_embed = True
+            else:
+                key = channel.guild.id if discord.__version__.startswith("1") else channel.id
+                use_embed = self.embed[key] and perms.embed_links
+
+            settings = channels[c_id]
+            ret[c_id] = ChannelData(
+                channel=channel,
+                mode=settings.get("mode", "latest"),
+                webhook=webhook,
+                edit_id=(edit_ids or {}).get(c_id),
+                embed=use_embed,
+            )
+
+        return ret
+
+    @staticmethod
+    def _use_webhook(
+        channel: TextChannel, settings: ConfChannelSettings, perms: Permissions
+    ) -> bool:
+        """Work out if a webhook can be used.
+
+        Raises
+        ------
+        NoPermission
+            No permission to send
+        """
+        # settings are shared with the subscription index, so they mustn't be changed here
+        webhook = settings.get("webhook", False)
+        if webhook and not perms.manage_webhooks:
+            _log.info(
+                f"I don't have permission to send as a webhook in {channel.id} in guild "
+                f"{channel.guild.id} - will send as normal message"
+            )
+            webhook = False
+
+        if not webhook and not perms.send_messages:
+            _log.info(
+                f"Unable to send messages in channel {channel.id} in guild {channel.guild.id} - "
+                "skipping"
+            )
+            raise NoPermission
+
+        return webhook
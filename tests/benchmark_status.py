@@ -0,0 +1,299 @@
+"""End-to-end benchmark of the status update loop, run against the local statuspage stand-in.
+
+    python -m tests.benchmark_status --channels 5000
+
+Discord is replaced with in-memory channels that record when each update reaches them, so this
+measures the cog itself (polling, parsing and fan-out to channels) rather than Discord's rate
+limits. It is not collected by pytest.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+from time import monotonic, perf_counter
+from typing import Dict, List
+
+from .statuspage_standin import StatuspageStandIn, Timeline
+
+HTML_BODY = (
+    "<p>We are <strong>investigating</strong> reports of degraded performance. See "
+    "<a href='https://example.com/incident'>the incident page</a> for details.</p>"
+    "<ul><li>API</li><li>Gateway</li><li>Media proxy</li></ul>"
+) * 3
+
+
+def _setup_red(data_path: str) -> None:
+    """Point Red's data manager at a temporary JSON backend, like Red's own pytest fixtures."""
+    from redbot.core import data_manager
+
+    data_manager.basic_config = {
+        **data_manager.basic_config_default,
+        "DATA_PATH": data_path,
+        "STORAGE_TYPE": "JSON",
+        "STORAGE_DETAILS": {},
+    }
+
+
+class _Perms:
+    send_messages = True
+    manage_webhooks = False
+    embed_links = True
+
+
+class FakeMember:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.me = FakeMember("Status Bench")
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", msg_id: int):
+        self.channel = channel
+        self.id = msg_id
+
+    async def edit(self, **_) -> None:
+        self.channel.deliver()
+
+
+class FakeChannel:
+    def __init__(self, c_id: int, guild: FakeGuild, bot: "FakeBot"):
+        self.id = c_id
+        self.guild = guild
+        self.bot = bot
+        self.mention = f"<#{c_id}>"
+
+    def permissions_for(self, _) -> _Perms:
+        return _Perms()
+
+    def deliver(self) -> None:
+        self.bot.latencies.append(monotonic() - self.bot.broadcast_start)
+
+    async def send(self, **_) -> FakeMessage:
+        await asyncio.sleep(0)  # yield like a real HTTP request would
+        self.deliver()
+        return FakeMessage(self, random.getrandbits(62))
+
+    def get_partial_message(self, msg_id: int) -> FakeMessage:
+        return FakeMessage(self, msg_id)
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.channels: Dict[int, FakeChannel] = {}
+        self.broadcast_start = 0.0
+        self.latencies: List[float] = []
+        self.broadcast_events = 0
+        self.eligibility_lookups = 0
+        self.extra_events = {"on_vexed_status_broadcast": [self.on_vexed_status_broadcast]}
+
+    def get_channel(self, c_id: int) -> FakeChannel:
+        return self.channels.get(c_id)  # type:ignore
+
+    async def cog_disabled_in_guild_raw(self, *_) -> bool:
+        self.eligibility_lookups += 1
+        return False
+
+    async def embed_requested(self, *_, **__) -> bool:
+        self.eligibility_lookups += 1
+        return True
+
+    def dispatch(self, event: str, **_) -> None:
+        if event == "vexed_status_update":
+            self.broadcast_start = monotonic()
+        elif event == "vexed_status_broadcast":
+            self.broadcast_events += 1
+
+    async def on_vexed_status_broadcast(self, **_) -> None:
+        self.broadcast_events += 1
+
+
+def _summary(name: str, values: List[float], unit: str = "ms") -> str:
+    if not values:
+        return f"{name}: no samples"
+    factor = 1000 if unit == "ms" else 1
+    values = sorted(v * factor for v in values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (
+        f"{name}: n={len(values)} median={statistics.median(values):.2f}{unit} "
+        f"p95={p95:.2f}{unit} max={values[-1]:.2f}{unit}"
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    data_path = tempfile.mkdtemp()
+    _setup_red(data_path)
+
+    # these need Red's data manager to be set up first
+    from redbot.core import Config
+
+    from status.core.archive import IncidentArchive
+    from status.core.consts import EDIT_IDS_GROUP, FEEDS
+    from status.core.stats import LoopStats
+    from status.core.statusapi import StatusAPI, create_session
+    from status.objects import (
+        ComponentTracker,
+        ConfigWrapper,
+        EventQueue,
+        LastChecked,
+        SubscriptionIndex,
+        UsedFeeds,
+    )
+    from status.updateloop import StatusLoop, updatechecker
+
+    parse_times: List[float] = []
+    poll_times: List[float] = []
+
+    real_process_json = updatechecker.process_json
+
+    def timed_process_json(*a, **kw):
+        start = perf_counter()
+        try:
+            return real_process_json(*a, **kw)
+        finally:
+            parse_times.append(perf_counter() - start)
+
+    updatechecker.process_json = timed_process_json  # type:ignore
+
+    class TimedStatusAPI(StatusAPI):
+        async def incidents(self, service_id: str, etag: str = ""):
+            start = perf_counter()
+            try:
+                return await super().incidents(service_id, etag)
+            finally:
+                poll_times.append(perf_counter() - start)
+
+        async def scheduled_maintenance(self, service_id: str, etag: str = ""):
+            start = perf_counter()
+            try:
+                return await super().scheduled_maintenance(service_id, etag)
+            finally:
+                poll_times.append(perf_counter() - start)
+
+    class BenchLoop(StatusLoop):
+        def __init__(self, bot, config, all_channels):
+            # not calling super().__init__(), the loop is driven manually below
+            self.etags = {}
+            self.seen_incidents = {}
+            self.component_tracker = ComponentTracker()
+            self.old_ids_lock = asyncio.Lock()
+            self.bot = bot
+            self.config = config
+            self.last_checked = LastChecked()
+            self.config_wrapper = ConfigWrapper(config, self.last_checked)
+            self.config_wrapper.subscriptions = SubscriptionIndex(all_channels)
+            self.used_feeds = UsedFeeds(all_channels)
+            self.actually_send = False
+            self.ready = True
+            self.sentry_hub = None
+            self.archive = IncidentArchive(os.path.join(data_path, "archive.db"))
+            self.event_queue = EventQueue(bot)
+            self.stats = LoopStats()
+
+        async def get_initial_data(self, services=None) -> None:
+            pass
+
+    rng = random.Random(args.seed)
+    services = list(FEEDS.keys())
+
+    bot = FakeBot()
+    all_channels: Dict[int, dict] = {}
+    for i in range(args.channels):
+        c_id = 10_000 + i
+        guild = FakeGuild(1_000 + i // args.channels_per_guild)
+        bot.channels[c_id] = FakeChannel(c_id, guild, bot)
+        service = rng.choice(services)
+        mode = rng.choice(["all", "latest", "edit"])
+        all_channels[c_id] = {"feeds": {service: {"mode": mode, "webhook": False, "edit_id": {}}}}
+
+    config = Config.get_conf(None, identifier=1234567890, cog_name="StatusBenchmark")
+    config.register_global(feed_store={}, old_ids=[], edit_id_resolved={}, edit_ids_moved=True)
+    config.init_custom(EDIT_IDS_GROUP, 2)
+    config.register_custom(EDIT_IDS_GROUP)
+    config.register_channel(feeds={}, webhook_cache={})
+    # one write for every channel, instead of thousands of little ones
+    await config._get_base_group(Config.CHANNEL).set(
+        {str(c_id): data for c_id, data in all_channels.items()}
+    )
+
+    async with StatuspageStandIn() as standin:
+        for service in services:
+            page = standin.page(service)
+            for n in range(args.incidents):
+                incident_id = page.add_incident(f"Incident {n}", HTML_BODY)
+                page.add_update(incident_id, HTML_BODY, "identified")
+                page.resolve(incident_id)
+        for service in services[: args.slow_services]:
+            standin.page(service).delay = args.slow
+        for service in services[args.slow_services : args.slow_services + args.error_services]:
+            standin.page(service).errors = [503] * (args.rounds * 4)
+
+        timelines = [Timeline.typical_incident(service) for service in services[-args.updates :]]
+
+        loop = BenchLoop(bot, config, all_channels)
+        async with create_session(loop.stats) as session:
+            await loop.archive.start()
+            loop.event_queue.start()
+
+            # a new StatusAPI each round so its TTL cache doesn't hide changes between rounds
+            loop.statusapi = TimedStatusAPI(session, base_url=standin.base_url, stats=loop.stats)
+            start = perf_counter()
+            await loop._check_for_updates(spread=0)
+            print(f"Initial (cold) poll and parse: {perf_counter() - start:.2f}s")
+            print(_summary("  Parse per response", parse_times))
+            parse_times.clear()
+            poll_times.clear()
+
+            loop.actually_send = True
+            iterations: List[float] = []
+            for round_no in range(args.rounds):
+                for timeline in timelines:
+                    timeline.advance(standin)
+
+                loop.statusapi = TimedStatusAPI(
+                    session, base_url=standin.base_url, stats=loop.stats
+                )
+                start = perf_counter()
+                await loop._check_for_updates(spread=0)
+                iterations.append(perf_counter() - start)
+                print(f"Round {round_no + 1}: {iterations[-1]:.2f}s")
+
+            start = perf_counter()
+            await loop.archive.close()
+            print(f"Archive flush and close: {perf_counter() - start:.2f}s")
+
+    print()
+    print(f"{args.channels} channels, {len(services)} services, {args.updates} updating/round")
+    print(_summary("Loop iteration", iterations, unit="s"))
+    print(_summary("Poll per request", poll_times))
+    print(_summary("Parse per response", parse_times))
+    print(_summary("Fan-out delivery latency", bot.latencies))
+    print(f"Broadcast events dispatched: {bot.broadcast_events}")
+    print(f"Cog disabled/embed lookups: {bot.eligibility_lookups}")
+    print(f"Connection reuse: {loop.stats.reuse_rate:.1%} ({dict(loop.stats.connections)})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=5000)
+    parser.add_argument("--channels-per-guild", type=int, default=10)
+    parser.add_argument("--incidents", type=int, default=20, help="existing incidents per page")
+    parser.add_argument("--updates", type=int, default=3, help="services updating per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--slow-services", type=int, default=2)
+    parser.add_argument("--slow", type=float, default=0.5, help="delay for slow services (s)")
+    parser.add_argument("--error-services", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
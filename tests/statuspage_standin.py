@@ -0,0 +1,260 @@
+"""A local stand-in for the statuspage v2 API, used by the status tests and benchmark.
+
+By default every page in ``status.core.consts.FEEDS`` is served at
+``/<page id>/api/v2/<endpoint>.json``, so ``StatusAPI(session, base_url=standin.base_url)`` can be
+pointed straight at it.
+
+It supports ETags (``If-None-Match`` gets a 304), scripted incident timelines, 5xx errors and
+slow responses.
+"""
+import asyncio
+import datetime
+import hashlib
+import itertools
+import json
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import web
+
+ENDPOINTS = ("incidents", "scheduled-maintenances", "summary", "components")
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class StandInPage:
+    """The state of a single statuspage."""
+
+    def __init__(self, page_id: str, name: str):
+        self.page_id = page_id
+        self.name = name
+
+        self.incidents: List[dict] = []
+        self.scheduled: List[dict] = []
+        self.components: List[dict] = []
+        self.updated_at = _now()
+
+        self.delay = 0.0  # seconds to wait before responding
+        self.errors: List[int] = []  # status codes to respond with for the next requests
+        self.requests: Counter = Counter()  # endpoint -> request count
+
+        self._ids = itertools.count()
+
+    def _new_id(self) -> str:
+        return f"{self.page_id[:4]}{next(self._ids):08d}"
+
+    def _find(self, incident_id: str) -> dict:
+        for incident in self.incidents + self.scheduled:
+            if incident["id"] == incident_id:
+                return incident
+        raise KeyError(incident_id)
+
+    def add_incident(
+        self,
+        name: str,
+        body: str,
+        impact: str = "minor",
+        status: str = "investigating",
+        scheduled: bool = False,
+    ) -> str:
+        """Create a new incident (or scheduled maintenance) with one update. Returns its ID."""
+        now = _now()
+        incident_id = self._new_id()
+        incident = {
+            "created_at": now,
+            "id": incident_id,
+            "impact": impact,
+            "incident_updates": [],
+            "monitoring_at": None,
+            "name": name,
+            "page_id": self.page_id,
+            "resolved_at": None,
+            "shortlink": f"https://stspg.io/{incident_id}",
+            "status": status,
+            "updated_at": now,
+            "components": [],
+        }
+        if scheduled:
+            incident["scheduled_for"] = now
+            incident["scheduled_until"] = now
+            self.scheduled.insert(0, incident)
+        else:
+            self.incidents.insert(0, incident)
+        self.add_update(incident_id, body, status)
+
+        return incident_id
+
+    def add_update(self, incident_id: str, body: str, status: str) -> str:
+        """Post an update on an incident. Returns the update's ID."""
+        incident = self._find(incident_id)
+        now = _now()
+        update_id = self._new_id()
+        incident["incident_updates"].insert(
+            0,
+            {
+                "body": body,
+                "created_at": now,
+                "display_at": now,
+                "id": update_id,
+                "incident_id": incident_id,
+                "status": status,
+                "updated_at": now,
+            },
+        )
+        incident["status"] = status
+        incident["updated_at"] = now
+        if status in ("resolved", "completed"):
+            incident["resolved_at"] = now
+        self.updated_at = now
+
+        return update_id
+
+    def resolve(self, incident_id: str, body: str = "This incident has been resolved.") -> str:
+        return self.add_update(incident_id, body, "resolved")
+
+    def add_component(self, name: str, status: str = "operational") -> str:
+        component_id = self._new_id()
+        self.components.append(
+            {
+                "id": component_id,
+                "name": name,
+                "status": status,
+                "group": False,
+                "group_id": None,
+                "page_id": self.page_id,
+                "updated_at": _now(),
+            }
+        )
+        self.updated_at = _now()
+        return component_id
+
+    def set_component_status(self, component_id: str, status: str) -> None:
+        for component in self.components:
+            if component["id"] == component_id:
+                component["status"] = status
+                component["updated_at"] = _now()
+        self.updated_at = _now()
+
+    def body(self, endpoint: str) -> dict:
+        page = {"id": self.page_id, "name": self.name, "url": "", "updated_at": self.updated_at}
+        if endpoint == "incidents":
+            return {"page": page, "incidents": self.incidents[:50]}
+        if endpoint == "scheduled-maintenances":
+            return {"page": page, "scheduled_maintenances": self.scheduled[:50]}
+        if endpoint == "components":
+            return {"page": page, "components": self.components}
+        return {  # summary
+            "page": page,
+            "components": self.components,
+            "incidents": [i for i in self.incidents if i["resolved_at"] is None],
+            "scheduled_maintenances": [i for i in self.scheduled if i["resolved_at"] is None],
+            "status": {"indicator": "none", "description": "All Systems Operational"},
+        }
+
+
+class Timeline:
+    """A scripted incident timeline. Each call to `advance` applies the next step."""
+
+    def __init__(self, steps: List[Callable[["StatuspageStandIn"], object]]):
+        self.steps = steps
+        self.position = 0
+
+    def advance(self, standin: "StatuspageStandIn") -> bool:
+        """Apply the next step. Returns False if the timeline has already finished."""
+        if self.position >= len(self.steps):
+            return False
+        self.steps[self.position](standin)
+        self.position += 1
+        return True
+
+    @classmethod
+    def typical_incident(cls, service: str, name: str = "Elevated error rates") -> "Timeline":
+        """Investigating, identified, monitoring then resolved."""
+        state: Dict[str, str] = {}
+
+        def start(standin: "StatuspageStandIn") -> None:
+            state["id"] = standin.page(service).add_incident(
+                name, "We are investigating elevated error rates."
+            )
+
+        def update(status: str, body: str) -> Callable[["StatuspageStandIn"], object]:
+            return lambda standin: standin.page(service).add_update(state["id"], body, status)
+
+        return cls(
+            [
+                start,
+                update(
+                    "identified", "The issue has been identified and a fix is being rolled out."
+                ),
+                update(
+                    "monitoring", "A fix has been implemented and we are monitoring the results."
+                ),
+                update("resolved", "This incident has been resolved."),
+            ]
+        )
+
+
+class StatuspageStandIn:
+    """An aiohttp server imitating the statuspage v2 API for every page in FEEDS."""
+
+    def __init__(self, feeds: Optional[Dict[str, dict]] = None):
+        if feeds is None:
+            from status.core.consts import FEEDS  # importing status needs Red to be set up
+
+            feeds = FEEDS
+        self.services = {service: data["id"] for service, data in feeds.items()}
+        self.pages = {
+            data["id"]: StandInPage(data["id"], data["friendly"]) for data in feeds.values()
+        }
+
+        self.app = web.Application()
+        self.app.router.add_get("/{page_id}/api/v2/{endpoint}.json", self._handle)
+        self.runner: Optional[web.AppRunner] = None
+        self.port = 0
+
+    async def __aenter__(self) -> "StatuspageStandIn":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    @property
+    def base_url(self) -> str:
+        """Format string for `StatusAPI`'s base_url."""
+        return f"http://127.0.0.1:{self.port}/{{}}/api/v2"
+
+    def page(self, service: str) -> StandInPage:
+        return self.pages[self.services[service]]
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type:ignore
+
+    async def close(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info["page_id"])
+        endpoint = request.match_info["endpoint"]
+        if page is None or endpoint not in ENDPOINTS:
+            return web.Response(status=404, text="Not found")
+
+        page.requests[endpoint] += 1
+        if page.delay:
+            await asyncio.sleep(page.delay)
+        if page.errors:
+            return web.Response(status=page.errors.pop(0), text="Something went wrong")
+
+        body = json.dumps(page.body(endpoint)).encode()
+        etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
@@ -0,0 +1,350 @@
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import random
+import string
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from redbot.core.commands import BadArgument
+
+from cmdlog import cmdlog as cmdlog_module
+from cmdlog import export as export_module
+from cmdlog import persist
+from cmdlog.analytics import UsageStats, WindowCounter
+from cmdlog.cmdlog import CmdLog
+from cmdlog.converters import ExportFlags, parse_bytes, parse_time, split_flags
+from cmdlog.export import format_chunks, gzip_parts
+from cmdlog.objects import LoggedAppCom, LoggedComError, LoggedCommand
+from cmdlog.persist import PersistentLog
+from cmdlog.store import LogStore
+
+
+def make_com(user_id: int, command: str, guild_id: int = 0, cls=LoggedCommand, **kwargs):
+    user = SimpleNamespace(id=user_id, name=f"user{user_id}", discriminator="0001")
+    if guild_id:
+        guild = SimpleNamespace(id=guild_id, name=f"guild{guild_id}")
+        channel = SimpleNamespace(id=guild_id + 1, name="general")
+    else:
+        guild = channel = None
+    return cls(author=user, com_name=command, channel=channel, guild=guild, **kwargs)
+
+
+def test_log_store():
+    store = LogStore(3)
+    assert len(store) == 0 and not store.full
+
+    store.append(make_com(1, "ping", 10, msg_id=100), 1000)
+    store.append(make_com(2, "help", 0, cls=LoggedComError, msg_id=101), 1001)
+    store.append(
+        make_com(3, "slash", 10, cls=LoggedAppCom, application_command=1, log_content=True),
+        1002,
+    )
+    assert store.full
+    assert [i.command for i in store] == ["ping", "help", "slash"]
+
+    first, second, third = store
+    assert isinstance(first, LoggedCommand) and isinstance(second, LoggedComError)
+    assert isinstance(third, LoggedAppCom) and third.app_type == 1
+    assert str(first) == (
+        "Text command 'ping' ran by 1 (user1#0001) with message ID 100 in channel 11 (#general) "
+        "in guild 10 (guild10)"
+    )
+    assert second.guild is None and second.channel is None
+    assert not hasattr(third, "msg_id") and third.target is None
+
+    # oldest is overwritten, and its names are released from the intern tables
+    seq = store.append(make_com(4, "info", 20, msg_id=102), 1003)
+    assert seq == 3 and store.first_seq == 1
+    assert [i.user.id for i in store] == [2, 3, 4]
+    assert "ping" not in store.command_names.index
+    assert "guild10" in store.names.index  # still used by the slash command
+    assert store.command_names.index["info"] == 0  # ping's index was reused
+
+    smaller = store.resized(2)
+    assert [i.user.id for i in smaller] == [3, 4]
+    assert [smaller.times[s % 2] for s in range(smaller.first_seq, smaller.next_seq)] == [
+        1002,
+        1003,
+    ]
+    bigger = store.resized(10)
+    assert [i.user.id for i in bigger] == [2, 3, 4] and not bigger.full
+
+
+def test_log_store_indexes():
+    store = LogStore(100)
+    for i in range(150):
+        command = ["ping", "playlist create", "playlist list", "play", "help"][i % 5]
+        store.append(make_com(i % 3, command, i % 4, msg_id=i + 1), 1000 + i)
+
+    def check(**filters):
+        expected = [
+            seq
+            for seq in range(store.first_seq, store.next_seq)
+            if ("user_id" not in filters or store.get(seq).user.id == filters["user_id"])
+            and (
+                "guild_id" not in filters
+                or store.guild_ids[seq % store.capacity] == filters["guild_id"]
+            )
+            and ("command" not in filters or store.get(seq).command.startswith(filters["command"]))
+        ]
+        assert list(store.find(**filters)) == expected
+        return expected
+
+    assert check() == list(range(50, 150))
+    assert check(user_id=1)
+    assert check(guild_id=2)
+    assert check(user_id=2, guild_id=3)
+    assert check(command="playlist")
+    assert check(command="play", user_id=0)
+    assert check(command="playlist", user_id=1, guild_id=1)
+    assert check(command="nothing") == check(user_id=5) == check(guild_id=5) == []
+
+    assert store.matching_commands("play") == ["play", "playlist create", "playlist list"]
+    # indexes only hold what's still in the ring
+    assert sum(len(seqs) for seqs in store.by_user.values()) == 100
+    assert sum(len(seqs) for seqs in store.by_command.values()) == 100
+    assert sum(len(seqs) for seqs in store.by_guild.values()) == 75  # 0 means in DMs
+
+
+def test_memory_budget():
+    store = LogStore(1000)
+    for i in range(2500):
+        store.append(make_com(i % 50, f"command{i % 30}", i % 7, msg_id=i + 1), 1000 + i)
+    # the running total matches a store built from scratch with the same entries
+    assert store.resized(store.capacity).nbytes == store.nbytes
+
+    empty = LogStore(1000).nbytes
+    store.set_max_bytes(empty + 50_000)
+    assert store.nbytes <= empty + 50_000 and 0 < len(store) < 1000
+    assert store.first_seq == 2500 - len(store)  # the oldest were removed
+    assert store.resized(store.capacity).nbytes == store.nbytes
+
+    # big content pushes out old entries even though there's space for more
+    for i in range(20):
+        store.append(
+            make_com(1, "big", log_content=True, content="x" * 10_000),
+            5000 + i,
+        )
+    assert store.nbytes <= empty + 50_000 and len(store) < 10
+    assert [i.command for i in store][-1] == "big"
+
+    store.set_max_bytes(None)
+    size = len(store)
+    for i in range(20):
+        store.append(make_com(1, "big", log_content=True, content="x" * 10_000), 6000 + i)
+    assert len(store) == size + 20 and store.nbytes > empty + 200_000
+
+    assert parse_bytes("100") == 100
+    assert parse_bytes("50MB") == 50 * 1024 * 1024
+    assert parse_bytes("1.5 gb") == int(1.5 * 1024**3)
+    assert parse_bytes("10k") == 10 * 1024
+    with pytest.raises(BadArgument):
+        parse_bytes("lots")
+
+
+def test_persistent_log(monkeypatch):
+    async def inner():
+        now = int(time.time())
+        store = LogStore(10)
+        for i in range(10):
+            store.append(make_com(i, "ping", i % 2, msg_id=i + 1), now - 10 + i)
+        store.append(make_com(5, "slash", 7, cls=LoggedAppCom, application_command=1), now)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = PersistentLog(os.path.join(tmp, "cmdlog.db"), days=1)
+            await db.start()
+            for seq in range(store.first_seq, store.next_seq):
+                db.add(store.row(seq))
+            assert await db.count() == 10
+
+            loaded = await db.load(5)  # only the most recent that fit
+            assert [loaded.row(s) for s in range(loaded.first_seq, loaded.next_seq)] == [
+                store.row(s) for s in range(store.next_seq - 5, store.next_seq)
+            ]
+            assert [str(i) for i in loaded] == [str(i) for i in list(store)[-5:]]
+
+            db.add(store.row(store.first_seq)._replace(time=now - 2 * 24 * 60 * 60))
+            await db.flush()
+            monkeypatch.setattr(persist, "MAX_ROWS", 8)
+            await db.compact()  # the old one and the 2 oldest past MAX_ROWS
+            assert await db.count() == 8
+            await db.close()
+
+    asyncio.run(inner())
+
+
+def test_persist_toggle(monkeypatch):
+    async def inner():
+        now = int(time.time())
+        with tempfile.TemporaryDirectory() as tmp:
+            monkeypatch.setattr(cmdlog_module, "cog_data_path", lambda cog: Path(tmp))
+            # just what's needed for the cache, without a bot
+            cog = CmdLog.__new__(CmdLog)
+            cog.log_cache = LogStore(100)
+            cog.usage = UsageStats()
+            cog.persistent_log = None
+            cog.unsaved_count = 0
+            cog.database_loaded = False
+
+            for i in range(3):
+                cog.cache_com(make_com(i, "ping", 5))
+            await cog.start_persistent_log(30)
+            cog.cache_com(make_com(3, "help", 5))
+            await cog.stop_persistent_log()
+            cog.cache_com(make_com(4, "info", 5))  # while saving is off
+
+            await cog.start_persistent_log(30)
+            assert [i.user.id for i in cog.log_cache] == [0, 1, 2, 3, 4]
+            assert await cog.persistent_log.count() == 5
+            assert cog.usage.total("24h", now) == 5
+            await cog.stop_persistent_log()
+
+            # a new session loads them, and counts them once
+            cog.log_cache = LogStore(100)
+            cog.usage = UsageStats()
+            cog.database_loaded = False
+            cog.cache_com(make_com(5, "ping", 5))
+            await cog.start_persistent_log(30)
+            assert [i.user.id for i in cog.log_cache] == [0, 1, 2, 3, 4, 5]
+            assert await cog.persistent_log.count() == 6
+            assert cog.usage.total("24h", now) == 6
+            await cog.stop_persistent_log()
+
+    asyncio.run(inner())
+
+
+def test_time_ranges():
+    store = LogStore(50)
+    for i in range(80):
+        store.append(make_com(i % 2, ["ping", "help"][i % 3 == 0], 1), 1000 + i)
+    store.append(make_com(0, "ping", 1), 900)  # clock went backwards
+    assert store.times[80 % 50] == 1079  # clamped so the times stay in order
+
+    def check(start, end, **filters):
+        expected = [
+            seq
+            for seq in store.find(**filters)
+            if (start is None or store.times[seq % 50] >= start)
+            and (end is None or store.times[seq % 50] < end)
+        ]
+        assert list(store.find(start=start, end=end, **filters)) == expected
+        return expected
+
+    assert check(1040, 1050) == list(range(40, 50))
+    assert check(None, 1031) == []  # evicted
+    assert check(1070, None) == list(range(70, 81))
+    assert check(1040, 1060, user_id=1)
+    assert check(1035, 1065, command="help", guild_id=1)
+    assert check(1035, 1065, command="he", user_id=0)
+    assert check(2000, None) == check(1040, 1040) == []
+    assert store.seq_at(0) == store.first_seq and store.seq_at(5000) == store.next_seq
+
+
+def test_parse_time():
+    now = time.time()
+    assert abs(parse_time("2h") - (now - 7200)) < 5
+    today_2pm = datetime.datetime.now().replace(hour=14, minute=0, second=0, microsecond=0)
+    assert parse_time("14:00") == today_2pm.timestamp()
+    assert parse_time("2022-01-30 14:05") == datetime.datetime(2022, 1, 30, 14, 5).timestamp()
+    with pytest.raises(BadArgument):
+        parse_time("not a time")
+
+    assert split_flags(None) == (None, ExportFlags())
+    assert split_flags("playlist create") == ("playlist create", ExportFlags())
+    command, flags = split_flags("playlist create --since 1d --format CSV")
+    assert command == "playlist create" and flags.format == "csv"
+    assert flags.since is not None and abs(flags.since - (now - 86400)) < 5
+    assert split_flags("--format jsonl --since 14:00") == (
+        None,
+        ExportFlags(today_2pm.timestamp(), "jsonl"),
+    )
+    with pytest.raises(BadArgument):
+        split_flags("ping --since")
+    with pytest.raises(BadArgument):
+        split_flags("ping --format xml")
+
+
+def test_export():
+    async def inner():
+        store = LogStore(3000)
+        for i in range(2500):
+            store.append(
+                make_com(i, f"cmd{i % 7}", i % 2, msg_id=i + 1, log_content=True, content="x,y"),
+                1000 + i,
+            )
+
+        async def export(fmt, seqs, limit=None):
+            chunks = format_chunks(store, seqs, fmt, "header")
+            return [gzip.decompress(b.read()).decode() async for b in gzip_parts(chunks, limit)]
+
+        (txt,) = await export("txt", store.find())
+        lines = txt.splitlines()
+        assert lines[0] == "header" and len(lines) == 2501
+        assert lines[1] == f"[{store.get(0).time}] {store.get(0)}"
+        assert await export("txt", []) == await export("csv", store.find(user_id=5000)) == []
+
+        (jsonl,) = await export("jsonl", store.find(user_id=1))
+        (entry,) = map(json.loads, jsonl.splitlines())
+        assert entry["user_id"] == 1 and entry["guild_id"] == 1 and entry["type"] == "command"
+        assert entry["time"] == 1001 and entry["content"] == "x,y"
+
+        (exported,) = await export("csv", store.find(command="cmd3"))
+        rows = list(csv.DictReader(io.StringIO(exported)))
+        assert len(rows) == len(list(store.find(command="cmd3")))
+        assert rows[0]["content"] == "x,y"
+        assert {r["guild_id"] for r in rows} == {"", "1"}  # empty in DMs
+
+        # tiny upload limit (under the margin) so every chunk is a new part
+        parts = await export("txt", store.find(), export_module.UPLOAD_MARGIN + 1)
+        assert len(parts) == 3 and "".join(parts) == txt
+
+        # long content which barely compresses still never goes over the limit
+        rng = random.Random(1)
+        big = LogStore(200)
+        for i in range(200):
+            content = "".join(rng.choices(string.ascii_letters, k=4000))
+            big.append(make_com(i, "say", log_content=True, content=content), 1000 + i)
+        limit = 300 * 1024
+        chunks = format_chunks(big, big.find(), "csv", "")
+        parts = [b.getvalue() async for b in gzip_parts(chunks, limit)]
+        assert len(parts) > 1 and all(len(part) <= limit for part in parts)
+        text = "".join(gzip.decompress(part).decode() for part in parts)
+        assert len(list(csv.DictReader(io.StringIO(text)))) == 200
+
+    asyncio.run(inner())
+
+
+def test_usage_stats():
+    counter = WindowCounter(60, 60)  # an hour of minutes
+    for i in range(120):  # one a minute for two hours, and two more of "b" every ten minutes
+        counter.add("a", 1000 * 60 + i * 60)
+        if i % 10 == 0:
+            counter.add("b", 1000 * 60 + i * 60 + 30)
+            counter.add("b", 1000 * 60 + i * 60 + 31)
+    now = 1000 * 60 + 119 * 60
+    assert counter.top(5, now) == [("a", 60), ("b", 12)]
+    assert counter.total(now) == 72
+    counter.add("c", now - 4000)  # already out of the window
+    assert "c" not in counter.totals
+
+    # the running totals match what's in the buckets
+    assert sum(counter.buckets, Counter()) == counter.totals
+    assert counter.top(5, now + 30 * 60) == [("a", 30), ("b", 6)]
+    assert counter.top(5, now + 10 * 60 * 60) == [] and counter.total(now) == 0
+
+    stats = UsageStats()
+    for i in range(100):
+        stats.add(f"command{i % 4}", i % 7, i % 3, 5000 + i)
+    assert stats.top("commands", "1m", 2, 5099) == [("command0", 15), ("command1", 15)]
+    assert stats.total("1m", 5099) == 60 and stats.total("1h", 5099) == 100
+    assert stats.top("servers", "24h", 5, 5099) == [(1, 33), (2, 33)]  # 0 (DMs) isn't counted
+    assert stats.top("users", "1h", 1, 5099)[0][1] == 15
@@ -1,9 +1,45 @@
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+import aiohttp
+import discord
+import pytest
 import vexcogutils  # noqa
+from redbot.core import Config
+from redbot.core.config import Group
 
-from status.objects import SendCache, UpdateField
-from status.objects.incidentdata import Update
+from status.commands.status_com import StatusCom
+from status.core import FEEDS, IncidentArchive, StatusAPI, get_icon, is_custom, statusapi
+from status.core.consts import EDIT_IDS_GROUP
+from status.core.feeds import (
+    RESERVED_FEED_NAMES,
+    clean_page_id,
+    register_feed,
+    unregister_feed,
+)
+from status.core.stats import TIME_BUCKETS, Histogram, LoopStats
+from status.core.statusapi import ResponseTooLarge, create_session, get_base
+from status.objects import (
+    BroadcastEvent,
+    ComponentTracker,
+    ConfigWrapper,
+    EventQueue,
+    LastChecked,
+    PayloadEmbed,
+    SendCache,
+    ServiceCooldown,
+    ServiceRestrictionsCache,
+    SubscriptionIndex,
+    UpdateField,
+)
+from status.objects.incidentdata import IncidentData, Update
 from status.updateloop import processfeed
+from status.updateloop.utils import ChannelChecks
 
+from .benchmark_status import FakeBot, FakeChannel, FakeGuild
 from .consts import (
     STATUS_EXPECTED_EMBED_INCIDENTS_ALL,
     STATUS_EXPECTED_EMBED_SCHEDULED_ALL,
@@ -12,6 +48,7 @@ from .consts import (
     TEST_FEED_DATA_INCIDENTS,
     TEST_FEED_DATA_SCHEDULED,
 )
+from .statuspage_standin import StandInPage, StatuspageStandIn, Timeline
 
 
 # this critical edge case stuff that needs to work
@@ -61,7 +98,467 @@ def test_example_incident():
     sc_inc = SendCache(up_inc, "statuspage")
     sc_sch = SendCache(up_sch, "statuspage")
 
-    assert sc_inc.embed_all.to_dict() == STATUS_EXPECTED_EMBED_INCIDENTS_ALL
-    assert sc_sch.embed_all.to_dict() == STATUS_EXPECTED_EMBED_SCHEDULED_ALL
-    assert sc_inc.plain_all == STATUS_EXPECTED_PLAIN_INCIDENTS_ALL
-    assert sc_sch.plain_all == STATUS_EXPECTED_PLAIN_SCHEDULED_ALL
+    assert dict(sc_inc.webhook_all) == STATUS_EXPECTED_EMBED_INCIDENTS_ALL
+    assert dict(sc_sch.webhook_all) == STATUS_EXPECTED_EMBED_SCHEDULED_ALL
+    assert sc_inc.embed_all["author"]["name"] == "Statuspage Status Update"
+    assert sc_inc.plain_all == (STATUS_EXPECTED_PLAIN_INCIDENTS_ALL,)
+    assert sc_sch.plain_all == (STATUS_EXPECTED_PLAIN_SCHEDULED_ALL,)
+
+
+def test_process_cache():
+    hits = processfeed.incident_cache.hits
+
+    first = processfeed.process_json(TEST_FEED_DATA_INCIDENTS, "incidents")
+    second = processfeed.process_json(TEST_FEED_DATA_INCIDENTS, "incidents")
+
+    assert first == second
+    assert first[0] is second[0]  # not re-parsed
+    assert processfeed.incident_cache.hits >= hits + len(first)
+
+
+def test_payload_not_shared():
+    incidents = processfeed.process_json(TEST_FEED_DATA_INCIDENTS, "incidents")
+    update = Update(incidents[0], [incidents[0].fields[0]])
+    sendcache = SendCache(update, "statuspage")
+
+    embed = PayloadEmbed(sendcache.webhook_all, footer={"text": "Powered by Bot"})
+
+    assert embed.to_dict()["footer"] == {"text": "Powered by Bot"}
+    assert "footer" not in sendcache.webhook_all  # per-channel delta doesn't leak
+    assert "author" not in sendcache.webhook_all
+
+
+def test_plain_pages():
+    fields = [
+        UpdateField(f"Update {i}", f"See https://example.com/{i} " * 50, str(i)) for i in range(5)
+    ]
+    incidentdata = IncidentData(
+        "Title", "https://stspg.io/1", "1", "", fields, time=datetime.datetime.now()
+    )
+    sendcache = SendCache(Update(incidentdata, fields[-1:]), "discord")
+
+    assert len(sendcache.plain_latest) == 1
+    assert len(sendcache.plain_all) > 1  # split, not cut off
+    assert all(len(page) <= 2000 for page in sendcache.plain_all)
+    assert "**Update 4**" in "".join(sendcache.plain_all)
+    assert sendcache.plain_all[-1].rstrip().endswith("https://example.com/4>")
+    assert "https://example.com/3" not in "".join(sendcache.plain_all).replace(
+        "<https://example.com/3>", ""
+    )  # every link is wrapped
+
+
+def test_statusapi_against_standin():
+    async def inner():
+        async with StatuspageStandIn() as standin, aiohttp.ClientSession() as session:
+            service_id = FEEDS["discord"]["id"]
+            timeline = Timeline.typical_incident("discord")
+            timeline.advance(standin)
+
+            resp, etag, status = await StatusAPI(session, standin.base_url).incidents(service_id)
+            assert status == 200
+            assert resp["incidents"][0]["name"] == "Elevated error rates"
+
+            _, _, status = await StatusAPI(session, standin.base_url).incidents(service_id, etag)
+            assert status == 304
+
+            timeline.advance(standin)
+            resp, _, status = await StatusAPI(session, standin.base_url).incidents(
+                service_id, etag
+            )
+            assert status == 200
+            assert len(resp["incidents"][0]["incident_updates"]) == 2
+
+            standin.page("discord").errors.append(503)
+            _, _, status = await StatusAPI(session, standin.base_url).incidents(service_id)
+            assert status == 503
+
+    asyncio.run(inner())
+
+
+def test_loop_stats():
+    hist = Histogram(TIME_BUCKETS)
+    for value in [1, 2, 3, 30, 20000]:
+        hist.record(value)
+    assert hist.counts[0] == 3 and hist.counts[-1] == 1
+    assert hist.percentile(50) == 5
+    assert hist.percentile(100) == 20000
+
+    async def inner():
+        async with StatuspageStandIn() as standin, aiohttp.ClientSession() as session:
+            service_id = FEEDS["discord"]["id"]
+            Timeline.typical_incident("discord").advance(standin)
+            stats = LoopStats()
+
+            _, etag, _ = await StatusAPI(session, standin.base_url, stats).incidents(service_id)
+            await StatusAPI(session, standin.base_url, stats).incidents(service_id, etag)
+            standin.page("discord").errors.append(503)
+            await StatusAPI(session, standin.base_url, stats).incidents(service_id)
+
+            endpoint = stats.endpoints[(service_id, "incidents")]
+            assert endpoint.statuses == {"200": 1, "304": 1, "5xx": 1}
+            assert endpoint.latency.count == 3
+            assert endpoint.size.count == 1 and endpoint.size.mean > 0
+
+            stats.record_fanout(service_id, 0.01)
+            (row,) = stats.table({service_id: "discord"})
+            assert row[:3] == ["discord", "incidents", "1/1/1/0/0"]
+            assert row[-1] == "10"
+
+    asyncio.run(inner())
+
+
+def test_pooled_session():
+    async def inner():
+        async with StatuspageStandIn() as standin:
+            stats = LoopStats()
+            session = create_session(stats)
+            try:
+                api = StatusAPI(session, standin.base_url, stats)
+                for service in ("discord", "github", "zoom"):
+                    _, _, status = await api.incidents(FEEDS[service]["id"])
+                    assert status == 200
+                # all the same host, so the connection is kept alive and reused
+                assert stats.connections == {"created": 1, "reused": 2}
+
+                old_max, statusapi.MAX_RESPONSE_SIZE = statusapi.MAX_RESPONSE_SIZE, 10
+                try:
+                    with pytest.raises(ResponseTooLarge):
+                        await api.components(FEEDS["discord"]["id"])
+                finally:
+                    statusapi.MAX_RESPONSE_SIZE = old_max
+                assert stats.endpoints[(FEEDS["discord"]["id"], "components")].statuses == {
+                    "error": 1
+                }
+            finally:
+                await session.close()
+
+    asyncio.run(inner())
+
+
+def test_summary_single_flight():
+    async def inner():
+        async with StatuspageStandIn() as standin, aiohttp.ClientSession() as session:
+            service_id = FEEDS["github"]["id"]
+            standin.page("github").delay = 0.1
+            api = StatusAPI(session, standin.base_url)
+
+            results = await asyncio.gather(*(api.summary(service_id) for _ in range(20)))
+
+            assert all(r.status == 200 for r in results)
+            assert standin.page("github").requests["summary"] == 1
+
+            # cached now, so this shouldn't make a request
+            await api.summary(service_id)
+            assert standin.page("github").requests["summary"] == 1
+
+    asyncio.run(inner())
+
+
+def test_filter_changed():
+    changed, seen = processfeed.filter_changed(TEST_FEED_DATA_INCIDENTS, "incidents", {})
+    assert len(changed["incidents"]) == 2
+
+    changed, seen = processfeed.filter_changed(TEST_FEED_DATA_INCIDENTS, "incidents", seen)
+    assert changed["incidents"] == []
+
+    seen["cp306tmzcl0y"] = ("2014-05-14T14:22:39.441-06:00", 0)  # pretend it was updated
+    changed, seen = processfeed.filter_changed(TEST_FEED_DATA_INCIDENTS, "incidents", seen)
+    assert [i["id"] for i in changed["incidents"]] == ["cp306tmzcl0y"]
+
+
+def test_config_edit_ids():
+    async def inner():
+        config = Config.get_conf(None, identifier=1234567890, cog_name="StatusTestEditIDs")
+        config.register_global(edit_id_resolved={}, edit_ids_moved=False)
+        config.register_channel(feeds={}, webhook_cache={})
+        config.init_custom(EDIT_IDS_GROUP, 2)
+        config.register_custom(EDIT_IDS_GROUP)
+        await config.clear_all()
+        await config.custom(EDIT_IDS_GROUP).clear()
+        # from before edit IDs had their own group
+        old = {"discord": {"mode": "edit", "webhook": False, "edit_id": {"old": 5}}}
+        for c_id in (1, 2):
+            await config.channel_from_id(c_id).feeds.set(old)
+
+        wrapper = ConfigWrapper(config, LastChecked())
+        all_channels = await config.all_channels()
+        wrapper.subscriptions = SubscriptionIndex(all_channels)
+        await wrapper.load_edit_ids(all_channels)
+        assert wrapper.get_edit_ids("discord", "old") == {1: 5, 2: 5}
+        assert await config.edit_ids_moved()
+
+        writes = []
+        real_set = Group.set
+
+        async def counted_set(group, value):
+            writes.append(value)
+            await real_set(group, value)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(Group, "set", counted_set)
+            edit_ids = {c_id: c_id * 10 for c_id in range(1, 500)}
+            await wrapper.update_edit_ids("discord", "a", edit_ids)
+        assert len(writes) == 1  # one write for the whole broadcast
+        await wrapper.update_edit_ids("discord", "a", {}, resolved=True)
+        assert await config.custom(EDIT_IDS_GROUP, "discord", "a").get_raw("7") == 70
+        assert await config.channel_from_id(1).feeds() == old  # channel settings untouched
+
+        await wrapper.forget_edit_ids("discord", 7)
+        assert 7 not in wrapper.get_edit_ids("discord", "a")
+
+        # a new wrapper (eg after a restart) loads them, and doesn't move the old ones again
+        again = ConfigWrapper(config, LastChecked())
+        await again.load_edit_ids({})
+        assert again.get_edit_ids("discord", "a") == wrapper.get_edit_ids("discord", "a")
+
+        await config.edit_id_resolved.set({"a": time.time() - 100 * 86400})
+        await wrapper.prune_edit_ids()
+        assert wrapper.get_edit_ids("discord", "a") == {}
+        assert await config.custom(EDIT_IDS_GROUP, "discord").all() == {"old": {"1": 5, "2": 5}}
+        assert await config.edit_id_resolved() == {}
+
+        wrapper.missing_channels[2] = time.time() - 100 * 3600
+        assert await wrapper.prune_missing_channels(lambda c_id: None) == {2: ["discord"]}
+        assert 2 not in await config.all_channels() and 1 in await config.all_channels()
+        assert wrapper.subscriptions.get_service("discord").keys() == {1}
+
+    asyncio.run(inner())
+
+
+def test_subscription_lookups():
+    index = SubscriptionIndex(
+        {
+            1: {"feeds": {"discord": {"mode": "all", "webhook": False, "edit_id": {}}}},
+            2: {"feeds": {"discord": {"mode": "edit", "webhook": True, "edit_id": {}}}},
+        }
+    )
+    index.add("github", 1, {"mode": "latest", "webhook": False, "edit_id": {}})
+    index.remove("discord", 2)
+
+    assert set(index.get_channel(1)) == {"discord", "github"}
+    assert index.get_channel(2) == {}
+    assert sorted(index.services()) == ["discord", "github"]
+
+
+def test_incident_archive():
+    async def inner():
+        async with StatuspageStandIn() as standin:
+            page = standin.page("discord")
+            first = page.add_incident("Voice connection issues", "Calls are dropping in Europe.")
+            page.resolve(first)
+            page.add_incident("API errors", "Elevated error rates.", impact="major")
+
+            with tempfile.TemporaryDirectory() as tmp:
+                archive = IncidentArchive(os.path.join(tmp, "archive.db"))
+                # not started (eg it failed to), so there's nothing to look at
+                assert not archive.available
+                assert await archive.history("discord", 0) == []
+                assert await archive.search("europe") == []
+
+                await archive.start()
+                assert archive.available
+                archive.add("discord", "incidents", page.body("incidents")["incidents"])
+                # seen again, eg after an update. shouldn't duplicate
+                archive.add("discord", "incidents", page.body("incidents")["incidents"])
+
+                history = await archive.history("discord", 0)
+                assert [i.title for i in history] == ["API errors", "Voice connection issues"]
+                assert history[0].impact == "major" and history[0].resolved is None
+                assert history[1].resolved is not None
+                assert await archive.history("github", 0) == []
+
+                assert [i.incident_id for i in await archive.search("europe")] == [first]
+                assert await archive.search("europe", "github") == []
+                assert await archive.search('"') == []  # not valid FTS syntax on its own
+
+                await archive.close()
+
+    asyncio.run(inner())
+
+
+def test_service_restrictions():
+    cache = ServiceRestrictionsCache(
+        {1: {"service_restrictions": {"discord": [10], "github": []}}}
+    )
+    assert cache.get_guild(1) == {"discord": frozenset({10})}
+
+    cache.add_restriction(2, "discord", 20)
+    cache.add_restriction(2, "discord", 21)
+    assert cache.get_guild(2, "discord") == {20, 21}
+    assert cache.get_guild(2, "github") == frozenset()  # services don't share a set
+
+    class Chan(discord.TextChannel):
+        def __init__(self, id):
+            self.id = id
+
+    channels = {20: Chan(20), 21: Chan(21)}
+    first = cache.get_mentions(2, "discord", channels.get)
+    assert sorted(first) == ["<#20>", "<#21>"]
+    assert cache.get_mentions(2, "discord", channels.get) is first  # cached
+
+    del channels[21]  # deleted, so it's not offered any more
+    assert cache.get_mentions(2, "discord", channels.get) == ["<#20>"]
+    channels[21] = Chan(21)  # eg the guild was unavailable
+    assert sorted(cache.get_mentions(2, "discord", channels.get)) == ["<#20>", "<#21>"]
+
+    cache.remove_restriction(2, "discord", 20)
+    del channels[21]
+    assert cache.get_mentions(2, "discord", channels.get) == []
+    cache.remove_restriction(2, "discord", 21)
+    assert cache.get_guild(2) == {}
+
+
+def test_service_cooldown():
+    cooldown = ServiceCooldown(period=0.05)
+    assert cooldown.handle(1, "discord") is False
+    assert cooldown.handle(1, "discord") is False
+    assert cooldown.handle(1, "discord") > 0
+    assert cooldown.handle(1, "github") is False
+    assert set(cooldown.get_from_id(1)) == {"discord", "github"}
+
+    time.sleep(0.06)
+    assert cooldown.handle(2, "discord") is False
+    assert len(cooldown) == 1  # the others expired and were evicted
+
+
+def test_channel_checks():
+    bot = FakeBot()
+    guild = FakeGuild(1)
+    for c_id in range(10, 15):
+        bot.channels[c_id] = FakeChannel(c_id, guild, bot)
+    channels = {
+        c_id: {"mode": "latest", "webhook": False, "edit_id": {}} for c_id in range(10, 16)
+    }
+
+    checks = ChannelChecks(bot)
+    channeldata = asyncio.run(checks.prefetch(channels))
+
+    assert list(channeldata) == [10, 11, 12, 13, 14]
+    assert all(c.embed and not c.webhook for c in channeldata.values())
+    assert checks.missing == [15]
+    # the cog disabled check is per guild, embed settings are per channel on Red 3.5
+    assert bot.eligibility_lookups == 1 + 5
+
+
+def test_channel_checks_guild_embeds(monkeypatch):
+    # on Red 3.4 (discord.py 1) embed settings are per guild, but permissions are per channel
+    monkeypatch.setattr(discord, "__version__", "1.7.3")
+
+    class Setting:
+        def __init__(self, value):
+            self.value = value
+
+        async def embeds(self):
+            return self.value
+
+    class BotConfig(Setting):
+        def guild(self, guild):
+            return Setting(None if guild.id == 1 else False)
+
+    class NoEmbedPerms:
+        send_messages = True
+        manage_webhooks = False
+        embed_links = False
+
+    bot = FakeBot()
+    bot._config = BotConfig(True)  # type:ignore
+    for c_id, guild in ((10, FakeGuild(1)), (11, FakeGuild(1)), (20, FakeGuild(2))):
+        bot.channels[c_id] = FakeChannel(c_id, guild, bot)
+    bot.channels[10].permissions_for = lambda _: NoEmbedPerms()  # type:ignore
+    channels = {c_id: {"mode": "latest", "webhook": False} for c_id in (10, 11, 20)}
+
+    channeldata = asyncio.run(ChannelChecks(bot).prefetch(channels))  # type:ignore
+    # 10 can't embed, but that doesn't stop 11 in the same guild. guild 2 turned embeds off
+    assert {c_id: c.embed for c_id, c in channeldata.items()} == {10: False, 11: True, 20: False}
+
+
+def test_component_tracker():
+    page = StandInPage("abc123", "Test")
+    api = page.add_component("API")
+    page.add_component("Voice")
+
+    tracker = ComponentTracker()
+    assert tracker.diff("discord", page.body("components")["components"]) == []  # baseline
+
+    page.set_component_status(api, "major_outage")
+    changes = tracker.diff("discord", page.body("components")["components"])
+    assert [(c.name, c.old_status, c.new_status) for c in changes] == [
+        ("API", "operational", "major_outage")
+    ]
+    assert tracker.diff("discord", page.body("components")["components"]) == []
+
+    update = processfeed.process_component_changes(changes, "discord")
+    assert update.new_fields[0].name.startswith("Major outage")
+    assert "**API** is now major outage (was operational)." == update.new_fields[0].value
+    assert SendCache(update, "discord").embed_all["color"] == 0xE74C3C  # red
+
+
+def test_custom_feeds():
+    assert clean_page_id("https://Status.Vendor.com/history") == "status.vendor.com"
+    assert clean_page_id("abc123xyz") == "abc123xyz"
+
+    register_feed("vendor", id="status.vendor.com", url="https://status.vendor.com", friendly="V")
+    try:
+        assert is_custom("vendor") and not is_custom("discord")
+        assert get_icon("vendor") is None and get_icon("discord")
+        assert get_base(FEEDS["vendor"]["id"]) == "https://status.vendor.com/api/v2"
+        assert get_base("abc123xyz") == "https://abc123xyz.statuspage.io/api/v2"
+        incidentdata = processfeed.process_json(TEST_FEED_DATA_INCIDENTS, "incidents")[0]
+        author = SendCache(Update(incidentdata, []), "vendor").embed_all["author"]
+        assert author == {"name": "V Status Update"}
+    finally:
+        unregister_feed("vendor")
+    assert "vendor" not in FEEDS
+
+    # feeds can't be named after status subcommands, or they couldn't be used with it
+    assert set(StatusCom.status.all_commands) <= RESERVED_FEED_NAMES
+
+
+def test_event_queue():
+    class Bot:
+        def __init__(self):
+            self.events = []
+            self.release = asyncio.Event()
+            self.extra_events = {"on_vexed_status_broadcast": [self.listener, self.broken]}
+
+        async def listener(self, **kwargs):
+            await self.release.wait()
+            self.events.append(kwargs)
+
+        async def broken(self, **_):
+            raise RuntimeError
+
+    async def inner():
+        bot = Bot()
+        queue = EventQueue(bot, maxsize=2)  # type:ignore
+        update = Update(processfeed.process_json(TEST_FEED_DATA_INCIDENTS, "incidents")[0], [])
+
+        for _ in range(2):
+            await queue.put(BroadcastEvent("discord", update, [], False))
+        assert queue.qsize() == 2
+
+        # full, so this waits until the worker makes space
+        put = asyncio.create_task(queue.put(BroadcastEvent("discord", update, [], True)))
+        await asyncio.sleep(0)
+        assert not put.done()
+
+        # the worker takes one event, then waits for the listener before taking the next
+        queue.start()
+        await asyncio.sleep(0.01)
+        assert put.done() and queue.qsize() == 2 and queue.dispatched == 0
+
+        bot.release.set()
+        await queue._queue.join()
+
+        assert queue.qsize() == 0 and queue.dispatched == 3
+        assert len(bot.events) == 3 and bot.events[-1]["force"] is True
+
+        # listeners that don't finish are given up on
+        bot.release.clear()
+        queue.timeout = 0.01
+        await queue.put(BroadcastEvent("discord", update, [], False))
+        await queue._queue.join()
+        queue.close()
+        assert queue.dispatched == 3 and len(bot.events) == 3
+
+    asyncio.run(inner())